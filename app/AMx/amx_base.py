@@ -1,8 +1,6 @@
 import os
 import sys
 
-import numpy as np
-
 from bokeh.io import curdoc
 from bokeh.models import ColumnDataSource
 
@@ -12,6 +10,7 @@ BASE_DIR = os.path.dirname(
 )
 sys.path.append(os.path.join(BASE_DIR))
 from api_helper import APIHelper # noqa
+from sessions import get_registry # noqa
 
 
 class BaseApp(APIHelper):
@@ -39,6 +38,8 @@ class BaseApp(APIHelper):
 
         self.load_data(self.job_id, self.selected_metric, self.snr_cut)
 
+        get_registry().register(self)
+
     def parse_args(self):
         """Returns a dictionary with the URL parameters
         used to configure the app.
@@ -93,30 +94,37 @@ class BaseApp(APIHelper):
         """
 
         # e.g. /blob/885?metric=validate_drp.AM1&name=MatchedMultiVisitDataset
-        df = self.get_api_data_as_pandas_df(endpoint='blob', item=job_id,
-                                            params={'metric': metric,
-                                                    'name': BaseApp.DATASET})
+        # the arrays are parsed while the blob is downloaded
+        arrays = self.get_api_blob_arrays(item=job_id,
+                                          names=['snr', 'dist'],
+                                          params={'metric': metric,
+                                                  'name': BaseApp.DATASET})
 
-        snr = []
-        if 'snr' in df:
-            snr = df['snr']['value']
-
-        dist = []
-        if 'dist' in df:
-            dist = df['dist']['value']
+        snr = arrays['snr']
+        dist = arrays['dist']
 
         # Full dataset
         self.cds.data = {'snr': snr, 'dist': dist}
 
         # Select objects with SNR > 100
-        index = np.array(snr) > float(snr_cut)
+        index = snr > float(snr_cut)
 
-        selected_snr = np.array(snr)[index]
-        selected_dist = np.array(dist)[index]
+        selected_snr = snr[index]
+        selected_dist = dist[index]
 
         self.selected_cds.data = {'snr': selected_snr,
                                   'dist': selected_dist}
 
+    def release_data(self):
+        """Drop the arrays of an idle session, see
+        `SessionRegistry`."""
+
+        self.cds.data = {'snr': [], 'dist': []}
+        self.selected_cds.data = {'snr': [], 'dist': []}
+
+    def restore_data(self):
+        self.load_data(self.job_id, self.selected_metric, self.snr_cut)
+
     def set_title(self, title):
         """Set the app title.
         """
@@ -0,0 +1,279 @@
+import os
+import time
+import fcntl
+import pickle
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from tornado.ioloop import IOLoop
+
+# Use the cache TTL for an entry
+DEFAULT_TTL = object()
+
+
+class CacheEntry:
+    """A cached payload, the time it was fetched and the time in
+    seconds it is considered fresh, None means it never expires.
+
+    The ETag and Last-Modified validators returned by the API are
+    kept to revalidate the payload with a conditional request.
+    """
+
+    __slots__ = ('data', 'time', 'ttl', 'etag', 'last_modified')
+
+    def __init__(self, data, ttl=None, etag=None, last_modified=None):
+        self.data = data
+        self.time = time.time()
+        self.ttl = ttl
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def is_fresh(self):
+        return self.ttl is None or time.time() - self.time < self.ttl
+
+
+class APICache:
+    """Cache of SQuaSH API payloads shared by all sessions in the
+    bokeh server process.
+
+    If a cache directory is configured, the entries are also stored
+    on disk so that the worker processes started with
+    `bokeh serve --num-procs` share the fetched payloads. A file lock
+    per key makes sure only one process fetches a given payload from
+    the API at a time, the IOLoop thread never waits on it. Files
+    older than `MAX_AGE` are removed, then the oldest entries until
+    the directory is smaller than `DISK_SIZE`.
+
+    Note that cached payloads are shared, they must not be modified
+    by the apps.
+    """
+
+    # Time in seconds a payload is considered fresh
+    TTL = float(os.environ.get('SQUASH_BOKEH_CACHE_TTL', 300))
+
+    # Maximum number of payloads kept in memory
+    SIZE = int(os.environ.get('SQUASH_BOKEH_CACHE_SIZE', 256))
+
+    # Directory for the cache shared across processes
+    CACHE_DIR = os.environ.get('SQUASH_BOKEH_CACHE_DIR')
+
+    # Maximum size in bytes of the cache directory
+    DISK_SIZE = int(os.environ.get('SQUASH_BOKEH_CACHE_DISK_SIZE',
+                                   512 * 1024 ** 2))
+
+    # Maximum age in seconds of the files in the cache directory
+    MAX_AGE = float(os.environ.get('SQUASH_BOKEH_CACHE_MAX_AGE', 86400))
+
+    # Maximum time in seconds a thread waits for another process
+    # fetching the same payload
+    LOCK_TIMEOUT = float(os.environ.get('SQUASH_BOKEH_CACHE_LOCK_TIMEOUT',
+                                        10))
+
+    # Number of writes between evictions from the cache directory
+    EVICT_EVERY = 100
+
+    def __init__(self, ttl=None, size=None, cache_dir=None):
+
+        self.ttl = ttl or APICache.TTL
+        self.size = size or APICache.SIZE
+        self.cache_dir = cache_dir or APICache.CACHE_DIR
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.entries = OrderedDict()
+        self.memory_lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+        self.writes = 0
+        self.evicted = 0
+
+    @staticmethod
+    def make_key(url, params=None):
+        """Return a cache key for an API request."""
+
+        if params:
+            query = "&".join("{}={}".format(k, params[k])
+                             for k in sorted(params))
+            url = "{}?{}".format(url, query)
+
+        return url
+
+    def get_path(self, key, extension):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        filename = "{}.{}".format(digest, extension)
+
+        return os.path.join(self.cache_dir, filename)
+
+    def get(self, key):
+        """Return the cached entry for `key`, fresh or not, or None.
+        The on-disk store is used if the entry in memory is missing
+        or stale, another process may have refreshed it.
+        """
+        with self.memory_lock:
+            entry = self.entries.get(key)
+            if entry:
+                self.entries.move_to_end(key)
+
+        if self.cache_dir and (entry is None or not entry.is_fresh()):
+
+            disk_entry = self.read(key)
+
+            if disk_entry and (entry is None or disk_entry.time > entry.time):
+                entry = disk_entry
+                self.remember(key, entry)
+
+        if entry and entry.is_fresh():
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        return entry
+
+    def set(self, key, data, ttl=DEFAULT_TTL, etag=None,
+            last_modified=None):
+        """Cache `data` for `key` and return the new entry. By default
+        the entry is fresh for the cache TTL, use `ttl=None` for
+        payloads that never change.
+        """
+        if ttl is DEFAULT_TTL:
+            ttl = self.ttl
+
+        entry = CacheEntry(data, ttl, etag, last_modified)
+
+        self.remember(key, entry)
+
+        if self.cache_dir:
+            self.write(key, entry)
+
+        return entry
+
+    def revalidate(self, key, entry):
+        """The API confirmed that the payload in `entry` did not
+        change, cache it again as a fresh entry."""
+
+        self.revalidated += 1
+
+        return self.set(key, entry.data, entry.ttl, entry.etag,
+                        entry.last_modified)
+
+    def remember(self, key, entry):
+        with self.memory_lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def read(self, key):
+        try:
+            with open(self.get_path(key, 'pickle'), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def write(self, key, entry):
+        # Write to a temporary file and rename it, so that other
+        # processes never read a partial entry
+        fd, path = tempfile.mkstemp(dir=self.cache_dir)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(path, self.get_path(key, 'pickle'))
+
+        self.writes += 1
+        if self.writes % APICache.EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self, now=None):
+        """Remove the files older than `MAX_AGE`, including locks and
+        temporary files, then the oldest entries until the directory is
+        smaller than `DISK_SIZE`."""
+
+        now = now or time.time()
+
+        files = []
+
+        for f in os.scandir(self.cache_dir):
+            try:
+                stat = f.stat()
+            except OSError:
+                # Removed by another process
+                continue
+
+            if now - stat.st_mtime > APICache.MAX_AGE:
+                self.remove(f.path)
+            elif f.name.endswith('.pickle'):
+                files.append((stat.st_mtime, stat.st_size, f.path))
+
+        total = sum(size for _, size, _ in files)
+
+        for _, size, path in sorted(files):
+            if total <= APICache.DISK_SIZE:
+                break
+
+            self.remove(path)
+            total -= size
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+            self.evicted += 1
+        except OSError:
+            pass
+
+    @contextmanager
+    def lock(self, key):
+        """Lock `key` across processes while its payload is fetched
+        from the API. If another process holds the lock, worker threads
+        wait up to `LOCK_TIMEOUT` seconds, the IOLoop thread does not
+        wait and fetches the payload too."""
+
+        if not self.cache_dir:
+            yield
+            return
+
+        with open(self.get_path(key, 'lock'), 'w') as f:
+            locked = self.acquire(f)
+            try:
+                yield
+            finally:
+                if locked:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def acquire(f):
+        """Return True if the lock on `f` was acquired."""
+
+        deadline = time.monotonic() + APICache.LOCK_TIMEOUT
+
+        # Sessions callbacks run on the IOLoop thread
+        wait = IOLoop.current(instance=False) is None
+
+        while True:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if not wait or time.monotonic() > deadline:
+                    return False
+
+            time.sleep(0.05)
+
+    def clear(self):
+        with self.memory_lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        return {'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidated': self.revalidated,
+                'shared': bool(self.cache_dir),
+                'evicted': self.evicted}
@@ -1,7 +1,18 @@
 import os
+import numpy as np
 import pandas as pd
 import requests
 import logging
+import threading
+from datetime import datetime
+from collections import Counter
+
+import stats
+from api_cache import APICache, DEFAULT_TTL
+from json_decoder import JSONDecoder
+from http_client import get_http_client
+from blob_reader import BlobReader
+from circuit_breaker import get_breaker
 
 
 class APIHelper:
@@ -10,12 +21,41 @@ class APIHelper:
     SQUASH_API_URL = os.environ.get('SQUASH_API_URL',
                                     'http://localhost:5000')
 
+    # Endpoints whose payloads never change, e.g. the data blobs
+    # of a given job, they are cached without expiration
+    IMMUTABLE_ENDPOINTS = ['blob']
+
+    # Cache shared by all sessions in the process
+    cache = APICache()
+
+    # JSON decoder, it also profiles decoding time per endpoint
+    decoder = JSONDecoder()
+
+    # Number of times each (endpoint, item, params) combination was
+    # requested by the apps, used to keep the cache warm
+    requested = Counter()
+    requested_lock = threading.Lock()
+
+    # Maximum number of combinations counted, the least requested
+    # half is dropped when it is reached
+    REQUESTED_SIZE = int(os.environ.get('SQUASH_BOKEH_REQUESTED_SIZE', 1000))
+
     def __init__(self):
         self.logger = logging.getLogger()
 
-        self.session = requests.Session()
-        self.session.mount('https://',
-                           requests.adapters.HTTPAdapter(max_retries=5))
+        # Count the requests made by this helper
+        self.record_requests = True
+
+        # If set, cached content fetched before this time is
+        # fetched again
+        self.fetched_after = None
+
+        # Time the oldest stale content served was fetched, None
+        # if all content served is fresh
+        self.stale = None
+
+        # Pooled HTTP client shared by all sessions in the process
+        self.session = get_http_client()
         self.squash_api_url = APIHelper.SQUASH_API_URL
 
     def sublist(self, list1, list2):
@@ -30,14 +70,149 @@ class APIHelper:
         endpoint_urls: dict
             a dict with API endpoints and URLs
         """
-        endpoint_urls = None
-        try:
-            r = self.session.get(self.squash_api_url)
-            endpoint_urls = r.json()
-        except requests.exceptions.RequestException as e:
-            print(e)
+        return self.get_json(self.squash_api_url)
+
+    def get_json(self, url, params=None, ttl=DEFAULT_TTL):
+        """Return the decoded JSON content for an API request,
+        from the cache if it is fresh. Stale content is revalidated
+        with a conditional request if the API returned an ETag or
+        Last-Modified header.
+
+        Parameters
+        ----------
+        url: str
+            the request URL
+        params: dict
+            the query parameters for the request
+        ttl: float
+            time in seconds the content is considered fresh, None
+            for content that never changes. By default the cache TTL
+            is used.
+
+        Return
+        ------
+        data: dict
+            the decoded content or None if the request failed.
+        """
+        key = APICache.make_key(url, params)
+
+        entry = self.cache.get(key)
+        if self.is_usable(entry):
+            return entry.data
+
+        endpoint = JSONDecoder.get_endpoint(url, self.squash_api_url)
+
+        # Fail fast while the endpoint is unhealthy
+        breaker = get_breaker(endpoint)
+        if not breaker.allow():
+            return self.serve_stale(entry)
+
+        # Only one process fetches the content, the others
+        # wait and get it from the cache
+        with self.cache.lock(key):
+
+            entry = self.cache.get(key)
+            if self.is_usable(entry):
+                breaker.success()
+                return entry.data
+
+            headers = self.get_conditional_headers(entry)
+
+            try:
+                r = self.session.get(url, params=params, headers=headers)
+
+                if r.status_code == 304 and entry:
+                    # Not modified, reuse the decoded content
+                    breaker.success()
+                    return self.cache.revalidate(key, entry).data
+
+                r.raise_for_status()
+                data = self.decoder.decode(r.content, endpoint, r.headers)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(e)
+                if self.is_upstream_failure(e):
+                    breaker.failure()
+                else:
+                    breaker.success()
+                return self.serve_stale(entry)
+
+            breaker.success()
+
+            self.cache.set(key, data, ttl, r.headers.get('ETag'),
+                           r.headers.get('Last-Modified'))
+
+        return data
+
+    @staticmethod
+    def get_conditional_headers(entry):
+        """Headers for a conditional request if the API returned
+        validators for the cached content."""
+
+        headers = {}
+        if entry and entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry and entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+
+        return headers
+
+    @staticmethod
+    def is_upstream_failure(error):
+        """Client errors, e.g. 404 for an unknown item, don't mean
+        the upstream is unhealthy."""
+
+        response = getattr(error, 'response', None)
+
+        if response is not None and response.status_code < 500:
+            return False
+
+        return True
+
+    def serve_stale(self, entry):
+        """Return the content of a stale entry, if any, when the
+        API is unavailable. `self.stale` keeps the time the oldest
+        stale content served was fetched."""
+
+        if entry is None:
+            return None
+
+        self.mark_stale(entry.time)
+
+        return entry.data
+
+    def mark_stale(self, fetched):
+        """Record that content fetched at `fetched`, a timestamp, was
+        served while the API is unavailable, `None` if it was not."""
+
+        if fetched is None:
+            return
+
+        if self.stale is None or fetched < self.stale:
+            self.stale = fetched
+
+    def get_stale_message(self):
+        """Message to show in the apps when stale content was
+        served."""
+
+        if self.stale is None:
+            return ""
+
+        fetched = datetime.utcfromtimestamp(self.stale)
+
+        return "The SQuaSH API is unavailable, showing stale data " \
+               "from {:%Y-%m-%d %H:%M} UTC.".format(fetched)
+
+    def is_usable(self, entry):
+        """A cached entry is usable if it is fresh and, unless it
+        never expires, it was not fetched before `self.fetched_after`.
+        """
+        if entry is None or not entry.is_fresh():
+            return False
+
+        if entry.ttl is None or self.fetched_after is None:
+            return True
 
-        return endpoint_urls
+        return entry.time >= self.fetched_after
 
     def get_api_data(self, endpoint, item=None, params=None):
         """Return data from an SQuaSH API endpoint as a python
@@ -58,22 +233,144 @@ class APIHelper:
             a python dictionary with the content returned
             from the API.
         """
-        endpoint_urls = self.get_api_endpoint_urls()
-
-        url = endpoint_urls[endpoint]
+        self.record_request(endpoint, item, params)
 
-        if item:
-            url = "{}/{}".format(url, item)
+        endpoint_urls = self.get_api_endpoint_urls()
 
         data = None
         if endpoint_urls:
+
+            url = endpoint_urls[endpoint]
+
+            if item:
+                url = "{}/{}".format(url, item)
+
+            data = self.get_json(url, params, self.get_ttl(endpoint))
+
+        return data
+
+    def record_request(self, endpoint, item, params):
+        """Count the requests made by the apps, see `Warmup`."""
+
+        if self.record_requests:
+            APIHelper.count_request(endpoint, item, params)
+
+    @staticmethod
+    def count_request(endpoint, item, params):
+        """Count a request in `APIHelper.requested`, bounded to
+        `REQUESTED_SIZE` combinations."""
+
+        frozen_params = tuple(sorted(params.items())) if params else ()
+
+        with APIHelper.requested_lock:
+            requested = APIHelper.requested
+            requested[(endpoint, item, frozen_params)] += 1
+
+            if len(requested) > APIHelper.REQUESTED_SIZE:
+                kept = requested.most_common(APIHelper.REQUESTED_SIZE // 2)
+                requested.clear()
+                requested.update(dict(kept))
+
+    @staticmethod
+    def get_most_requested(n):
+        """Return the `n` most requested combinations, then decay the
+        counts so that only recent requests matter."""
+
+        with APIHelper.requested_lock:
+            requested = APIHelper.requested
+            most_requested = requested.most_common(n)
+
+            for key in list(requested):
+                requested[key] //= 2
+                if requested[key] == 0:
+                    del requested[key]
+
+        return most_requested
+
+    @staticmethod
+    def get_ttl(endpoint):
+        """Payloads from immutable endpoints never expire."""
+
+        if endpoint in APIHelper.IMMUTABLE_ENDPOINTS:
+            return None
+
+        return DEFAULT_TTL
+
+    def get_api_blob_arrays(self, item, names, params=None,
+                            on_progress=None):
+        """Return arrays from a data blob as numpy arrays, parsing the
+        response while it is downloaded.
+
+        Parameters
+        ----------
+        item: str
+            the job id of the blob
+        names: list
+            names of the arrays to read, e.g. `['snr', 'dist']`
+        params: dict
+            query parameters for the `blob` endpoint
+        on_progress: callable
+            called with the arrays read so far, while the blob
+            is downloaded
+
+        Return
+        ------
+        arrays: dict
+            numpy arrays indexed by name, empty if the array is
+            not in the blob.
+        """
+        endpoint_urls = self.get_api_endpoint_urls()
+
+        arrays = {name: np.array([]) for name in names}
+
+        if not endpoint_urls:
+            return arrays
+
+        url = "{}/{}".format(endpoint_urls['blob'], item)
+
+        key = "{}#{}".format(APICache.make_key(url, params), ",".join(names))
+
+        # Data blobs never change
+        entry = self.cache.get(key)
+        if entry:
+            return entry.data
+
+        breaker = get_breaker('blob')
+        if not breaker.allow():
+            return arrays
+
+        with self.cache.lock(key):
+
+            entry = self.cache.get(key)
+            if entry:
+                breaker.success()
+                return entry.data
+
             try:
-                r = self.session.get(url, params=params)
-                data = r.json()
+                with self.session.get(url, params=params, stream=True) as r:
+                    r.raise_for_status()
+
+                    size = r.headers.get('Content-Length')
+                    reader = BlobReader(names, size and int(size),
+                                        on_progress)
+
+                    for chunk in r.iter_content(BlobReader.CHUNK_SIZE):
+                        reader.feed(chunk)
+
+                    arrays = reader.close()
             except requests.exceptions.RequestException as e:
                 print(e)
+                if self.is_upstream_failure(e):
+                    breaker.failure()
+                else:
+                    breaker.success()
+                return arrays
 
-        return data
+            breaker.success()
+
+            self.cache.set(key, arrays, ttl=None)
+
+        return arrays
 
     def get_api_data_as_pandas_df(self, endpoint, item=None, params=None):
         """Return data from a SQuaSH API endpoint as a pandas
@@ -96,6 +393,12 @@ class APIHelper:
         """
         data = self.get_api_data(endpoint, item, params)
 
+        return self.to_pandas_df(data)
+
+    @staticmethod
+    def to_pandas_df(data):
+        """Convert an API payload to a pandas dataframe."""
+
         df = pd.DataFrame()
         if data:
             df = pd.DataFrame.from_dict(data, orient='index').transpose()
@@ -120,7 +423,16 @@ class APIHelper:
             instead of the default package obtained from
             the API.
         """
-        packages = self.get_api_data('packages')['packages']
+        data = self.get_api_data('packages')
+
+        return self.parse_packages(data, default)
+
+    @staticmethod
+    def parse_packages(data, default=None):
+        """Return the sorted package names and the default package
+        from a `packages` payload, see `get_packages`."""
+
+        packages = (data or {}).get('packages')
 
         default_package = None
         sorted_packages = []
@@ -156,9 +468,19 @@ class APIHelper:
             list of dataset names to remove from the list
             of datasets returned from the SQuaSH API
         """
-        datasets = self.get_api_data('datasets')['datasets']
+        data = self.get_api_data('datasets')
+
+        return self.parse_datasets(data, default, ignore)
+
+    @staticmethod
+    def parse_datasets(data, default=None, ignore=None):
+        """Return the sorted dataset names and the default dataset
+        from a `datasets` payload, see `get_datasets`."""
+
+        datasets = (data or {}).get('datasets')
 
         default_dataset = None
+        sorted_datasets = []
 
         if datasets:
 
@@ -196,7 +518,15 @@ class APIHelper:
         data = self.get_api_data('metrics',
                                  params={'package': package})
 
-        metrics = [metric['name'] for metric in data['metrics']]
+        return self.parse_metrics(data, default)
+
+    @staticmethod
+    def parse_metrics(data, default=None):
+        """Return the sorted metric names and the default metric
+        from a `metrics` payload, see `get_metrics`."""
+
+        metrics = [metric['name']
+                   for metric in (data or {}).get('metrics', [])]
 
         sorted_metrics = metrics
         default_metric = None
@@ -229,7 +559,15 @@ class APIHelper:
         data = self.get_api_data('metrics',
                                  params={'package': package})
 
-        return {metric['name']: metric for metric in data['metrics']}
+        return self.parse_metrics_meta(data)
+
+    @staticmethod
+    def parse_metrics_meta(data):
+        """Return the metric metadata indexed by metric name
+        from a `metrics` payload, see `get_metrics_meta`."""
+
+        return {metric['name']: metric
+                for metric in (data or {}).get('metrics', [])}
 
     def get_specs(self, dataset_name, filter_name, metric):
         """Get the list of specification names for a given
@@ -249,23 +587,32 @@ class APIHelper:
             list of specification names
         thresholds: list
             list of threshold values
+        operators: list
+            list of threshold operators, e.g. `<=`
         """
         data = self.get_api_data('specs',
                                  params={'metric': metric,
                                          'dataset_name': dataset_name,
                                          'filter_name': filter_name})
 
-        specs = data['specs']
-
-        if not specs:
+        if not (data or {}).get('specs'):
             # relax constraint on filter_name
             data = self.get_api_data('specs',
                                      params={'metric': metric,
                                              'dataset_name': dataset_name})
-            specs = data['specs']
+
+        return self.parse_specs(data, metric)
+
+    @staticmethod
+    def parse_specs(data, metric):
+        """Return the specification names and thresholds from a
+        `specs` payload, see `get_specs`."""
+
+        specs = (data or {}).get('specs')
 
         names = []
         thresholds = []
+        operators = []
 
         def pretty(s):
             return s.replace(metric + ".", "").replace("_", " ").lower()
@@ -273,5 +620,12 @@ class APIHelper:
         if specs:
             names = [pretty(s['name']) for s in specs]
             thresholds = [t['threshold']['value'] for t in specs]
+            operators = [t['threshold'].get('operator', '<=')
+                         for t in specs]
+
+        return {'names': names, 'thresholds': thresholds,
+                'operators': operators}
+
 
-        return {'names': names, 'thresholds': thresholds}
+stats.register('cache', APIHelper.cache.get_stats)
+stats.register('decoder', APIHelper.decoder.get_stats)
@@ -0,0 +1,279 @@
+import time
+import random
+
+import numpy as np
+from tornado import gen
+from tornado.concurrent import Future
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from tornado.httputil import url_concat
+
+from api_helper import APIHelper
+from api_cache import APICache, DEFAULT_TTL
+from json_decoder import JSONDecoder
+from http_client import HTTPClient
+from blob_reader import BlobReader
+from circuit_breaker import get_breaker
+
+
+class AsyncAPIHelper(APIHelper):
+    """Same as `APIHelper` but the methods fetching data from the
+    SQuaSH API are coroutines, so that many requests can be awaited
+    concurrently from `async` bokeh callbacks without threads, e.g.
+
+        helper = AsyncAPIHelper()
+        packages, datasets = await gen.multi([helper.get_packages(),
+                                              helper.get_datasets()])
+
+    The requests are made with the tornado HTTP client running on the
+    bokeh server IOLoop. The cache, decoder and circuit breakers are
+    shared with `APIHelper`.
+    """
+
+    # Responses that are retried, 599 is a network error or timeout
+    RETRY_STATUS = HTTPClient.RETRY_STATUS + [599]
+
+    # Requests in flight indexed by cache key, concurrent requests
+    # for the same content await the same future
+    pending = {}
+
+    def make_request(self, url, params=None, headers=None, **kwargs):
+
+        # The tornado client requests and decodes gzip only, brotli
+        # is not supported
+        return HTTPRequest(url_concat(url, params),
+                           headers=headers,
+                           connect_timeout=HTTPClient.CONNECT_TIMEOUT,
+                           request_timeout=HTTPClient.READ_TIMEOUT,
+                           decompress_response=True, **kwargs)
+
+    async def fetch(self, request):
+        """Fetch a request, retrying with exponential backoff and
+        full jitter until the deadline, as `HTTPClient` does.
+
+        Return
+        ------
+        response: tornado.httpclient.HTTPResponse
+            the last response, `response.code` is 599 if the request
+            could not be made.
+        """
+        client = AsyncHTTPClient()
+
+        start = time.monotonic()
+
+        for retry in range(HTTPClient.RETRIES + 1):
+
+            if retry:
+                remaining = HTTPClient.DEADLINE - (time.monotonic() - start)
+
+                if remaining <= 0:
+                    break
+
+                backoff = HTTPClient.BACKOFF * 2 ** (retry - 1)
+                await gen.sleep(random.uniform(0, min(backoff, remaining)))
+
+            response = await client.fetch(request, raise_error=False)
+
+            if response.code not in AsyncAPIHelper.RETRY_STATUS:
+                break
+
+        return response
+
+    async def get_api_endpoint_urls(self):
+        """Lookup for SQuaSH API endpoints and return the
+        corresponding URLs, see `APIHelper.get_api_endpoint_urls`
+        """
+        return await self.get_json(self.squash_api_url)
+
+    async def get_json(self, url, params=None, ttl=DEFAULT_TTL):
+        """Return the decoded JSON content for an API request,
+        see `APIHelper.get_json`.
+        """
+        key = APICache.make_key(url, params)
+
+        entry = self.cache.get(key)
+        if self.is_usable(entry):
+            return entry.data
+
+        if key in AsyncAPIHelper.pending:
+            return await AsyncAPIHelper.pending[key]
+
+        future = Future()
+        AsyncAPIHelper.pending[key] = future
+
+        try:
+            data = await self.fetch_json(key, entry, url, params, ttl)
+            future.set_result(data)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del AsyncAPIHelper.pending[key]
+
+        return data
+
+    async def fetch_json(self, key, entry, url, params, ttl):
+
+        endpoint = JSONDecoder.get_endpoint(url, self.squash_api_url)
+
+        # Fail fast while the endpoint is unhealthy
+        breaker = get_breaker(endpoint)
+        if not breaker.allow():
+            return self.serve_stale(entry)
+
+        request = self.make_request(url, params,
+                                    self.get_conditional_headers(entry))
+
+        r = await self.fetch(request)
+
+        if r.code == 304 and entry:
+            # Not modified, reuse the decoded content
+            breaker.success()
+            return self.cache.revalidate(key, entry).data
+
+        try:
+            r.rethrow()
+            data = self.decoder.decode(r.body, endpoint, r.headers)
+        except Exception as e:
+            print(e)
+            if r.code >= 500:
+                breaker.failure()
+            else:
+                breaker.success()
+            return self.serve_stale(entry)
+
+        breaker.success()
+
+        self.cache.set(key, data, ttl, r.headers.get('ETag'),
+                       r.headers.get('Last-Modified'))
+
+        return data
+
+    async def get_api_data(self, endpoint, item=None, params=None):
+        """Return data from an SQuaSH API endpoint as a python
+        dictionary, see `APIHelper.get_api_data`.
+        """
+        self.record_request(endpoint, item, params)
+
+        endpoint_urls = await self.get_api_endpoint_urls()
+
+        data = None
+        if endpoint_urls:
+
+            url = endpoint_urls[endpoint]
+
+            if item:
+                url = "{}/{}".format(url, item)
+
+            data = await self.get_json(url, params, self.get_ttl(endpoint))
+
+        return data
+
+    async def get_api_blob_arrays(self, item, names, params=None,
+                                  on_progress=None):
+        """Return arrays from a data blob as numpy arrays, parsing the
+        response while it is downloaded, see
+        `APIHelper.get_api_blob_arrays`.
+        """
+        endpoint_urls = await self.get_api_endpoint_urls()
+
+        arrays = {name: np.array([]) for name in names}
+
+        if not endpoint_urls:
+            return arrays
+
+        url = "{}/{}".format(endpoint_urls['blob'], item)
+
+        key = "{}#{}".format(APICache.make_key(url, params), ",".join(names))
+
+        # Data blobs never change
+        entry = self.cache.get(key)
+        if entry:
+            return entry.data
+
+        breaker = get_breaker('blob')
+        if not breaker.allow():
+            return arrays
+
+        reader = BlobReader(names, on_progress=on_progress)
+
+        # The body is not retried since it is parsed as it arrives
+        request = self.make_request(url, params,
+                                    streaming_callback=reader.feed)
+
+        r = await AsyncHTTPClient().fetch(request, raise_error=False)
+
+        if r.code != 200:
+            print(r.error)
+            if r.code >= 500:
+                breaker.failure()
+            else:
+                breaker.success()
+            return arrays
+
+        breaker.success()
+
+        arrays = reader.close()
+        self.cache.set(key, arrays, ttl=None)
+
+        return arrays
+
+    async def get_api_data_as_pandas_df(self, endpoint, item=None,
+                                        params=None):
+        """Return data from a SQuaSH API endpoint as a pandas
+        dataframe, see `APIHelper.get_api_data_as_pandas_df`.
+        """
+        data = await self.get_api_data(endpoint, item, params)
+
+        return self.to_pandas_df(data)
+
+    async def get_packages(self, default=None):
+        """Get a list of packages from the SQuaSH API,
+        see `APIHelper.get_packages`.
+        """
+        data = await self.get_api_data('packages')
+
+        return self.parse_packages(data, default)
+
+    async def get_datasets(self, default=None, ignore=None):
+        """Get a list of datasets from the SQuaSH API,
+        see `APIHelper.get_datasets`.
+        """
+        data = await self.get_api_data('datasets')
+
+        return self.parse_datasets(data, default, ignore)
+
+    async def get_metrics(self, package, default=None):
+        """Get a list of metrics for a given verification package
+        from the SQuaSH API, see `APIHelper.get_metrics`.
+        """
+        data = await self.get_api_data('metrics',
+                                       params={'package': package})
+
+        return self.parse_metrics(data, default)
+
+    async def get_metrics_meta(self, package):
+        """Returns a dict index by metric name with metric metadata
+        for a give package, see `APIHelper.get_metrics_meta`.
+        """
+        data = await self.get_api_data('metrics',
+                                       params={'package': package})
+
+        return self.parse_metrics_meta(data)
+
+    async def get_specs(self, dataset_name, filter_name, metric):
+        """Get the list of specification names for a given metric,
+        see `APIHelper.get_specs`.
+        """
+        data = await self.get_api_data('specs',
+                                       params={'metric': metric,
+                                               'dataset_name': dataset_name,
+                                               'filter_name': filter_name})
+
+        if not (data or {}).get('specs'):
+            # relax constraint on filter_name
+            data = await self.get_api_data('specs',
+                                           params={'metric': metric,
+                                                   'dataset_name':
+                                                   dataset_name})
+
+        return self.parse_specs(data, metric)
@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Number of measurements in the rolling window
+WINDOW = int(os.environ.get('SQUASH_BOKEH_BAND_WINDOW', 20))
+
+# Percentiles of the band, about one standard deviation around the
+# median for a normal noise
+QUANTILES = (0.16, 0.84)
+
+# Columns of the bands data source
+COLUMNS = ['time', 'median', 'lower', 'upper']
+
+
+def get_bands(times, values, start=0, window=None):
+    """Rolling median and percentiles of a time series, computed with
+    windowed pandas operations.
+
+    When measurements are appended, only the bands of the new
+    measurements are computed, from the last `window - 1` measurements
+    before them, e.g.
+
+        tail = values[-(WINDOW - 1):]
+        bands = get_bands(tail_times + new_times, tail + new_values,
+                          start=len(tail))
+
+    Parameters
+    ----------
+    times: list
+        times of the measurements, sorted
+    values: list
+        values of the measurements, not numeric values are ignored
+    start: int
+        index of the first measurement whose bands are returned
+    window: int
+        number of measurements in the rolling window, by default
+        `SQUASH_BOKEH_BAND_WINDOW`
+
+    Return
+    ------
+    bands: dict
+        columns `time`, `median`, `lower` and `upper` for the
+        measurements from `start`
+    """
+    window = window or WINDOW
+
+    # Measurements before the window of `start` don't contribute
+    first = max(start - window + 1, 0)
+
+    values = pd.to_numeric(pd.Series(values[first:]), errors='coerce')
+
+    rolling = values.rolling(window, min_periods=1)
+
+    bands = {'time': times[start:],
+             'median': rolling.median().values[start - first:],
+             'lower': rolling.quantile(QUANTILES[0]).values[start - first:],
+             'upper': rolling.quantile(QUANTILES[1]).values[start - first:]}
+
+    # NaN are not serialized to JSON by bokeh
+    for column in COLUMNS[1:]:
+        bands[column] = np.where(np.isnan(bands[column]), None,
+                                 bands[column]).tolist()
+
+    return bands
@@ -0,0 +1,255 @@
+import re
+
+import numpy as np
+
+# Byte values used by the parser
+QUOTE = ord('"')
+BACKSLASH = ord('\\')
+COMMA = ord(',')
+COLON = ord(':')
+OPEN_OBJECT = ord('{')
+CLOSE_OBJECT = ord('}')
+OPEN_ARRAY = ord('[')
+CLOSE_ARRAY = ord(']')
+WHITESPACE = b' \t\r\n'
+NUMBER_START = b'-0123456789'
+
+# Values that are not numbers
+NOT_A_NUMBER = re.compile(b'["{[]')
+
+
+class BlobReader:
+    """Incremental parser for the data blobs returned by the SQuaSH
+    API, e.g. `/blob/885?metric=validate_drp.AM1`.
+
+    A blob is a JSON object like `{"snr": {"value": [...], ...},
+    "dist": {"value": [...], ...}}`. The reader parses the `value`
+    arrays of the requested names straight into NumPy arrays while
+    the response body arrives, without building Python lists. Other
+    numeric arrays are skipped.
+
+    Parameters
+    ----------
+    names: list
+        names of the arrays to read, e.g. `['snr', 'dist']`
+    size: int
+        expected size of the body in bytes, used to preallocate
+        the arrays
+    on_progress: callable
+        called after each chunk with a dict of the arrays read so
+        far, e.g. to render partial data.
+    """
+
+    # Bytes read from the response at a time
+    CHUNK_SIZE = 1024 * 1024
+
+    # Approximate number of bytes of a number in a JSON array
+    BYTES_PER_VALUE = 20
+
+    def __init__(self, names, size=None, on_progress=None):
+
+        self.names = names
+        self.on_progress = on_progress
+
+        capacity = 1024
+        if size:
+            capacity = max(capacity, size // BlobReader.BYTES_PER_VALUE //
+                           len(names))
+
+        self.values = {name: np.empty(capacity) for name in names}
+        self.count = {name: 0 for name in names}
+
+        self.buffer = b''
+
+        # Stack of [key, expect_key] for the objects being parsed,
+        # None for arrays
+        self.stack = []
+
+        # Name of the array being read, or True for a numeric array
+        # being skipped
+        self.array = None
+
+    def feed(self, chunk):
+        """Parse a chunk of the response body."""
+
+        self.buffer += chunk
+
+        pos = self.parse(self.buffer)
+        self.buffer = self.buffer[pos:]
+
+        if self.on_progress:
+            self.on_progress(self.get_arrays())
+
+    def close(self):
+        """Return the arrays read, the body must be complete."""
+
+        if self.array:
+            self.parse(self.buffer + b']')
+
+        return self.get_arrays()
+
+    def get_arrays(self):
+        return {name: self.values[name][:self.count[name]]
+                for name in self.names}
+
+    def append(self, name, segment):
+        segment = segment.strip()
+        if not segment:
+            return
+
+        # JSON null is read as NaN
+        values = np.fromstring(segment.replace(b'null', b'nan'),
+                               dtype=np.float64, sep=',')
+
+        n = self.count[name]
+        array = self.values[name]
+
+        if n + values.size > array.size:
+            array = np.resize(array, max(2 * array.size, n + values.size))
+            self.values[name] = array
+
+        array[n:n + values.size] = values
+        self.count[name] = n + values.size
+
+    def read_array(self, buffer, pos):
+        """Read numbers up to the end of the array or the last
+        complete number in the buffer."""
+
+        end = buffer.find(b']', pos)
+
+        match = NOT_A_NUMBER.search(buffer, pos, end if end >= 0 else
+                                    len(buffer))
+        if match:
+            # Not an array of numbers, parse it as any other array
+            last = buffer.rfind(b',', pos, match.start())
+
+            if self.array is not True and last >= 0:
+                self.append(self.array, buffer[pos:last])
+
+            self.array = None
+            self.stack.append(None)
+
+            return last + 1 if last >= 0 else pos
+
+        if end < 0 and self.array is True:
+            # skipping, nothing to keep
+            return len(buffer)
+
+        if end < 0:
+            last = buffer.rfind(b',', pos)
+            if last < 0:
+                return pos
+
+            if self.array is not True:
+                self.append(self.array, buffer[pos:last])
+
+            return last + 1
+
+        if self.array is not True:
+            self.append(self.array, buffer[pos:end])
+
+        self.array = None
+
+        return end + 1
+
+    def get_target(self):
+        """Return the name of the array to read at the current
+        position, or None."""
+
+        if len(self.stack) != 2 or None in self.stack:
+            return None
+
+        name, key = self.stack[0][0], self.stack[1][0]
+
+        if key == 'value' and name in self.names:
+            return name
+
+        return None
+
+    def parse(self, buffer):
+        """Parse `buffer` and return the position of the first byte
+        not parsed."""
+
+        pos = 0
+        size = len(buffer)
+
+        while pos < size:
+
+            if self.array:
+                pos = self.read_array(buffer, pos)
+                if self.array:
+                    return pos
+                continue
+
+            c = buffer[pos]
+
+            if c in WHITESPACE:
+                pos += 1
+
+            elif c == QUOTE:
+                end = pos + 1
+                while True:
+                    end = buffer.find(b'"', end)
+                    if end < 0:
+                        return pos
+                    # the quote is escaped if preceded by an odd
+                    # number of backslashes
+                    n = 0
+                    while buffer[end - 1 - n] == BACKSLASH:
+                        n += 1
+                    if n % 2 == 0:
+                        break
+                    end += 1
+
+                frame = self.stack[-1] if self.stack else None
+                if frame and frame[1]:
+                    frame[0] = buffer[pos + 1:end].decode('utf-8')
+
+                pos = end + 1
+
+            elif c == COLON:
+                self.stack[-1][1] = False
+                pos += 1
+
+            elif c == COMMA:
+                if self.stack and self.stack[-1]:
+                    self.stack[-1][1] = True
+                pos += 1
+
+            elif c == OPEN_OBJECT:
+                self.stack.append([None, True])
+                pos += 1
+
+            elif c == OPEN_ARRAY:
+                # peek the first value of the array
+                start = pos + 1
+                while start < size and buffer[start] in WHITESPACE:
+                    start += 1
+                if start == size:
+                    return pos
+
+                target = self.get_target()
+
+                if target:
+                    self.array = target
+                elif buffer[start] in NUMBER_START:
+                    self.array = True
+                else:
+                    self.stack.append(None)
+
+                pos = start
+
+            elif c in (CLOSE_OBJECT, CLOSE_ARRAY):
+                self.stack.pop()
+                pos += 1
+
+            else:
+                # true, false, null or a number
+                end = pos
+                while end < size and buffer[end] not in b',}]':
+                    end += 1
+                if end == size:
+                    return pos
+                pos = end
+
+        return pos
@@ -0,0 +1,208 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import stats
+
+
+class ChangePointDetector:
+    """Detect steps in a metric time series.
+
+    The score at each measurement is the difference between the mean
+    of the `window` measurements after and the `window` measurements
+    before it, in units of the noise of the series. Steps are the
+    local maxima of the absolute score above `threshold`. The scores
+    are computed with cumulative sums, vectorized over the series.
+
+    When measurements are appended to the series, only the scores of
+    the last measurements are computed again, the steps detected
+    before them are final.
+    """
+
+    # Number of measurements averaged on each side of a step
+    WINDOW = int(os.environ.get('SQUASH_BOKEH_CHANGE_WINDOW', 5))
+
+    # Minimum score of a step, in units of the noise
+    THRESHOLD = float(os.environ.get('SQUASH_BOKEH_CHANGE_THRESHOLD', 5))
+
+    # Noise of series without noise, e.g. deterministic metrics,
+    # relative to their largest absolute value
+    EPSILON = float(os.environ.get('SQUASH_BOKEH_CHANGE_EPSILON', 1e-3))
+
+    def __init__(self, window=None, threshold=None):
+
+        self.window = window or ChangePointDetector.WINDOW
+        self.threshold = threshold or ChangePointDetector.THRESHOLD
+
+        self.lock = threading.Lock()
+
+        self.times = np.array([], dtype='datetime64[ms]')
+        self.values = np.array([])
+        self.noise = None
+
+        # Indices of the steps detected
+        self.steps = np.array([], dtype=np.int64)
+
+        self.updates = 0
+        self.full_updates = 0
+
+    def update(self, times, values):
+        """Detect the steps of a series, incrementally if the series
+        extends the previous one.
+
+        Parameters
+        ----------
+        times: array
+            times of the measurements, sorted
+        values: array
+            values of the measurements
+
+        Return
+        ------
+        steps: dict
+            columns `time` (milliseconds since epoch), `before` and
+            `after` (mean values on each side of the step) and `delta`
+        """
+        times = np.asarray(pd.to_datetime(times), dtype='datetime64[ms]')
+        values = pd.to_numeric(pd.Series(values), errors='coerce').values
+
+        valid = ~np.isnan(values)
+        times, values = times[valid], values[valid]
+
+        with self.lock:
+            self.updates += 1
+
+            n = len(self.values)
+
+            if n and len(values) >= n and \
+                    np.array_equal(times[:n], self.times) and \
+                    np.array_equal(values[:n], self.values):
+                # Scores near the end of the previous series change
+                start = max(n - 2 * self.window, 0)
+            else:
+                start = 0
+                self.full_updates += 1
+                self.noise = self.get_noise(values)
+
+            self.times, self.values = times, values
+
+            steps = self.detect(start)
+            self.steps = np.concatenate([self.steps[self.steps < start],
+                                         steps]) if start else steps
+
+            return self.get_steps()
+
+    @staticmethod
+    def get_noise(values):
+        """Robust estimate of the noise of a series, from the median
+        absolute difference between consecutive measurements.
+
+        The median is 0 for piecewise constant series, their noise is
+        then `EPSILON` times their largest absolute value, so that
+        their steps are detected.
+        """
+        if len(values) < 2:
+            return None
+
+        noise = 1.4826 * np.median(np.abs(np.diff(values))) / np.sqrt(2)
+
+        if not noise:
+            noise = ChangePointDetector.EPSILON * np.max(np.abs(values))
+
+        return noise or None
+
+    def detect(self, start):
+        """Return the indices of the steps at or after `start`."""
+
+        w = self.window
+        values = self.values
+        n = len(values)
+
+        if self.noise is None or n < 2 * w:
+            return np.array([], dtype=np.int64)
+
+        # Scores are computed from `start - w` so that the local
+        # maxima at `start` are known
+        first = max(start - w, w)
+        indices = np.arange(first, n - w + 1)
+
+        if len(indices) == 0:
+            return np.array([], dtype=np.int64)
+
+        cumsum = np.concatenate([[0], np.cumsum(values)])
+
+        before = (cumsum[indices] - cumsum[indices - w]) / w
+        after = (cumsum[indices + w] - cumsum[indices]) / w
+
+        score = np.abs(after - before) / (self.noise * np.sqrt(2 / w))
+
+        local_max = pd.Series(score).rolling(2 * w + 1, center=True,
+                                             min_periods=1).max().values
+
+        steps = indices[(score >= self.threshold) & (score == local_max)]
+
+        return steps[steps >= start]
+
+    def get_steps(self):
+        w = self.window
+        cumsum = np.concatenate([[0], np.cumsum(self.values)])
+
+        # Means over the measurements available on each side
+        lo = np.maximum(self.steps - w, 0)
+        hi = np.minimum(self.steps + w, len(self.values))
+
+        before = (cumsum[self.steps] - cumsum[lo]) / (self.steps - lo)
+        after = (cumsum[hi] - cumsum[self.steps]) / (hi - self.steps)
+
+        return {'time': self.times[self.steps].astype(np.int64).tolist(),
+                'before': before.tolist(),
+                'after': after.tolist(),
+                'delta': (after - before).tolist()}
+
+
+class ChangePointStore:
+    """Process wide detectors indexed by series, e.g. `(metric,
+    period)`, so that sessions showing the same series share the
+    detection and live updates are incremental."""
+
+    # Maximum number of series kept
+    SIZE = int(os.environ.get('SQUASH_BOKEH_CHANGE_STORE_SIZE', 64))
+
+    def __init__(self, size=None):
+
+        self.size = size or ChangePointStore.SIZE
+
+        self.detectors = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Return the detector of a series."""
+
+        with self.lock:
+            if key not in self.detectors:
+                self.detectors[key] = ChangePointDetector()
+
+            self.detectors.move_to_end(key)
+
+            while len(self.detectors) > self.size:
+                self.detectors.popitem(last=False)
+
+            return self.detectors[key]
+
+    def get_stats(self):
+        with self.lock:
+            detectors = list(self.detectors.values())
+
+        return {'series': len(detectors),
+                'updates': sum(d.updates for d in detectors),
+                'full_updates': sum(d.full_updates for d in detectors),
+                'steps': sum(len(d.steps) for d in detectors)}
+
+
+def get_detector(key):
+    """Return the process wide detector of a series."""
+
+    return stats.get_instance('change_points', ChangePointStore).get(key)
@@ -0,0 +1,109 @@
+import os
+import time
+import threading
+
+import stats
+
+
+class CircuitBreaker:
+    """Fail fast while an upstream endpoint is unhealthy.
+
+    The breaker opens after `failures` consecutive failed requests,
+    requests are then refused for `reset_timeout` seconds. After that,
+    a single trial request is allowed (half open), the breaker closes
+    if it succeeds and opens again if it fails. If the outcome of the
+    trial is never recorded, e.g. the request raised an unexpected
+    exception, another trial is allowed after `reset_timeout`.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half open'
+
+    # Consecutive failures that open the breaker
+    FAILURES = int(os.environ.get('SQUASH_BOKEH_BREAKER_FAILURES', 3))
+
+    # Time in seconds before a trial request is allowed
+    RESET_TIMEOUT = float(os.environ.get('SQUASH_BOKEH_BREAKER_RESET', 30))
+
+    def __init__(self, failures=None, reset_timeout=None):
+
+        self.failures = failures or CircuitBreaker.FAILURES
+        self.reset_timeout = reset_timeout or CircuitBreaker.RESET_TIMEOUT
+
+        self.lock = threading.Lock()
+
+        self.state = CircuitBreaker.CLOSED
+        self.consecutive_failures = 0
+        self.opened = None
+        self.trial = None
+
+        self.refused = 0
+
+    def allow(self):
+        """Return True if a request can be made."""
+
+        with self.lock:
+            if self.state == CircuitBreaker.CLOSED:
+                return True
+
+            now = time.time()
+
+            if self.state == CircuitBreaker.OPEN and \
+                    now - self.opened >= self.reset_timeout or \
+                    self.state == CircuitBreaker.HALF_OPEN and \
+                    now - self.trial >= self.reset_timeout:
+                self.state = CircuitBreaker.HALF_OPEN
+                self.trial = now
+                return True
+
+            self.refused += 1
+            return False
+
+    def success(self):
+        with self.lock:
+            self.state = CircuitBreaker.CLOSED
+            self.consecutive_failures = 0
+
+    def failure(self):
+        with self.lock:
+            self.consecutive_failures += 1
+
+            if self.state == CircuitBreaker.HALF_OPEN or \
+                    self.consecutive_failures >= self.failures:
+                self.state = CircuitBreaker.OPEN
+                self.opened = time.time()
+
+
+# Circuit breakers indexed by endpoint name
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(endpoint):
+    """Return the circuit breaker for a SQuaSH API endpoint."""
+
+    with _breakers_lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker()
+
+    return _breakers[endpoint]
+
+
+def reset_breakers():
+    """Discard all circuit breakers, e.g. after the SQuaSH API URL
+    changed."""
+
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def get_stats():
+    with _breakers_lock:
+        breakers = sorted(_breakers.items())
+
+    return {"{}.state".format(endpoint): breaker.state
+            for endpoint, breaker in breakers}
+
+
+stats.register('circuit_breakers', get_stats)
@@ -1,6 +1,11 @@
 import os
 import sys
+import numpy as np
 import pandas as pd
+from functools import partial
+from collections import ChainMap, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from tornado import gen
 
 from bokeh.io import curdoc
 from bokeh.models import ColumnDataSource
@@ -10,29 +15,68 @@ BASE_DIR = os.path.dirname(
 )
 sys.path.append(os.path.join(BASE_DIR))
 from api_helper import APIHelper  # noqa
+from live import LivePoller, get_poller  # noqa
+from scheduler import ReloadScheduler  # noqa
+from series_store import Series, get_store  # noqa
+from package_index import PackageIndex  # noqa
+from impact import get_package_impact  # noqa
+from bands import get_bands, WINDOW  # noqa
+from sessions import get_registry  # noqa
+from spec_scan import get_scanner  # noqa
+from mirror import read_api_data  # noqa
+import defaults  # noqa
 
 
 class BaseApp(APIHelper):
 
+    # Filter option to display all the filters of a dataset
+    ALL_FILTERS = 'All filters'
+
+    # Threads fetching the measurements of each filter, shared by
+    # all sessions in the process
+    executor = ThreadPoolExecutor(max_workers=ReloadScheduler.WORKERS)
+
     def __init__(self):
         super().__init__()
         self.doc = curdoc()
 
         self.message = str()
 
-        self.empty = {'job_id': [], 'time': [], 'date_created': [],
-                      'value': [], 'formatted_value': [], 'ci_id': [],
-                      'ci_url': [], 'count': [], 'filter_name': [],
-                      'color': [], 'package_names': [], 'git_urls': []}
+        # Only raw columns are sent to the browser, values are
+        # formatted and colored there, see `Layout`
+        self.empty = {'job_id': [], 'time': [], 'value': [], 'ci_id': [],
+                      'ci_url': [], 'count': [], 'filter_name': []}
+
+        # Packages changed in each CI run, indexed by CI ID, they are
+        # displayed only for the selected measurements
+        self.packages_index = ChainMap({})
+
+        # CI runs streamed in live mode that changed each package,
+        # indexed by package name
+        self.live_package_runs = defaultdict(set)
 
         self.cds = ColumnDataSource(data=self.empty)
 
+        # Rolling median and percentiles of the measurements, for a
+        # single filter
+        self.bands_cds = ColumnDataSource(data=get_bands([], []))
+
+        self.scheduler = ReloadScheduler(self.doc)
+
         self.args = self.parse_args()
 
         self.validate_inputs()
 
         self.load_data()
 
+        if self.live:
+            # The poll is a coroutine, run as a next tick callback
+            self.doc.add_periodic_callback(
+                lambda: self.doc.add_next_tick_callback(self.on_live_update),
+                LivePoller.INTERVAL * 1000)
+
+        get_registry().register(self)
+
     def parse_args(self):
 
         args = self.doc.session_context.request.arguments
@@ -45,19 +89,64 @@ class BaseApp(APIHelper):
 
     def get_dataset_filters(self, dataset):
 
-        dataset_filters = {'validation_data_cfht': ['r'],
-                           'validation_data_hsc': ['HSC-R', 'HSC-I', 'HSC-Y'],
-                           'HSC RC2': ['HSC-G', 'HSC-R', 'HSC-I', 'HSC-Z',
-                                       'HSC-Y', 'NB0921'],
-                           'CI-HiTS2015': ['g']}
+        return defaults.DATASET_FILTERS[dataset]
+
+    def get_filter_options(self):
+        """Filters of the selected dataset, and the option to display
+        all of them if there are several."""
+
+        if len(self.filters) > 1:
+            return self.filters + [BaseApp.ALL_FILTERS]
+
+        return self.filters
+
+    def get_selected_filters(self):
+
+        if self.selected_filter == BaseApp.ALL_FILTERS:
+            return self.filters
+
+        return [self.selected_filter]
+
+    def get_spec_violations(self):
+        """Return the specs violated by the latest measurement of
+        each metric of the selected package, in any of the selected
+        filters, from the last background scan, see `SpecScanner`.
+        """
+        scanner = get_scanner()
+
+        violations = defaultdict(set)
+
+        for filter_name in self.get_selected_filters():
+            result = scanner.get(self.selected_dataset, filter_name,
+                                 self.selected_package) or {}
+
+            for metric, names in result.items():
+                violations[metric].update(names)
+
+        return violations
+
+    def get_metric_options(self):
+        """Options of the metric selector, the metrics that violate
+        a spec are listed first and flagged.
+        """
+        violations = self.get_spec_violations()
+
+        failing = [(metric, "\u2717 {} ({})".format(
+                    metric, ", ".join(sorted(violations[metric]))))
+                   for metric in self.metrics['metrics']
+                   if metric in violations]
 
-        return dataset_filters[dataset]
+        passing = [(metric, metric) for metric in self.metrics['metrics']
+                   if metric not in violations]
+
+        return failing + passing
 
     def validate_inputs(self):
 
         # Datasets
-        self.datasets = self.get_datasets(default="validation_data_cfht",
-                                          ignore=["decam", "unknown"])
+        self.datasets = self.get_datasets(
+            default=defaults.CODE_CHANGES['dataset'],
+            ignore=defaults.CODE_CHANGES['ignore'])
 
         if 'ci_dataset' in self.args:
             self.selected_dataset = self.args['ci_dataset']
@@ -73,7 +162,8 @@ class BaseApp(APIHelper):
         self.selected_filter = self.filters[0]
 
         # Verification Packages
-        self.packages = self.get_packages(default='validate_drp')
+        self.packages = self.get_packages(
+            default=defaults.CODE_CHANGES['package'])
 
         if 'package' in self.args:
             self.selected_package = self.args['package']
@@ -81,8 +171,9 @@ class BaseApp(APIHelper):
             self.selected_package = self.packages['default']
 
         # Metrics
-        self.metrics = self.get_metrics(package=self.selected_package,
-                                        default='validate_drp.AM1')
+        self.metrics = self.get_metrics(
+            package=self.selected_package,
+            default=defaults.CODE_CHANGES['metric'])
 
         if 'metric' in self.args:
             self.selected_metric = self.args['metric']
@@ -92,28 +183,91 @@ class BaseApp(APIHelper):
         self.metrics_meta = self.get_metrics_meta(self.selected_package)
 
         # Period
-        self.periods = {'periods': ['All', 'Last Year', 'Last 6 Months',
-                                    'Last Month'],
-                        'default': 'Last 6 Months'}
+        self.periods = defaults.PERIODS
 
         if 'period' in self.args:
             self.selected_period = self.args['period']
         else:
             self.selected_period = self.periods['default']
 
+        # Live mode, stream new measurements as they arrive
+        self.live = self.args.get('live', 'false').lower() == 'true'
+
+        # Show the rolling bands of the measurements
+        self.bands = self.args.get('bands', 'false').lower() == 'true'
+
     def load_data(self):
 
-        self.load_measurements()
-        self.load_code_changes()
+        self.series, self.impact, self.bands_series = \
+            self.fetch_data(*self.get_selection())
+
         self.update_datasource()
 
-    def load_code_changes(self):
+    def get_selection(self):
+        """Return the current selection, `(dataset, filter, filters,
+        metric, period)`, to load its data in a thread while the
+        widgets change the selection, see `ReloadScheduler`."""
+
+        return (self.selected_dataset, self.selected_filter,
+                self.get_selected_filters(), self.selected_metric,
+                self.selected_period)
+
+    def fetch_data(self, dataset, filter_name, filters, metric, period):
+        """Load measurements and code changes for a selection, it
+        does not modify the session and can run in a thread.
+
+        The merged series is shared with the other sessions showing
+        the same selection, see `SeriesStore`.
 
-        self.code_changes = self.get_api_data_as_pandas_df(
-            endpoint='code_changes',
-            params={'ci_dataset': self.selected_dataset,
-                    'filter_name': self.selected_filter,
-                    'period': self.selected_period})
+        Return
+        ------
+        data: tuple
+            the series, the impact of the packages changed and the
+            rolling bands of the series
+        """
+        key = (dataset, filter_name, metric, period)
+
+        # The measurements of each filter are fetched concurrently
+        measurements = BaseApp.executor.map(
+            partial(self.load_measurements, dataset, metric=metric,
+                    period=period), filters)
+
+        payloads = (self.load_code_changes(dataset, filter_name, period),
+                    *measurements)
+
+        series = get_store().get(key, payloads,
+                                 partial(self.build_series, filter_name))
+
+        # Computed once per series
+        impact = get_store().get(key + ('impact',), (series,),
+                                 self.build_impact)
+
+        bands_series = Series(get_bands([], []))
+
+        if self.bands:
+            bands_series = get_store().get(key + ('bands',), (series,),
+                                           self.build_bands)
+
+        return series, impact, bands_series
+
+    @staticmethod
+    def get_code_changes_params(dataset, filter_name):
+        """The code changes of all filters are looked up at once."""
+
+        params = {'ci_dataset': dataset}
+
+        if filter_name != BaseApp.ALL_FILTERS:
+            params['filter_name'] = filter_name
+
+        return params
+
+    def load_code_changes(self, dataset, filter_name, period):
+
+        # Read from the local mirror if it is enabled
+        return read_api_data(
+            self, 'code_changes',
+            dict(self.get_code_changes_params(dataset, filter_name),
+                 period=period))
 
     @staticmethod
     def get_filter_color(filter_name):
@@ -142,81 +296,296 @@ class BaseApp(APIHelper):
 
         return color
 
-    def load_measurements(self):
+    def load_measurements(self, dataset, filter_name, metric, period):
+
+        return read_api_data(self, 'monitor',
+                             {'ci_dataset': dataset,
+                              'filter_name': filter_name,
+                              'metric': metric,
+                              'period': period})
+
+    def build_series(self, filter_name, code_changes, *measurements):
+        """Merge the measurements payloads of the selected filters
+        and the code changes payload returned by the API.
+        """
+        dfs = [self.to_pandas_df(payload) for payload in measurements]
+        dfs = [df for df in dfs if df.size > 0]
+
+        if not dfs:
+            return Series({})
+
+        df = pd.concat(dfs, ignore_index=True)
+
+        # date_created of the last measurement, as returned by the API
+        last_date_created = max(df['date_created'])
+
+        df = self.format_measurements(df, filter_name)
+
+        code_changes = self.to_pandas_df(code_changes)
+
+        packages = None
+        if code_changes.size > 0:
+            packages = self.index_packages(code_changes)
+            df = self.merge_code_changes(df, code_changes)
+
+        return Series(self.to_columns(df), last_date_created, packages,
+                      self.index_rows(df['ci_id']))
+
+    @staticmethod
+    def build_impact(series):
+        """Impact of the packages changed on the metric, see
+        `get_package_impact`."""
+
+        return Series(get_package_impact(series.data, series.packages))
+
+    @staticmethod
+    def build_bands(series):
+        """Rolling bands of a series, see `get_bands`. Bands are not
+        computed across filters."""
+
+        data = series.data
+
+        if not data or len(set(data['filter_name'])) > 1:
+            return Series(get_bands([], []))
+
+        return Series(get_bands(data['time'], data['value']))
+
+    @staticmethod
+    def index_rows(ci_ids):
+        """Return the rows of each CI run indexed by CI ID."""
+
+        rows = defaultdict(list)
+        for row, ci_id in enumerate(ci_ids):
+            rows[ci_id].append(row)
+
+        return dict(rows)
+
+    def get_package_rows(self, name):
+        """Return the rows of the data source for the CI runs that
+        changed a package.
+
+        Parameters
+        ----------
+        name: str
+            the package name, e.g. `meas_astrom`
+
+        Return
+        ------
+        rows: list
+            row indices, sorted
+        """
+        if not name:
+            return []
+
+        ci_ids = set()
+
+        if isinstance(self.series.packages, PackageIndex):
+            ci_ids.update(self.series.packages.get_package_runs(name))
+
+        # CI runs streamed in live mode
+        ci_ids.update(self.live_package_runs.get(name, ()))
+
+        if self.live:
+            # Rows were appended and rolled over
+            return np.flatnonzero(np.isin(self.cds.data['ci_id'],
+                                          list(ci_ids))).tolist()
 
-        df = self.get_api_data_as_pandas_df(
-            endpoint='monitor',
-            params={'ci_dataset': self.selected_dataset,
-                    'filter_name': self.selected_filter,
-                    'metric': self.selected_metric,
-                    'period': self.selected_period})
+        return sorted(row for ci_id in ci_ids
+                      for row in self.series.rows.get(ci_id, []))
 
+    @staticmethod
+    def index_packages(code_changes):
+        """Return the packages changed in each CI run indexed by
+        CI ID, see `PackageIndex`."""
+
+        return PackageIndex(code_changes['ci_id'], code_changes['packages'])
+
+    @staticmethod
+    def to_columns(df):
+        """Return the columns of a dataframe for a bokeh column data
+        source. Numeric and datetime columns are kept as numpy arrays,
+        which are sent to the browser in binary.
+        """
+        # The dataframes built from the API payloads have object columns
+        for column in ['value', 'count', 'job_id']:
+            if column in df:
+                df[column] = pd.to_numeric(df[column], errors='coerce')
+
+        return {column: df[column].values if df[column].dtype.kind in 'biufM'
+                else df[column].tolist() for column in df}
+
+    @staticmethod
+    def format_measurements(df, filter_name):
+        """Convert the measurements returned by the API to datetime
+        and numeric columns, the string representation of the dates
+        is dropped. `filter_name` is the filter of measurements
+        without one.
+        """
         # Add datetime objects from the string representation
         df['time'] = pd.to_datetime(df['date_created'],
                                     format="%Y-%m-%dT%H:%M:%SZ",
                                     utc=True)
 
-        df['date_created'] = [x.replace('T', ' ').replace('Z', ' ')
-                              for x in df['date_created']]
+        del df['date_created']
 
-        # Assign a color for the selected_filter
-        color = self.get_filter_color(self.selected_filter)
+        df['value'] = pd.to_numeric(df['value'], errors='coerce')
 
-        df['color'] = [color] * len(df['time'])
+        if 'filter_name' not in df:
+            df['filter_name'] = filter_name
 
-        # DM-14376
-        # for displaying the five most significant digits
-        formatted_value = ["{0:.5g}".format(value)
-                           for value in df['value']]
+        return df
 
-        df['formatted_value'] = formatted_value
+    def update_datasource(self):
+        """Display the series loaded in the bokeh column data
+        source.
+        """
+        self.last_date_created = self.series.last_date_created
 
-        self.measurements = df
+        # Packages of the CI runs streamed in live mode are added to
+        # the first map, the series index is shared
+        self.packages_index = ChainMap({}, self.series.packages)
+        self.live_package_runs = defaultdict(set)
 
-    @staticmethod
-    def format_package_data(packages):
+        data = self.series.data or self.empty
 
-        package_names = []
-        git_urls = []
+        if self.live:
+            # New measurements are streamed to the data source, which
+            # modifies the columns, copy them
+            data = {column: list(values) for column, values in data.items()}
 
-        for i, sublist in enumerate(packages):
-            package_names.append([])
-            git_urls.append([])
-            # can be a list or a nan
-            if type(sublist) == list:
-                for package in sublist:
-                    package_names[i].append(package[0])
-                    git_urls[i].append("{}/commit/{}".format(
-                        package[2].replace('.git', ''),
-                        package[1]))
+        self.cds.data = data
 
-        return package_names, git_urls
+        if self.bands:
+            data = self.bands_series.data
 
-    def update_datasource(self):
-        """ Merge measurements and code_changes, and
-        create a bokeh column data source
+            if self.live:
+                data = {column: list(values)
+                        for column, values in data.items()}
+
+            self.bands_cds.data = data
+
+    def merge_code_changes(self, measurements, code_changes):
+        """Merge measurements and code changes by CI ID, only the
+        number of packages changed is added to the measurements, see
+        `index_packages`.
         """
+        # Add count column
+        df = measurements.merge(code_changes[['ci_id', 'count']],
+                                on='ci_id', how='inner')
 
-        if self.measurements.size > 0:
+        # Replace NaN with zeros in count
+        df['count'] = df['count'].fillna(0)
 
-            if self.code_changes.size > 0:
-                # Add packages and count columns
-                df = self.measurements.merge(self.code_changes,
-                                             on='ci_id', how='inner')
+        return df
 
-                # Replace NaN with zeros in count
-                df['count'] = df['count'].fillna(0)
+    def get_live_selection(self):
 
-                # Add list of package names and git urls
-                package_data = self.format_package_data(df['packages'])
+        return (self.selected_dataset, self.selected_filter,
+                self.selected_metric, self.last_date_created)
 
-                df['package_names'], df['git_urls'] = package_data
+    async def on_live_update(self):
+        """Stream the measurements created after the last one
+        displayed, merged with their code changes."""
 
-                self.cds.data = df.to_dict(orient='list')
-            else:
-                self.cds.data = self.measurements.to_dict(orient='list')
-        else:
-            self.cds.data = self.empty
+        poller = get_poller()
+
+        selection = self.get_live_selection()
+
+        dfs = await gen.multi([poller.poll(
+            'monitor', {'ci_dataset': self.selected_dataset,
+                        'filter_name': filter_name,
+                        'metric': self.selected_metric},
+            since=self.last_date_created)
+            for filter_name in self.get_selected_filters()])
+
+        df = pd.concat(dfs, ignore_index=True)
+
+        if df.size == 0:
+            return
+
+        code_changes = await poller.poll('code_changes',
+                                         self.get_code_changes_params(
+                                             self.selected_dataset,
+                                             self.selected_filter))
+
+        # Superseded by a selection change or by another poll
+        if selection != self.get_live_selection():
+            return
+
+        # date_created as returned by the API, indexed by CI ID
+        dates = df.set_index('ci_id')['date_created']
+
+        df = self.format_measurements(df, self.selected_filter)
+
+        # Measurements whose code changes are not available yet, e.g.
+        # the endpoint is unavailable, are streamed in the next poll
+        if code_changes.size == 0:
+            return
+
+        df = self.merge_code_changes(df, code_changes)
+
+        if df.size == 0:
+            return
+
+        self.index_live_packages(
+            code_changes[code_changes['ci_id'].isin(df['ci_id'])])
+
+        self.last_date_created = max(dates[df['ci_id']])
+
+        self.stream_datasource(df)
+
+    def index_live_packages(self, code_changes):
+        """Add the packages changed in the CI runs streamed to the
+        packages index of the session."""
+
+        index = self.index_packages(code_changes)
+
+        self.packages_index.maps[0].update(index)
+
+        for ci_id, packages in index.items():
+            for package in packages:
+                self.live_package_runs[package[0]].add(ci_id)
+
+    def stream_datasource(self, df):
+        """Append new measurements to the bokeh column data source,
+        keeping at most `LivePoller.ROLLOVER` measurements.
+        """
+        columns = list(self.cds.data)
+
+        if not set(columns) <= set(df.columns):
+            # Can't stream columns that are not in the data source
+            return
+
+        data = {column: df[column].tolist() for column in columns}
+
+        if self.bands and self.selected_filter != BaseApp.ALL_FILTERS:
+            # Only the bands of the new measurements are computed
+            tail = max(len(self.cds.data['value']) - WINDOW + 1, 0)
+
+            times = self.cds.data['time'][tail:]
+            values = self.cds.data['value'][tail:]
+
+            self.bands_cds.stream(get_bands(times + data['time'],
+                                            values + data['value'],
+                                            start=len(values)),
+                                  rollover=LivePoller.ROLLOVER)
+
+        self.cds.stream(data, rollover=LivePoller.ROLLOVER)
+
+    def release_data(self):
+        """Drop the series of an idle session, see
+        `SessionRegistry`."""
+
+        self.series = Series({})
+        self.impact = Series(get_package_impact({}, None))
+        self.bands_series = Series(get_bands([], []))
+        self.packages_index = ChainMap({})
+        self.live_package_runs = defaultdict(set)
+        self.cds.data = self.empty
+        self.bands_cds.data = self.bands_series.data
+
+    def restore_data(self):
+        self.reload()
 
     def set_title(self, title):
         self.doc.title = title
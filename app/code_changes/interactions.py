@@ -1,4 +1,10 @@
+from functools import partial
+
+from tornado import gen
+
 from layout import Layout
+from sessions import get_registry
+from spec_scan import get_scanner
 
 
 class Interactions(Layout):
@@ -11,6 +17,15 @@ class Interactions(Layout):
         self.metrics_widget.on_change('value', self.on_change_metric)
         self.period_widget.on_change('active', self.on_change_period)
 
+        # Code changes are shown for the CI runs selected in the plot
+        # or in the table
+        self.cds.selected.on_change('indices', self.on_change_selection)
+
+        self.package_search_widget.on_change('value',
+                                             self.on_change_package_search)
+
+        self.scan_specs()
+
     def on_change_package(self, attr, old, new):
 
         self.selected_package = new
@@ -23,9 +38,11 @@ class Interactions(Layout):
 
         self.metrics_meta = self.get_metrics_meta(self.selected_package)
 
-        self.metrics_widget.options = self.metrics['metrics']
+        self.metrics_widget.options = self.get_metric_options()
         self.selected_metric = self.metrics['metrics'][0]
 
+        self.scan_specs()
+
         # This will trigger a metric change
         self.metrics_widget.value = self.selected_metric
 
@@ -35,7 +52,7 @@ class Interactions(Layout):
         self.logger.debug("Changed dataset: {}".format(self.selected_dataset))
 
         self.filters = self.get_dataset_filters(self.selected_dataset)
-        self.filters_widget.options = self.filters
+        self.filters_widget.options = self.get_filter_options()
 
         self.selected_filter = self.filters[0]
 
@@ -47,30 +64,84 @@ class Interactions(Layout):
         self.selected_filter = new
         self.logger.debug("Changed filter: {}".format(self.selected_filter))
 
-        self.load_data()
+        self.update_metric_options()
+        self.scan_specs()
 
-        self.update_plot()
-        self.update_table()
+        self.reload()
 
     def on_change_period(self, attr, old, new):
 
         self.selected_period = self.periods['periods'][new]
         self.logger.debug("Changed period: {}".format(self.selected_period))
 
-        self.load_data()
-
-        self.update_plot()
-        self.update_table()
+        self.reload()
 
     def on_change_metric(self, attr, old, new):
 
         self.selected_metric = new
         self.logger.debug("Changed metric: {}".format(self.selected_metric))
 
-        self.load_measurements()
+        self.update_plot_title()
+        self.update_footnote()
+
+        self.reload()
+
+    def reload(self):
+        """Reload the data for the current selection, rapid
+        selection changes result in a single reload.
+        """
+        self.stale = None
+
+        load = partial(self.fetch_data, *self.get_selection())
+
+        self.scheduler.schedule(load, self.on_data_loaded)
+
+    def scan_specs(self):
+        """Flag the metrics that violate a spec once the selection
+        is scanned, without blocking the session."""
+
+        self.doc.add_next_tick_callback(self.load_spec_violations)
+
+    async def load_spec_violations(self):
+
+        scanner = get_scanner()
+
+        keys = [(self.selected_dataset, filter_name, self.selected_package)
+                for filter_name in self.get_selected_filters()]
+
+        # Selections already scanned are refreshed in the background
+        await gen.multi([scanner.scan(*key) for key in keys
+                         if scanner.get(*key) is None])
+
+        self.update_metric_options()
+
+    def on_change_selection(self, attr, old, new):
+
+        self.update_code_changes()
+
+    def on_change_package_search(self, attr, old, new):
+        """Select the CI runs that changed the package, they are
+        highlighted in the plot and in the table."""
+
+        self.cds.selected.indices = self.get_package_rows(new.strip())
+
+    def on_data_loaded(self, data):
+
+        self.series, self.impact, self.bands_series = data
+
+        # The session may have been released while loading
+        get_registry().on_render(self)
+
         self.update_datasource()
 
-        self.update_plot_title()
+        # The selection refers to the previous data
+        self.cds.selected.indices = self.get_package_rows(
+            self.package_search_widget.value.strip())
+
+        self.update_package_search()
+        self.update_impact_table()
+        self.update_metric_options()
+
         self.update_plot()
-        self.update_footnote()
         self.update_table()
+        self.update_header()
@@ -1,11 +1,14 @@
 from bokeh.models.widgets import Select, Div, RadioButtonGroup
+from bokeh.models.widgets import AutocompleteInput
 from bokeh.layouts import widgetbox, row, column
 from bokeh.plotting import Figure
-from bokeh.models import HoverTool, Label
-from bokeh.models import Span
+from bokeh.models import HoverTool, Label, CategoricalColorMapper
+from bokeh.models import ColumnDataSource
+from bokeh.models import Span, Band
 
 
 from bokeh.models.widgets import DataTable, TableColumn, HTMLTemplateFormatter
+from bokeh.models.widgets import DateFormatter, NumberFormatter
 
 from base import BaseApp
 
@@ -20,6 +23,14 @@ class Layout(BaseApp):
     LARGE = 1000
     XLARGE = 3000
 
+    # Maximum number of selected CI runs whose code changes are shown
+    MAX_SELECTED = 20
+
+    # Five most significant digits of a value, formatted in the
+    # browser, see DM-14376
+    VALUE_TEMPLATE = "<%= value == null ? '' : " \
+                     "parseFloat(value.toPrecision(5)) %>"
+
     def __init__(self):
         super().__init__()
 
@@ -30,6 +41,8 @@ class Layout(BaseApp):
         self.make_plot()
         self.make_footnote()
         self.make_table()
+        self.make_impact_table()
+        self.make_code_changes()
 
     def make_input_widgets(self):
         """Define the widgets to select dataset, verification package,
@@ -42,7 +55,7 @@ class Layout(BaseApp):
 
         self.filters_widget = Select(title="Filter:",
                                      value=self.selected_filter,
-                                     options=self.filters)
+                                     options=self.get_filter_options())
 
         self.packages_widget = Select(title="Verification package:",
                                       value=self.selected_package,
@@ -50,13 +63,24 @@ class Layout(BaseApp):
 
         self.metrics_widget = Select(title="Metric:",
                                      value=self.selected_metric,
-                                     options=self.metrics['metrics'])
+                                     options=self.get_metric_options())
 
         active = self.periods['periods'].index(self.selected_period)
 
         self.period_widget = RadioButtonGroup(labels=self.periods['periods'],
                                               active=active)
 
+        # Highlight the CI runs that changed a package
+        self.package_search_widget = AutocompleteInput(
+            title="Highlight code changes to package:",
+            placeholder="e.g. meas_astrom")
+
+        self.update_package_search()
+
+    def update_metric_options(self):
+
+        self.metrics_widget.options = self.get_metric_options()
+
     def make_header(self):
         """Header area including a title and message text"""
 
@@ -68,8 +92,13 @@ class Layout(BaseApp):
         title_text = "<h2>The impact of code changes on" \
                      " Key Performance Metrics</h2>"
 
+        # Warn when the SQuaSH API is unavailable and stale data
+        # is displayed
+        message = " ".join(m for m in [self.message,
+                                       self.get_stale_message()] if m)
+
         message_text = "<center><p style='color:red;'>{}</p>" \
-                       "</center>".format(self.message)
+                       "</center>".format(message)
 
         self.header_widget.text = "{}{}".format(title_text, message_text)
 
@@ -102,19 +131,31 @@ class Layout(BaseApp):
         self.plot.x_range.range_padding = 0
         self.plot.xaxis.axis_label = 'Time (UTC)'
 
-        hover = HoverTool(tooltips=[("Time (UTC)", "@date_created"),
+        # DM-14376
+        # for displaying the five most significant digits
+        hover = HoverTool(tooltips=[("Time (UTC)", "@time{%F %T}"),
                                     ("CI ID", "@ci_id"),
-                                    ("Metric measurement", "@formatted_value"),
+                                    ("Metric measurement", "@value{%.5g}"),
                                     ("Filter", "@filter_name"),
-                                    ("# of packages changed", "@count")])
+                                    ("# of packages changed", "@count")],
+                          formatters={'time': 'datetime',
+                                      'value': 'printf'})
 
         self.plot.add_tools(hover)
 
-        self.plot.line(x='time', y='value', color='gray',
-                       legend='filter_name', source=self.cds)
+        if self.bands:
+            self.make_bands()
+
+        self.line = self.plot.line(x='time', y='value', color='gray',
+                                   legend='filter_name', source=self.cds)
+
+        # Color by filter, unknown filters are displayed in gray
+        self.color_mapper = CategoricalColorMapper(nan_color='gray')
 
         self.plot.circle(x='time', y='value',
-                         color='color', legend='filter_name',
+                         color={'field': 'filter_name',
+                                'transform': self.color_mapper},
+                         legend='filter_name',
                          source=self.cds, fill_color='white',
                          size=12)
 
@@ -136,6 +177,20 @@ class Layout(BaseApp):
 
         self.update_plot()
 
+    def make_bands(self):
+        """Rolling median and percentiles of the measurements, they
+        show the noise of the metric.
+        """
+        band = Band(base='time', lower='lower', upper='upper',
+                    source=self.bands_cds, level='underlay',
+                    fill_color='gray', fill_alpha=0.2, line_width=0)
+
+        self.plot.add_layout(band)
+
+        self.plot.line(x='time', y='median', source=self.bands_cds,
+                       legend="Rolling median", color='gray',
+                       line_dash='dashed')
+
     def update_plot(self):
 
         metric_name = self.selected_metric
@@ -151,6 +206,13 @@ class Layout(BaseApp):
 
         self.status.text = ""
 
+        # A line across filters is meaningless
+        self.line.visible = self.selected_filter != Layout.ALL_FILTERS
+
+        self.color_mapper.factors = self.filters
+        self.color_mapper.palette = [self.get_filter_color(filter_name)
+                                     for filter_name in self.filters]
+
         self.update_annotations()
 
         if self.cds.to_df().size < 2:
@@ -159,9 +221,8 @@ class Layout(BaseApp):
     def update_annotations(self):
 
         # Remove previous annotations
-        for r in self.plot.renderers:
-            if r.name == 'annotation':
-                r.visible = False
+        self.plot.renderers = [r for r in self.plot.renderers
+                               if r.name != 'annotation']
 
         specs = self.get_specs(self.selected_dataset,
                                self.selected_filter,
@@ -246,29 +307,20 @@ class Layout(BaseApp):
                       "&ci_dataset={}".format(self.selected_metric,
                                               self.selected_dataset)
 
-            template = '<a href="{}" ><%= formatted_value %>' \
-                       '</a>'.format(app_url)
+            template = '<a href="{}" >{}</a>'.format(app_url,
+                                                     Layout.VALUE_TEMPLATE)
 
         else:
-            template = "<%= formatted_value %>"
+            template = Layout.VALUE_TEMPLATE
 
         # https://squash-restful-api-demo.lsst.codes/AMx?job_id=885
         # &metric=validate_drp.AM1
 
         app_url_formatter = HTMLTemplateFormatter(template=template)
 
-        # Packages
-        template = """<% for (x in git_urls) {
-                      if (x>0) print(", ");
-                      print("<a href=" + git_urls[x] + " target=_blank>"
-                      + value[x] + "</a>")
-                      }; %>
-                   """
-
-        git_url_formatter = HTMLTemplateFormatter(template=template)
-
         columns = [
-            TableColumn(field="date_created", title="Time (UTC)",
+            TableColumn(field="time", title="Time (UTC)",
+                        formatter=DateFormatter(format="%Y-%m-%d %H:%M:%S"),
                         sortable=True, default_sort='descending',
                         width=Layout.TINY),
             TableColumn(field="ci_id", formatter=ci_url_formatter,
@@ -276,14 +328,73 @@ class Layout(BaseApp):
                         width=Layout.TINY),
             TableColumn(field='value', formatter=app_url_formatter,
                         title=title, sortable=False, width=Layout.TINY),
-            # Give room for a large list of package names
-            TableColumn(field="package_names", title="Code changes",
-                        formatter=git_url_formatter, width=Layout.XLARGE,
-                        sortable=False)
+            TableColumn(field="count", title="# of packages changed",
+                        sortable=False, width=Layout.TINY),
         ]
 
         self.table.columns = columns
 
+    def make_impact_table(self):
+        """Packages ranked by their impact on the metric over the
+        selected period."""
+
+        self.impact_cds = ColumnDataSource(data=self.impact.data)
+
+        value = NumberFormatter(format='0.000')
+
+        columns = [
+            TableColumn(field='package', title='Package'),
+            TableColumn(field='runs', title='Runs'),
+            TableColumn(field='mean_delta', title='Mean change',
+                        formatter=value),
+            TableColumn(field='max_abs_delta', title='Max |change|',
+                        formatter=value),
+        ]
+
+        self.impact_table = DataTable(source=self.impact_cds,
+                                      columns=columns, width=Layout.MEDIUM,
+                                      height=Layout.MEDIUM + 100,
+                                      editable=False, index_position=None)
+
+    def update_impact_table(self):
+
+        self.impact_cds.data = self.impact.data
+
+    def update_package_search(self):
+        """Complete with the packages changed in the series loaded."""
+
+        self.package_search_widget.completions = sorted(
+            getattr(self.series.packages, 'names', []), key=str.lower)
+
+    def make_code_changes(self):
+        """Packages changed in the CI runs selected in the plot or
+        in the table."""
+
+        self.code_changes_widget = Div()
+
+    def update_code_changes(self):
+
+        ci_ids = self.cds.data['ci_id']
+
+        ci_ids = [ci_ids[i] for i in
+                  self.cds.selected.indices[:Layout.MAX_SELECTED]
+                  if i < len(ci_ids)]
+
+        text = ""
+
+        for ci_id in ci_ids:
+            packages = self.packages_index.get(ci_id, [])
+
+            links = ", ".join("<a href={}/commit/{} target=_blank>{}"
+                              "</a>".format(git_url.replace('.git', ''),
+                                            sha, name)
+                              for name, sha, git_url in packages)
+
+            text += "<p><strong>CI ID {}</strong> code changes: " \
+                    "{}</p>".format(ci_id, links or "none")
+
+        self.code_changes_widget.text = text
+
     def make_layout(self):
         """App layout
         """
@@ -299,9 +410,17 @@ class Layout(BaseApp):
 
         footnote = widgetbox(self.footnote, width=Layout.LARGE)
 
+        package_search = widgetbox(self.package_search_widget,
+                                   width=Layout.SMALL)
+
+        code_changes = widgetbox(self.code_changes_widget,
+                                 width=Layout.LARGE)
+
         layout = column(header,
                         row(datasets, filters, packages, metrics),
-                        period, plot_title, self.plot,
-                        footnote, self.table)
+                        period, plot_title,
+                        row(self.plot, self.impact_table),
+                        footnote, package_search, self.table,
+                        code_changes)
 
         self.add_layout(layout)
@@ -0,0 +1,9 @@
+import os
+import sys
+
+BASE_DIR = os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))
+)
+sys.path.append(os.path.join(BASE_DIR))
+from lifecycle import on_server_loaded, on_server_unloaded  # noqa
+from lifecycle import on_session_created, on_session_destroyed  # noqa
@@ -0,0 +1,22 @@
+# Default selections of the apps, also fetched by `Warmup` to keep
+# the payloads of the default dashboards in the cache
+
+# Periods of the apps, see `BaseApp.validate_inputs`
+PERIODS = {'periods': ['All', 'Last Year', 'Last 6 Months', 'Last Month'],
+           'default': 'Last 6 Months'}
+
+CODE_CHANGES = {'dataset': 'validation_data_cfht',
+                'ignore': ['decam', 'unknown'],
+                'package': 'validate_drp',
+                'metric': 'validate_drp.AM1'}
+
+MONITOR = {'package': 'demo1',
+           'metric': 'demo1.ZeropointRMS'}
+
+# Filters of each dataset, the first one is selected by default
+# TODO filter should be a dataset property see DM-15317
+DATASET_FILTERS = {'validation_data_cfht': ['r'],
+                   'validation_data_hsc': ['HSC-R', 'HSC-I', 'HSC-Y'],
+                   'HSC RC2': ['HSC-G', 'HSC-R', 'HSC-I', 'HSC-Z',
+                               'HSC-Y', 'NB0921'],
+                   'CI-HiTS2015': ['g']}
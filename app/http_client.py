@@ -0,0 +1,176 @@
+import os
+import time
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import stats
+from json_decoder import ACCEPT_ENCODING
+
+
+# Start of the request made by each thread, see `JitteredRetry`
+_request = threading.local()
+
+
+class JitteredRetry(Retry):
+    """Exponential backoff with full jitter, so that sessions retrying
+    after an upstream failure don't retry all at the same time.
+
+    Requests are not retried after `deadline` seconds since the
+    start of the request made by the thread, see `HTTPClient.get`.
+    """
+
+    def __init__(self, *args, deadline=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.deadline = deadline
+
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.deadline = self.deadline
+
+        return retry
+
+    def get_remaining(self):
+        """Seconds left before the deadline, `None` without one."""
+
+        start = getattr(_request, 'start', None)
+
+        if self.deadline is None or start is None:
+            return None
+
+        return self.deadline - (time.monotonic() - start)
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+
+        remaining = self.get_remaining()
+        if remaining is not None:
+            backoff = min(backoff, max(remaining, 0))
+
+        return random.uniform(0, backoff)
+
+    def is_exhausted(self):
+        remaining = self.get_remaining()
+
+        if remaining is not None and remaining <= 0:
+            return True
+
+        return super().is_exhausted()
+
+
+class HTTPClient:
+    """HTTP client shared by all sessions in the bokeh server process.
+
+    The connections to the SQuaSH API are kept alive in a pool and
+    reused across sessions. Requests have connect and read timeouts,
+    and failed requests are retried with exponential backoff and
+    jitter until an overall deadline. Requests made from the IOLoop
+    thread block the server, so the defaults are kept short.
+    """
+
+    # Maximum number of connections kept alive per host
+    POOL_SIZE = int(os.environ.get('SQUASH_BOKEH_POOL_SIZE', 10))
+
+    # Timeouts in seconds
+    CONNECT_TIMEOUT = float(os.environ.get('SQUASH_BOKEH_CONNECT_TIMEOUT',
+                                           3.05))
+    READ_TIMEOUT = float(os.environ.get('SQUASH_BOKEH_READ_TIMEOUT', 10))
+
+    # Number of retries and backoff factor in seconds, the n-th retry
+    # waits up to BACKOFF * 2 ** (n - 1)
+    RETRIES = int(os.environ.get('SQUASH_BOKEH_RETRIES', 2))
+    BACKOFF = float(os.environ.get('SQUASH_BOKEH_BACKOFF', 0.25))
+
+    # Time in seconds after which a request is no longer retried
+    DEADLINE = float(os.environ.get('SQUASH_BOKEH_DEADLINE', 15))
+
+    # Responses that are retried
+    RETRY_STATUS = [502, 503, 504]
+
+    def __init__(self, pool_size=None, connect_timeout=None,
+                 read_timeout=None, retries=None, backoff=None,
+                 deadline=None):
+
+        self.pool_size = pool_size or HTTPClient.POOL_SIZE
+
+        self.timeout = (connect_timeout or HTTPClient.CONNECT_TIMEOUT,
+                        read_timeout or HTTPClient.READ_TIMEOUT)
+
+        retry = JitteredRetry(total=retries or HTTPClient.RETRIES,
+                              backoff_factor=backoff or HTTPClient.BACKOFF,
+                              status_forcelist=HTTPClient.RETRY_STATUS,
+                              raise_on_status=False,
+                              deadline=deadline or HTTPClient.DEADLINE)
+
+        self.adapter = HTTPAdapter(pool_maxsize=self.pool_size,
+                                   max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+
+        # Ask for compressed responses, data blobs are large
+        self.session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+
+        self.lock = threading.Lock()
+        self.active = 0
+        self.requests = 0
+        self.errors = 0
+
+    def get(self, url, **kwargs):
+        """Same as `requests.Session.get`, with the client timeouts
+        by default."""
+
+        kwargs.setdefault('timeout', self.timeout)
+
+        with self.lock:
+            self.active += 1
+            self.requests += 1
+
+        _request.start = time.monotonic()
+
+        try:
+            return self.session.get(url, **kwargs)
+        except requests.exceptions.RequestException:
+            with self.lock:
+                self.errors += 1
+            raise
+        finally:
+            _request.start = None
+
+            with self.lock:
+                self.active -= 1
+
+    def get_stats(self):
+        """Return the number of requests and the utilization of the
+        connection pools."""
+
+        connections = 0
+        idle = 0
+
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            connections += pool.num_connections
+            if pool.pool:
+                # the queue holds idle connections, or None for
+                # connections not created yet
+                idle += sum(1 for conn in list(pool.pool.queue) if conn)
+
+        return {'pool_size': self.pool_size,
+                'pools': len(pools),
+                'connections_created': connections,
+                'connections_idle': idle,
+                'active_requests': self.active,
+                'requests': self.requests,
+                'errors': self.errors}
+
+
+def get_http_client():
+    """Return the process wide HTTP client."""
+
+    return stats.get_instance('http', HTTPClient)
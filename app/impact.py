@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+from package_index import PackageIndex
+
+# Columns of the impact table
+COLUMNS = ['package', 'runs', 'mean_delta', 'max_abs_delta']
+
+
+def get_package_impact(data, packages):
+    """Attribute the change of a metric between consecutive CI runs
+    to the packages changed in the later run, and aggregate it per
+    package.
+
+    Parameters
+    ----------
+    data: dict
+        measurements with `ci_id`, `time`, `value` and `filter_name`
+        columns, consecutive runs are compared per filter
+    packages: PackageIndex
+        packages changed in each CI run
+
+    Return
+    ------
+    impact: dict
+        columns `package`, `runs` (number of runs that changed the
+        package), `mean_delta` and `max_abs_delta`, sorted by
+        decreasing `max_abs_delta`
+    """
+    empty = {column: [] for column in COLUMNS}
+
+    if not isinstance(packages, PackageIndex) or not data:
+        return empty
+
+    df = pd.DataFrame({column: data[column] for column in
+                       ['ci_id', 'time', 'value', 'filter_name']})
+
+    df = df.sort_values('time', kind='mergesort')
+
+    df['delta'] = df.groupby('filter_name')['value'].diff()
+
+    df['run'] = df['ci_id'].map(packages.runs)
+
+    df = df.dropna(subset=['delta', 'run'])
+
+    runs = df['run'].values.astype(np.int64)
+
+    # Expand each delta to the packages of its run, the positions
+    # of the packages of the runs in the CSR arrays
+    counts = packages.get_counts()[runs]
+
+    total = counts.sum()
+    if total == 0:
+        return empty
+
+    starts = np.repeat(packages.offsets[runs] - (np.cumsum(counts) - counts),
+                       counts)
+
+    package_ids = packages.package_ids[starts + np.arange(total)]
+    deltas = np.repeat(df['delta'].values, counts)
+
+    impact = pd.DataFrame({'package_id': package_ids,
+                           'delta': deltas,
+                           'abs_delta': np.abs(deltas)})
+
+    grouped = impact.groupby('package_id')
+
+    result = pd.DataFrame({'runs': grouped['delta'].count(),
+                           'mean_delta': grouped['delta'].mean(),
+                           'max_abs_delta': grouped['abs_delta'].max()})
+
+    result['package'] = np.array(packages.names, dtype=object)[result.index]
+
+    result = result.sort_values('max_abs_delta', ascending=False,
+                                kind='mergesort')
+
+    return {column: result[column].tolist() for column in COLUMNS}
@@ -0,0 +1,178 @@
+import os
+import sys
+import time
+import logging
+import threading
+import traceback
+from collections import deque
+
+import numpy as np
+from tornado.ioloop import IOLoop
+
+import stats
+from sessions import hash_session_id
+
+
+class IOLoopWatchdog:
+    """Measure the IOLoop scheduling lag and report callbacks blocking
+    the loop.
+
+    A beat is scheduled on the IOLoop every `interval` seconds, the
+    lag is the difference between the time the beat was expected and
+    the time it actually ran. A separate thread checks the last beat,
+    if the loop is stalled for more than `threshold` seconds it logs
+    the app, session and URL arguments of the callback being executed.
+    """
+
+    # Time between beats in seconds
+    INTERVAL = float(os.environ.get('SQUASH_BOKEH_LAG_INTERVAL', 0.5))
+
+    # Lag in seconds above which a stalled callback is reported
+    THRESHOLD = float(os.environ.get('SQUASH_BOKEH_LAG_THRESHOLD', 1.0))
+
+    # Number of lag samples used to compute percentiles
+    SAMPLES = 1000
+
+    def __init__(self, interval=None, threshold=None):
+        self.logger = logging.getLogger()
+
+        self.interval = interval or IOLoopWatchdog.INTERVAL
+        self.threshold = threshold or IOLoopWatchdog.THRESHOLD
+
+        self.lags = deque(maxlen=IOLoopWatchdog.SAMPLES)
+        self.stalls = 0
+
+        self.io_loop = None
+        self.loop_thread_id = None
+
+        self._scheduled = None
+        self._last_beat = None
+        self._reported = False
+        self._stopped = threading.Event()
+
+    def start(self, io_loop=None):
+        """Start measuring the lag on `io_loop`, by default
+        the current IOLoop. It must be called from the thread running
+        the IOLoop, e.g. in `on_server_loaded`, so that a stall before
+        the first beat is reported.
+        """
+        self.io_loop = io_loop or IOLoop.current()
+        self.loop_thread_id = threading.get_ident()
+
+        self._last_beat = time.monotonic()
+        self._schedule()
+
+        thread = threading.Thread(target=self._watch, daemon=True,
+                                  name='ioloop-watchdog')
+        thread.start()
+
+    def stop(self):
+        """Stop checking the IOLoop, the beats stop with it."""
+
+        self._stopped.set()
+
+    def _schedule(self):
+        if self._stopped.is_set():
+            return
+
+        self._scheduled = time.monotonic() + self.interval
+        self.io_loop.call_later(self.interval, self._beat)
+
+    def _beat(self):
+        now = time.monotonic()
+
+        self.loop_thread_id = threading.get_ident()
+        self.lags.append(max(0.0, now - self._scheduled))
+
+        self._last_beat = now
+        self._reported = False
+
+        self._schedule()
+
+    def _watch(self):
+        while not self._stopped.wait(self.interval):
+
+            stalled = time.monotonic() - self._last_beat - self.interval
+
+            if stalled > self.threshold and not self._reported:
+                self._reported = True
+                self.stalls += 1
+                self.report(stalled)
+
+    def report(self, stalled):
+        """Log the callback that is blocking the IOLoop."""
+
+        frames = sys._current_frames()
+        frame = frames.get(self.loop_thread_id)
+
+        if frame is None:
+            return
+
+        stack = traceback.extract_stack(frame)
+        context = self.get_app_context(frame)
+
+        message = "IOLoop blocked for more than {:.2f}s by {} in app " \
+                  "`{}`, session `{}`, URL arguments {}.\n{}"
+
+        self.logger.warning(message.format(
+            stalled, context['callback'], context['app'],
+            context['session'], context['args'],
+            ''.join(traceback.format_list(stack[-5:]))))
+
+    @staticmethod
+    def get_app_context(frame):
+        """Walk the stack from `frame` looking for the outermost
+        method of a squash-bokeh app, and return the app name, the
+        hash of the bokeh session id, see `hash_session_id`, and the
+        URL arguments of the session.
+        """
+        context = {'app': None, 'session': None, 'args': None,
+                   'callback': frame.f_code.co_name}
+
+        while frame is not None:
+            app = frame.f_locals.get('self')
+
+            if hasattr(app, 'doc') and hasattr(app, 'args'):
+                filename = frame.f_code.co_filename
+
+                context['app'] = os.path.basename(os.path.dirname(filename))
+                context['args'] = app.args
+                context['callback'] = frame.f_code.co_name
+
+                session_context = app.doc.session_context
+                if session_context:
+                    context['session'] = hash_session_id(
+                        session_context.id)
+
+            frame = frame.f_back
+
+        return context
+
+    def get_stats(self):
+        """Return lag percentiles in milliseconds and the number of
+        stalls reported."""
+
+        lags = np.array(self.lags) * 1000
+
+        if lags.size == 0:
+            lags = np.zeros(1)
+
+        p50, p90, p99 = np.percentile(lags, [50, 90, 99])
+
+        return {'lag_p50_ms': round(p50, 2),
+                'lag_p90_ms': round(p90, 2),
+                'lag_p99_ms': round(p99, 2),
+                'lag_max_ms': round(lags.max(), 2),
+                'stalls': self.stalls}
+
+
+def start_watchdog(io_loop=None):
+    """Start the process wide watchdog, only once."""
+
+    def start():
+        watchdog = IOLoopWatchdog()
+        watchdog.start(io_loop)
+
+        return watchdog
+
+    return stats.get_instance('ioloop', start)
@@ -0,0 +1,133 @@
+import os
+import json
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+
+# Optional fast JSON libraries
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+# Optional brotli support, used by urllib3 to decode responses
+try:
+    import brotli  # noqa
+    BROTLI = True
+except ImportError:
+    BROTLI = False
+
+# Content codings accepted from the SQuaSH API
+ACCEPT_ENCODING = "br, gzip, deflate" if BROTLI else "gzip, deflate"
+
+
+# Available decoders, indexed by name. A decoder takes the response
+# body as bytes and returns the decoded content.
+decoders = {'json': json.loads}
+
+if ujson:
+    decoders['ujson'] = ujson.loads
+
+if orjson:
+    decoders['orjson'] = orjson.loads
+
+
+def register_decoder(name, loads):
+    """Make a JSON decoder available, e.g.
+    `register_decoder('rapidjson', rapidjson.loads)`.
+    """
+    decoders[name] = loads
+
+
+def get_default_decoder():
+    """Return the name of the fastest decoder available."""
+
+    for name in ['orjson', 'ujson', 'json']:
+        if name in decoders:
+            return name
+
+
+class JSONDecoder:
+    """Decode the JSON responses from the SQuaSH API, and profile
+    the time spent decoding and the bytes transferred per endpoint.
+    """
+
+    # Name of the decoder to use, by default the fastest available
+    DECODER = os.environ.get('SQUASH_BOKEH_JSON_DECODER')
+
+    def __init__(self, name=None):
+
+        self.name = name or JSONDecoder.DECODER or get_default_decoder()
+        self.loads = decoders[self.name]
+
+        self.profile = defaultdict(lambda: defaultdict(float))
+
+    @staticmethod
+    def get_endpoint(url, api_url=''):
+        """Return the endpoint name from an API URL, e.g. `blob`
+        for `https://squash-restful-api.lsst.codes/blob/885`
+
+        Parameters
+        ----------
+        url: str
+            the request URL
+        api_url: str
+            the SQuaSH API URL, which may have a path prefix, e.g.
+            `https://example.org/squash`
+        """
+        path = urlparse(url).path.strip('/')
+        prefix = urlparse(api_url).path.strip('/')
+
+        if prefix and (path + '/').startswith(prefix + '/'):
+            path = path[len(prefix):].strip('/')
+
+        return path.split('/')[0] or 'root'
+
+    def decode(self, content, endpoint, headers):
+        """Decode the body of a response from the SQuaSH API.
+
+        Parameters
+        ----------
+        content: bytes
+            the response body
+        endpoint: str
+            the endpoint requested, see `get_endpoint`
+        headers: dict
+            the response headers
+
+        Return
+        ------
+        data: dict
+            the decoded content
+        """
+        start = time.perf_counter()
+        data = self.loads(content)
+        elapsed = time.perf_counter() - start
+
+        profile = self.profile[endpoint]
+
+        profile['responses'] += 1
+        profile['decode_ms'] += elapsed * 1000
+        profile['bytes'] += len(content)
+
+        # Size of the compressed body, if the API sent it
+        length = headers.get('Content-Length')
+        if length:
+            profile['transferred'] += int(length)
+
+        return data
+
+    def get_stats(self):
+        stats = {'decoder': self.name,
+                 'accept_encoding': ACCEPT_ENCODING}
+
+        for endpoint, profile in sorted(self.profile.items()):
+            for name, value in profile.items():
+                stats["{}.{}".format(endpoint, name)] = round(value, 2)
+
+        return stats
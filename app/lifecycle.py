@@ -0,0 +1,32 @@
+"""Server lifecycle hooks shared by the squash-bokeh apps.
+
+Each app directory has a `server_lifecycle.py` that imports these
+hooks, see https://bokeh.pydata.org/en/latest/docs/user_guide/
+server.html#lifecycle-hooks
+"""
+from ioloop_watchdog import start_watchdog
+from warmup import start_warmup
+from sessions import get_registry, start_reaper
+from spec_scan import start_scanner
+
+
+def on_server_loaded(server_context):
+    """Start the process wide services, this is called once per
+    app but the services are started only once per process.
+    """
+    start_watchdog()
+    start_warmup()
+    start_reaper()
+    start_scanner()
+
+
+def on_server_unloaded(server_context):
+    pass
+
+
+def on_session_created(session_context):
+    pass
+
+
+def on_session_destroyed(session_context):
+    get_registry().unregister(session_context.id)
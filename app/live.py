@@ -0,0 +1,80 @@
+import os
+import time
+
+import stats
+from async_api_helper import AsyncAPIHelper
+
+
+class LivePoller(AsyncAPIHelper):
+    """Poll the SQuaSH API for measurements newer than the ones
+    displayed by the apps in live mode.
+
+    The poller is shared by all sessions in the process, sessions
+    watching the same series within the poll interval get the same
+    API payload, so N viewers cost one upstream request. Polls are
+    coroutines, concurrent polls of a series await the same request
+    and the IOLoop is not blocked while it is made.
+    """
+
+    # Interval in seconds between polls
+    INTERVAL = float(os.environ.get('SQUASH_BOKEH_LIVE_INTERVAL', 60))
+
+    # Maximum number of measurements kept by a live plot
+    ROLLOVER = int(os.environ.get('SQUASH_BOKEH_LIVE_ROLLOVER', 10000))
+
+    # Shortest period supported by the API, new measurements are
+    # always within this period
+    PERIOD = 'Last Month'
+
+    def __init__(self, interval=None):
+        super().__init__()
+
+        # Polls are not counted as requests from the apps
+        self.record_requests = False
+
+        self.interval = interval or LivePoller.INTERVAL
+
+        self.polls = 0
+
+    async def poll(self, endpoint, params, since=None):
+        """Return the entries from `endpoint` created after `since`.
+
+        Parameters
+        ----------
+        endpoint: str
+            `monitor` or `code_changes`
+        params: dict
+            query parameters for the endpoint, the period is
+            replaced by `LivePoller.PERIOD`
+        since: str
+            `date_created` of the last entry seen, in the format
+            returned by the API, e.g. `2018-07-01T12:00:00Z`
+
+        Return
+        ------
+        df: pandas dataframe
+            the new entries
+        """
+        params = dict(params, period=LivePoller.PERIOD)
+
+        # Reuse the payload if it was fetched within the poll
+        # interval, by any session or process
+        self.fetched_after = time.time() - self.interval
+        self.polls += 1
+
+        df = await self.get_api_data_as_pandas_df(endpoint, params=params)
+
+        if since and 'date_created' in df:
+            df = df[df['date_created'] > since]
+
+        return df
+
+    def get_stats(self):
+        return {'polls': self.polls,
+                'interval_s': self.interval}
+
+
+def get_poller():
+    """Return the process wide poller."""
+
+    return stats.get_instance('live', LivePoller)
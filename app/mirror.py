@@ -0,0 +1,340 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from collections import OrderedDict
+
+import stats
+from api_helper import APIHelper
+
+
+class LocalMirror(APIHelper):
+    """Local SQLite copy of the `monitor` and `code_changes` records,
+    kept in sync with the SQuaSH API incrementally.
+
+    Records are stored per endpoint and query parameters, e.g.
+    `(dataset, filter, metric)`, without the period. The first request
+    fetches the period requested, the next ones fetch only the shortest
+    period and store its records again, by ID. A longer period is
+    fetched once, when it is first requested. Payloads for any period
+    are then read from the mirror, so process restarts start from the
+    local copy instead of the API.
+
+    Payloads are returned in the format of the API, the same payload
+    object is returned while the records of a period don't change,
+    like `APICache` does.
+
+    Parameters
+    ----------
+    path: str
+        path of the SQLite database, created if it does not exist
+    """
+
+    # Path of the SQLite database, the mirror is disabled if not set
+    PATH = os.environ.get('SQUASH_BOKEH_MIRROR', '')
+
+    # Interval in seconds between syncs of the same records
+    INTERVAL = float(os.environ.get('SQUASH_BOKEH_MIRROR_INTERVAL', 300))
+
+    # Endpoints mirrored and the column identifying their records
+    ENDPOINTS = {'monitor': 'job_id', 'code_changes': 'ci_id'}
+
+    # Periods of the apps, see `BaseApp.validate_inputs`
+    PERIODS = {'Last Year': timedelta(days=365),
+               'Last 6 Months': timedelta(days=183),
+               'Last Month': timedelta(days=30)}
+
+    # Shortest period supported by the API, fetched by every sync.
+    # Records synced before it started are fetched again entirely
+    PERIOD = 'Last Month'
+
+    # Maximum number of payloads read kept in memory, the least
+    # recently used are dropped
+    SIZE = int(os.environ.get('SQUASH_BOKEH_MIRROR_SIZE', 256))
+
+    def __init__(self, path=None, size=None):
+        super().__init__()
+
+        # Syncs are not counted as requests from the apps
+        self.record_requests = False
+
+        self.path = path or LocalMirror.PATH
+        self.size = size or LocalMirror.SIZE
+
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.lock = threading.Lock()
+
+        with self.lock, self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS records ("
+                            "endpoint TEXT, key TEXT, id TEXT, "
+                            "date_created TEXT, record TEXT, "
+                            "PRIMARY KEY (endpoint, key, id))")
+            self.db.execute("CREATE INDEX IF NOT EXISTS records_date ON "
+                            "records (endpoint, key, date_created)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS syncs ("
+                            "endpoint TEXT, key TEXT, time REAL, "
+                            "start TEXT, PRIMARY KEY (endpoint, key))")
+
+            # Databases created before `start` was added hold the
+            # whole history
+            columns = [column[1] for column in
+                       self.db.execute("PRAGMA table_info(syncs)")]
+            if 'start' not in columns:
+                self.db.execute("ALTER TABLE syncs ADD COLUMN start TEXT")
+
+        # Version of the records of each (endpoint, key), and payloads
+        # read by (endpoint, key, period)
+        self.versions = {}
+        self.payloads = OrderedDict()
+
+        # Time of the last sync of the records whose last sync failed,
+        # by (endpoint, key)
+        self.stale = {}
+
+        self.syncs = 0
+        self.full_syncs = 0
+        self.stored = 0
+        self.reads = 0
+
+    def get_api_data(self, endpoint, item=None, params=None):
+        """Return the records of a mirrored endpoint for a period,
+        synced with the SQuaSH API if needed, see
+        `APIHelper.get_api_data`."""
+
+        # Reads from the apps are counted, so that `Warmup` keeps the
+        # most requested records in sync
+        APIHelper.count_request(endpoint, item, params)
+
+        return self.warm(endpoint, item, params)
+
+    def warm(self, endpoint, item=None, params=None):
+        """Same as `get_api_data`, without counting the request."""
+
+        if endpoint not in LocalMirror.ENDPOINTS or item:
+            return super().get_api_data(endpoint, item, params)
+
+        params = dict(params or {})
+        period = params.pop('period', 'All')
+
+        key = json.dumps(params, sort_keys=True)
+
+        self.sync(endpoint, key, params, period)
+
+        return self.read(endpoint, key, period)
+
+    @staticmethod
+    def get_start(period, now):
+        """Return the `date_created` of the oldest record of a period,
+        an empty string for `All`."""
+
+        if period not in LocalMirror.PERIODS:
+            return ''
+
+        start = datetime.utcfromtimestamp(now) - LocalMirror.PERIODS[period]
+
+        return start.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def sync(self, endpoint, key, params, period='All'):
+        """Store the records of the last month, or of `period` if the
+        records stored don't cover it.
+
+        The whole last month is stored again, records are replaced by
+        ID, so that records created in the same second as the last
+        record stored are not missed.
+        """
+        with self.lock:
+            row = self.db.execute("SELECT time, COALESCE(start, '') FROM "
+                                  "syncs WHERE endpoint = ? AND key = ?",
+                                  (endpoint, key)).fetchone()
+
+        now = time.time()
+        synced, start = row if row else (None, None)
+
+        duration = LocalMirror.PERIODS[LocalMirror.PERIOD].total_seconds()
+
+        # The records stored are continuous since `start`, unless the
+        # last sync is older than the shortest period
+        full = synced is None or now - synced > duration or \
+            LocalMirror.get_start(period, now) < start
+
+        if not full and now - synced < LocalMirror.INTERVAL:
+            return
+
+        fetched = period if full else LocalMirror.PERIOD
+
+        data = super().get_api_data(endpoint, params=dict(
+            params, period=fetched))
+
+        if data is None:
+            # The API is unavailable, serve the records stored
+            if synced:
+                self.stale[(endpoint, key)] = synced
+            return
+
+        self.stale.pop((endpoint, key), None)
+
+        if full:
+            start = LocalMirror.get_start(period, now)
+
+        records = self.to_records(data)
+
+        id_column = LocalMirror.ENDPOINTS[endpoint]
+
+        with self.lock, self.db:
+            changes = self.db.total_changes
+
+            # Records are updated only if they changed
+            self.db.executemany(
+                "INSERT INTO records VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (endpoint, key, id) DO UPDATE SET "
+                "date_created = excluded.date_created, "
+                "record = excluded.record "
+                "WHERE record != excluded.record",
+                [(endpoint, key,
+                  str(record.get(id_column, record.get('date_created'))),
+                  record.get('date_created'), json.dumps(record))
+                 for record in records])
+
+            changes = self.db.total_changes - changes
+
+            self.db.execute("INSERT OR REPLACE INTO syncs VALUES "
+                            "(?, ?, ?, ?)", (endpoint, key, now, start))
+
+            if changes or full:
+                self.versions[(endpoint, key)] = \
+                    self.versions.get((endpoint, key), 0) + 1
+
+        self.syncs += 1
+        self.full_syncs += full
+        self.stored += changes
+
+    def serve_stale(self, entry):
+        """Payloads cached by the process are not used when the API is
+        unavailable, the records stored are served instead."""
+
+        return None
+
+    def get_stale(self, endpoint, params=None):
+        """Return the time of the last sync of the records of a
+        query, if they are served because the API is unavailable,
+        `None` otherwise."""
+
+        params = dict(params or {})
+        params.pop('period', None)
+
+        return self.stale.get((endpoint, json.dumps(params, sort_keys=True)))
+
+    def read(self, endpoint, key, period):
+        """Return the records of a period in the format of the API.
+        Records without `date_created` are returned for any period."""
+
+        cutoff = None
+        if period in LocalMirror.PERIODS:
+            # By day, so that the payload changes at most daily
+            cutoff = (datetime.utcnow().date() -
+                      LocalMirror.PERIODS[period]).strftime(
+                "%Y-%m-%dT00:00:00Z")
+
+        version = self.versions.get((endpoint, key), 0)
+
+        with self.lock:
+            cached = self.payloads.get((endpoint, key, period))
+
+            if cached and cached[0] == (version, cutoff):
+                self.payloads.move_to_end((endpoint, key, period))
+                return cached[1]
+
+            rows = self.db.execute(
+                "SELECT record FROM records WHERE endpoint = ? AND "
+                "key = ? AND (date_created IS NULL OR date_created >= ?) "
+                "ORDER BY date_created",
+                (endpoint, key, cutoff or '')).fetchall()
+
+        payload = self.to_payload([json.loads(row[0]) for row in rows])
+
+        with self.lock:
+            self.payloads[(endpoint, key, period)] = ((version, cutoff),
+                                                      payload)
+            self.payloads.move_to_end((endpoint, key, period))
+
+            while len(self.payloads) > self.size:
+                self.payloads.popitem(last=False)
+
+        self.reads += 1
+
+        return payload
+
+    @staticmethod
+    def to_records(data):
+        """Convert an API payload, a dict of columns, to a list of
+        records."""
+
+        columns = {name: values for name, values in (data or {}).items()
+                   if isinstance(values, list)}
+
+        size = min((len(values) for values in columns.values()), default=0)
+
+        return [{name: values[i] for name, values in columns.items()}
+                for i in range(size)]
+
+    @staticmethod
+    def to_payload(records):
+        """Convert a list of records to an API payload."""
+
+        names = list(dict.fromkeys(name for record in records
+                                   for name in record))
+
+        return {name: [record.get(name) for record in records]
+                for name in names}
+
+    def get_stats(self):
+        with self.lock:
+            records = self.db.execute("SELECT count(*) FROM records"
+                                      ).fetchone()[0]
+
+        return {'records': records,
+                'syncs': self.syncs,
+                'full_syncs': self.full_syncs,
+                'stored': self.stored,
+                'payloads': len(self.payloads),
+                'reads': self.reads}
+
+
+def read_api_data(helper, endpoint, params):
+    """Return a payload from the local mirror if it is enabled, from
+    the SQuaSH API otherwise. Records served from the mirror while the
+    API is unavailable are reported as stale data by the helper, see
+    `APIHelper.get_stale_message`.
+
+    Parameters
+    ----------
+    helper: APIHelper
+        the helper of the session
+    endpoint: str
+        `monitor` or `code_changes`
+    params: dict
+        query parameters for the endpoint
+    """
+    mirror = get_mirror()
+
+    if mirror is None:
+        return helper.get_api_data(endpoint, params=params)
+
+    data = mirror.get_api_data(endpoint, params=params)
+
+    helper.mark_stale(mirror.get_stale(endpoint, params))
+
+    return data
+
+
+def get_mirror():
+    """Return the process wide mirror, or `None` if
+    `SQUASH_BOKEH_MIRROR` is not set."""
+
+    if not LocalMirror.PATH:
+        return None
+
+    return stats.get_instance('mirror', LocalMirror)
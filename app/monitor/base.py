@@ -2,6 +2,8 @@ import os
 import sys
 from datetime import datetime
 
+import pandas as pd
+
 from bokeh.io import curdoc
 from bokeh.models import ColumnDataSource
 BASE_DIR = os.path.dirname(
@@ -9,6 +11,15 @@ BASE_DIR = os.path.dirname(
 )
 sys.path.append(os.path.join(BASE_DIR))
 from api_helper import APIHelper # noqa
+from async_api_helper import AsyncAPIHelper # noqa
+from change_points import get_detector # noqa
+from bands import get_bands, WINDOW # noqa
+from pyramid import get_pyramid # noqa
+from mirror import read_api_data # noqa
+import defaults # noqa
+from live import LivePoller, get_poller # noqa
+from scheduler import ReloadScheduler # noqa
+from sessions import get_registry # noqa
 
 
 class BaseApp(APIHelper):
@@ -25,6 +36,30 @@ class BaseApp(APIHelper):
 
         self.cds = ColumnDataSource(data=self.empty)
 
+        # Rolling median and percentiles of the measurements
+        self.bands_cds = ColumnDataSource(data=get_bands([], []))
+
+        # Daily, weekly and monthly aggregates of the measurements for
+        # the `All` period, and the level displayed
+        self.pyramid = None
+        self.level = 'raw'
+
+        # Range of the aggregated measurements
+        self.range_cds = ColumnDataSource(data={'time': [], 'min': [],
+                                                'max': []})
+
+        # Steps detected in the measurements, see `ChangePointDetector`
+        self.change_points = {'time': [], 'before': [], 'after': [],
+                              'delta': []}
+
+        # Overlaid metrics, a data source and renderers per metric
+        self.overlay_series = {}
+
+        # Fetches the overlaid series concurrently
+        self.async_api = AsyncAPIHelper()
+
+        self.scheduler = ReloadScheduler(self.doc)
+
         self.args = self.parse_args()
 
         self.validate_inputs()
@@ -32,6 +67,14 @@ class BaseApp(APIHelper):
         self.load_data(self.selected_metric,
                        self.selected_period)
 
+        if self.live:
+            # The poll is a coroutine, run as a next tick callback
+            self.doc.add_periodic_callback(
+                lambda: self.doc.add_next_tick_callback(self.on_live_update),
+                LivePoller.INTERVAL * 1000)
+
+        get_registry().register(self)
+
     def parse_args(self):
 
         args = self.doc.session_context.request.arguments
@@ -45,7 +88,7 @@ class BaseApp(APIHelper):
     def validate_inputs(self):
 
         # Verification Packages
-        self.packages = self.get_packages(default='demo1')
+        self.packages = self.get_packages(default=defaults.MONITOR['package'])
 
         if 'package' in self.args:
             self.selected_package = self.args['package']
@@ -54,7 +97,7 @@ class BaseApp(APIHelper):
 
         # Metrics
         self.metrics = self.get_metrics(package=self.selected_package,
-                                        default='demo1.ZeropointRMS')
+                                        default=defaults.MONITOR['metric'])
 
         if 'metric' in self.args:
             self.selected_metric = self.args['metric']
@@ -64,42 +107,244 @@ class BaseApp(APIHelper):
         self.metrics_meta = self.get_metrics_meta(self.selected_package)
 
         # Period
-        self.periods = {'periods': ['All', 'Last Year', 'Last 6 Months',
-                                    'Last Month'],
-                        'default': 'Last 6 Months'}
+        self.periods = defaults.PERIODS
 
         if 'period' in self.args:
             self.selected_period = self.args['period']
         else:
             self.selected_period = self.periods['default']
 
+        # Live mode, stream new measurements as they arrive
+        self.live = self.args.get('live', 'false').lower() == 'true'
+
+        # Overlay mode, compare several metrics of the package
+        self.overlay = self.args.get('overlay', 'false').lower() == 'true'
+
+        # Show the rolling bands of the measurements
+        self.bands = self.args.get('bands', 'false').lower() == 'true'
+
     def load_data(self, selected_metric, selected_period):
 
-        self.load_measurements(selected_metric, selected_period)
+        self.measurements, self.change_points, self.pyramid = \
+            self.load_measurements(selected_metric, selected_period)
 
         self.update_datasource()
 
     def load_measurements(self, metric, period):
+        """Return the measurements of a metric, their change points
+        and aggregates, it does not modify the session and can run in
+        a thread, see `ReloadScheduler`.
+        """
+        # Read from the local mirror if it is enabled
+        measurements = self.to_pandas_df(
+            read_api_data(self, 'monitor', {'metric': metric,
+                                            'period': period}))
+
+        measurements = self.add_time(measurements)
+
+        return (measurements,
+                self.detect_change_points(metric, period, measurements),
+                self.aggregate(metric, period, measurements))
+
+    @staticmethod
+    def detect_change_points(metric, period, df):
+        """Detect the steps in the measurements of a metric, the
+        detection is shared by the sessions showing the same series
+        and incremental when measurements are appended.
+        """
+        if df.size == 0:
+            df = pd.DataFrame({'time': [], 'value': []})
 
-        self.measurements = self.get_api_data_as_pandas_df(
-            endpoint='monitor',
-            params={'metric': metric,
-                    'period': period})
+        detector = get_detector((metric, period))
+
+        return detector.update(df['time'], df['value'])
+
+    @staticmethod
+    def aggregate(metric, period, df):
+        """Return the aggregates of the measurements of the `All`
+        period, or `None` for the other periods. The aggregates are
+        shared by the sessions showing the same metric and incremental
+        when measurements are appended.
+        """
+        if period != 'All':
+            return None
+
+        if df.size == 0:
+            df = pd.DataFrame({'time': [], 'value': []})
+
+        pyramid = get_pyramid((metric, period))
+        pyramid.update(df['time'], df['value'])
+
+        return pyramid
+
+    def get_level(self):
+        """Return the aggregate level to display for the visible
+        range of the plot, see `AggregatePyramid.get_level`.
+        """
+        if self.pyramid is None:
+            return 'raw'
+
+        start, end = None, None
+
+        if hasattr(self, 'plot'):
+            start, end = self.plot.x_range.start, self.plot.x_range.end
+
+        return self.pyramid.get_level(start, end)
+
+    @staticmethod
+    def add_time(df):
+        """Return a copy of the measurements with a datetime object
+        in addition to the string representation."""
+
+        if 'date_created' not in df:
+            # No measurements, e.g. the API is unavailable and
+            # nothing was cached
+            return df.assign(time=[])
 
-        # Add datetime object in addition to string representation
         time = [datetime.strptime(x, "%Y-%m-%dT%H:%M:%SZ")
-                for x in self.measurements['date_created']]
+                for x in df['date_created']]
+
+        return df.assign(time=time)
 
-        self.measurements['time'] = time
+    @staticmethod
+    def normalize(df, metric):
+        """Return the columns of an overlaid series, the values are
+        normalized by their median so that metrics with different
+        units can be compared.
+        """
+        if df.size == 0:
+            return {'time': [], 'date_created': [], 'value': [],
+                    'normalized': [], 'metric': []}
+
+        df = BaseApp.add_time(df)
+
+        value = pd.to_numeric(df['value'], errors='coerce')
+
+        median = value.median()
+        normalized = value / abs(median) if median else value
+
+        return {'time': df['time'].tolist(),
+                'date_created': df['date_created'].tolist(),
+                'value': value.tolist(),
+                'normalized': normalized.tolist(),
+                'metric': [metric] * len(df)}
+
+    async def on_live_update(self):
+        """Stream the measurements created after the last one
+        displayed."""
+
+        metric = self.selected_metric
+
+        # The data source has buckets at the aggregated levels
+        since = None
+        if self.measurements.size > 0:
+            since = self.measurements['date_created'].max()
+
+        df = await get_poller().poll('monitor',
+                                     params={'metric': metric},
+                                     since=since)
+
+        # Superseded by a metric change or by another poll
+        if metric != self.selected_metric or (
+                self.measurements.size > 0 and
+                self.measurements['date_created'].max() != since):
+            return
+
+        if df.size == 0:
+            return
+
+        df = self.add_time(df)
+
+        # The shared detector is fed the whole series, not the
+        # measurements displayed, which are truncated by the rollover
+        self.measurements = pd.concat([self.measurements, df],
+                                      ignore_index=True)
+
+        self.change_points = self.detect_change_points(
+            self.selected_metric, self.selected_period, self.measurements)
+
+        if self.pyramid is None:
+            self.stream_datasource(df)
+        else:
+            self.pyramid = self.aggregate(self.selected_metric,
+                                          self.selected_period,
+                                          self.measurements)
+
+            if self.level == 'raw':
+                self.stream_datasource(df)
+            else:
+                # New measurements change the last buckets
+                self.update_datasource()
+
+        self.update_change_points()
+
+    def stream_datasource(self, df):
+        """Append new measurements to the bokeh column data source,
+        keeping at most `LivePoller.ROLLOVER` measurements.
+        """
+        columns = list(self.cds.data)
+
+        if not set(columns) <= set(df.columns):
+            # Can't stream columns that are not in the data source
+            return
+
+        data = {column: df[column].tolist() for column in columns}
+
+        if self.bands:
+            # Only the bands of the new measurements are computed
+            tail = max(len(self.cds.data['value']) - WINDOW + 1, 0)
+
+            times = self.cds.data['time'][tail:]
+            values = self.cds.data['value'][tail:]
+
+            self.bands_cds.stream(get_bands(times + data['time'],
+                                            values + data['value'],
+                                            start=len(values)),
+                                  rollover=LivePoller.ROLLOVER)
+
+        self.cds.stream(data, rollover=LivePoller.ROLLOVER)
 
     def update_datasource(self):
         """ Create a bokeh column data source for the
         selected dataset and period
         """
-        if self.measurements.size > 0:
-            self.cds.data = self.measurements.to_dict(orient='list')
+        self.level = self.get_level()
+
+        if self.level != 'raw':
+            data = self.pyramid.get_data(self.level)
+
+            self.cds.data = data
+            self.range_cds.data = {column: data[column]
+                                   for column in ['time', 'min', 'max']}
         else:
-            self.cds.data = self.empty
+            self.range_cds.data = {'time': [], 'min': [], 'max': []}
+
+            if self.measurements.size > 0:
+                self.cds.data = self.measurements.to_dict(orient='list')
+            else:
+                self.cds.data = self.empty
+
+        if self.bands:
+            self.bands_cds.data = get_bands(self.cds.data['time'],
+                                            self.cds.data['value'])
+
+    def release_data(self):
+        """Drop the measurements of an idle session, see
+        `SessionRegistry`."""
+
+        self.measurements = self.measurements.iloc[0:0]
+        self.pyramid = None
+        self.cds.data = self.empty
+        self.range_cds.data = {'time': [], 'min': [], 'max': []}
+        self.bands_cds.data = get_bands([], [])
+        self.change_points = {column: [] for column in self.change_points}
+
+        for source, _ in self.overlay_series.values():
+            source.data = self.normalize(pd.DataFrame(), None)
+
+    def restore_data(self):
+        self.reload()
+        self.reload_overlay()
 
     def set_title(self, title):
         self.doc.title = title
@@ -1,4 +1,9 @@
+from functools import partial
+
+from tornado import gen
+
 from layout import Layout
+from sessions import get_registry
 
 
 class Interactions(Layout):
@@ -9,6 +14,14 @@ class Interactions(Layout):
         self.metrics_widget.on_change('value', self.on_change_metric)
         self.period_widget.on_change('active', self.on_change_period)
 
+        # The aggregate level displayed depends on the visible range
+        self.plot.x_range.on_change('start', self.on_change_range)
+        self.plot.x_range.on_change('end', self.on_change_range)
+
+        if self.overlay:
+            self.overlay_widget.on_change('value', self.on_change_overlay)
+            self.reload_overlay()
+
     def on_change_package(self, attr, old, new):
 
         self.selected_package = new
@@ -26,37 +39,106 @@ class Interactions(Layout):
 
         self.metrics_widget.options = self.metrics['metrics']
 
-        self.load_measurements(self.selected_metric,
-                               self.selected_period)
+        if self.overlay:
+            for metric in list(self.overlay_series):
+                self.remove_overlay_series(metric)
 
-        self.update_datasource()
+            # This will trigger an overlay change
+            self.overlay_widget.options = self.metrics['metrics']
+            self.overlay_widget.value = []
 
         self.update_header()
-        self.update_plot()
         self.update_footnote()
-        self.update_table()
+
+        self.reload()
 
     def on_change_period(self, attr, old, new):
 
         self.selected_period = self.periods['periods'][new]
 
-        self.load_data(self.selected_metric,
-                       self.selected_period)
-
-        self.update_plot()
-        self.update_table()
+        self.reload()
+        self.reload_overlay()
 
     def on_change_metric(self, attr, old, new):
 
         self.selected_metric = new
 
-        # No need to reload code changes here
-        self.load_measurements(self.selected_metric,
-                               self.selected_period)
+        self.update_plot_title()
+        self.update_footnote()
+
+        self.reload()
+
+    def reload(self):
+        """Reload the measurements for the current selection, rapid
+        selection changes result in a single reload.
+        """
+        self.stale = None
+
+        load = partial(self.load_measurements, self.selected_metric,
+                       self.selected_period)
+
+        self.scheduler.schedule(load, self.on_data_loaded)
+
+    def on_change_range(self, attr, old, new):
+        """Display a finer or coarser aggregate level when zooming,
+        see `AggregatePyramid`."""
+
+        if self.pyramid is not None and self.get_level() != self.level:
+            self.update_datasource()
+            self.update_plot()
+
+    def on_change_overlay(self, attr, old, new):
+        """Only the series of the metrics added are loaded."""
+
+        for metric in set(old) - set(new):
+            if metric in self.overlay_series:
+                self.remove_overlay_series(metric)
+
+        added = [metric for metric in new if metric not in self.overlay_series]
+
+        for metric in added:
+            self.add_overlay_series(metric)
+
+        if added:
+            self.doc.add_next_tick_callback(partial(self.load_overlay,
+                                                    added))
+
+    def reload_overlay(self):
+        """Reload the series of all the overlaid metrics."""
+
+        if self.overlay and self.overlay_series:
+            self.doc.add_next_tick_callback(
+                partial(self.load_overlay, list(self.overlay_series)))
+
+    async def load_overlay(self, metrics):
+        """Fetch the series of the overlaid metrics concurrently, each
+        series is cached separately, and update their data sources.
+        """
+        period = self.selected_period
+
+        dfs = await gen.multi([self.async_api.get_api_data_as_pandas_df(
+            endpoint='monitor', params={'metric': metric, 'period': period})
+            for metric in metrics])
+
+        if period != self.selected_period:
+            # Superseded by a period change
+            return
+
+        for metric, df in zip(metrics, dfs):
+            # The metric may have been removed meanwhile
+            if metric in self.overlay_series:
+                source, _ = self.overlay_series[metric]
+                source.data = self.normalize(df, metric)
+
+    def on_data_loaded(self, data):
+
+        self.measurements, self.change_points, self.pyramid = data
+
+        # The session may have been released while loading
+        get_registry().on_render(self)
 
         self.update_datasource()
 
-        self.update_plot_title()
         self.update_plot()
-        self.update_footnote()
         self.update_table()
+        self.update_header()
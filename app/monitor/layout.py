@@ -1,7 +1,10 @@
-from bokeh.models.widgets import Select, Div, RadioButtonGroup
+import pandas as pd
+
+from bokeh.models.widgets import Select, Div, RadioButtonGroup, MultiSelect
 from bokeh.layouts import widgetbox, row, column
 from bokeh.plotting import Figure
-from bokeh.models import HoverTool, Label
+from bokeh.models import HoverTool, Label, ColumnDataSource, Span, Band
+from bokeh.palettes import Category10_10
 
 from bokeh.models.widgets import DataTable, TableColumn
 from base import BaseApp
@@ -15,6 +18,8 @@ class Layout(BaseApp):
     MEDIUM = 500
     LARGE = 1000
 
+    LEVEL_NAMES = {'day': 'daily', 'week': 'weekly', 'month': 'monthly'}
+
     def __init__(self):
         super().__init__()
 
@@ -26,6 +31,10 @@ class Layout(BaseApp):
         self.make_footnote()
         self.make_table()
 
+        if self.overlay:
+            self.make_overlay_widget()
+            self.make_overlay_plot()
+
         self.make_layout()
 
     def make_input_widgets(self):
@@ -56,8 +65,13 @@ class Layout(BaseApp):
 
         title_text = "<h2>Monitoring Verification Metrics</h2>"
 
+        # Warn when the SQuaSH API is unavailable and stale data
+        # is displayed
+        message = " ".join(m for m in [self.message,
+                                       self.get_stale_message()] if m)
+
         message_text = "<center><p style='color:red;'>{}</p>" \
-                       "</center>".format(self.message)
+                       "</center>".format(message)
 
         self.header_widget.text = "{}{}".format(title_text, message_text)
 
@@ -102,6 +116,9 @@ class Layout(BaseApp):
 
         self.plot.add_tools(hover)
 
+        if self.bands:
+            self.make_bands()
+
         # Measurements
         self.plot.line(x='time', y='value', source=self.cds,
                        legend="Metric Measurement", color="gray")
@@ -110,6 +127,11 @@ class Layout(BaseApp):
                          color="gray", fill_color="white", size=12,
                          legend="Metric Measurement")
 
+        # Minimum and maximum of the aggregated measurements
+        self.plot.segment(x0='time', y0='min', x1='time', y1='max',
+                          source=self.range_cds, color="gray",
+                          line_alpha=0.5)
+
         self.status = Label(x=350, y=75, x_units='screen', y_units='screen',
                             text="", text_color="lightgray",
                             text_font_size='24pt',
@@ -119,6 +141,20 @@ class Layout(BaseApp):
 
         self.update_plot()
 
+    def make_bands(self):
+        """Rolling median and percentiles of the measurements, they
+        show the noise of the metric.
+        """
+        band = Band(base='time', lower='lower', upper='upper',
+                    source=self.bands_cds, level='underlay',
+                    fill_color='gray', fill_alpha=0.2, line_width=0)
+
+        self.plot.add_layout(band)
+
+        self.plot.line(x='time', y='median', source=self.bands_cds,
+                       legend="Rolling median", color="gray",
+                       line_dash='dashed')
+
     def update_plot(self):
 
         metric_name = self.selected_metric
@@ -137,11 +173,40 @@ class Layout(BaseApp):
             if display_name:
                 self.plot.yaxis[0].axis_label = "{}".format(display_name)
 
+        # Measurements are aggregated on long ranges
+        self.plot.xaxis.axis_label = 'Time (UTC)'
+
+        if self.level != 'raw':
+            self.plot.xaxis.axis_label = 'Time (UTC), {} mean'.format(
+                Layout.LEVEL_NAMES[self.level])
+
         self.status.text = ""
 
         if self.cds.to_df().size < 1:
             self.status.text = "No data to display"
 
+        self.update_change_points()
+
+    def update_change_points(self):
+        """Mark the steps detected in the measurements, increases
+        in red and decreases in blue.
+        """
+        # Remove previous change points
+        self.plot.renderers = [r for r in self.plot.renderers
+                               if r.name != 'change_point']
+
+        for time, delta in zip(self.change_points['time'],
+                               self.change_points['delta']):
+
+            span = Span(name='change_point',
+                        location=time,
+                        dimension='height',
+                        line_color='red' if delta > 0 else 'blue',
+                        line_dash='dashed',
+                        line_width=1)
+
+            self.plot.add_layout(span)
+
     def make_footnote(self):
         """Footnote area to include reference info
         """
@@ -208,6 +273,78 @@ class Layout(BaseApp):
 
         self.table.columns = columns
 
+    def make_overlay_widget(self):
+        """Select the metrics to overlay, in overlay mode"""
+
+        self.overlay_widget = MultiSelect(title="Compare metrics:",
+                                          value=[self.selected_metric],
+                                          options=self.metrics['metrics'],
+                                          size=6)
+
+    def make_overlay_plot(self):
+        """Plot of the selected metrics normalized by their median,
+        linked to the time series plot.
+        """
+        self.overlay_plot = Figure(x_axis_type="datetime",
+                                   x_range=self.plot.x_range,
+                                   height=Layout.SMALL + 100,
+                                   tools="pan, wheel_zoom, xbox_zoom, \
+                                          save, reset",
+                                   active_scroll="wheel_zoom")
+
+        self.overlay_plot.xaxis.axis_label = 'Time (UTC)'
+        self.overlay_plot.yaxis.axis_label = 'Value / median'
+
+        hover = HoverTool(tooltips=[("Metric", "@metric"),
+                                    ("Time (UTC)", "@date_created"),
+                                    ("Metric measurement", "@value")])
+
+        self.overlay_plot.add_tools(hover)
+
+        for metric in self.overlay_widget.value:
+            self.add_overlay_series(metric)
+
+        self.overlay_plot.legend.click_policy = 'hide'
+        self.overlay_plot.legend.location = 'top_left'
+
+    def add_overlay_series(self, metric):
+        """Add a data source and renderers for an overlaid metric,
+        its data is loaded separately.
+        """
+        index = self.metrics['metrics'].index(metric) \
+            if metric in self.metrics['metrics'] else 0
+
+        color = Category10_10[index % len(Category10_10)]
+
+        source = ColumnDataSource(data=self.normalize(pd.DataFrame(),
+                                                      metric))
+
+        label = metric
+        if metric in self.metrics_meta:
+            label = self.metrics_meta[metric]['display_name']
+
+        renderers = [
+            self.overlay_plot.line(x='time', y='normalized', source=source,
+                                   color=color, legend=label),
+            self.overlay_plot.circle(x='time', y='normalized',
+                                     source=source, color=color,
+                                     fill_color='white', size=6,
+                                     legend=label),
+        ]
+
+        self.overlay_series[metric] = (source, renderers)
+
+    def remove_overlay_series(self, metric):
+
+        source, renderers = self.overlay_series.pop(metric)
+
+        self.overlay_plot.renderers = [r for r in self.overlay_plot.renderers
+                                       if r not in renderers]
+
+        for legend in self.overlay_plot.legend:
+            legend.items = [item for item in legend.items
+                            if not set(item.renderers) & set(renderers)]
+
     def make_layout(self):
         """App layout
         """
@@ -226,4 +363,8 @@ class Layout(BaseApp):
                         period, plot_title, self.plot,
                         footnote, self.table)
 
+        if self.overlay:
+            overlay = widgetbox(self.overlay_widget, width=Layout.MEDIUM)
+            layout.children.extend([overlay, self.overlay_plot])
+
         self.add_layout(layout)
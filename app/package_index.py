@@ -0,0 +1,137 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+
+class PackageIndex(Mapping):
+    """Packages changed in each CI run, indexed by CI ID.
+
+    The `packages` of the `code_changes` API payload are lists of
+    `[name, sha, git_url]` per CI run. They are stored as flat arrays
+    like a CSR matrix: package ids, repository URL ids and commit SHAs
+    for all the runs, and the offsets of each run in these arrays.
+    Package names and URLs are interned, so memory scales with the
+    number of distinct packages.
+
+    Parameters
+    ----------
+    ci_ids: list
+        the CI IDs of the runs
+    packages: list
+        the packages changed in each run, a list of `[name, sha,
+        git_url, ...]` or a nan if there are none
+    """
+
+    def __init__(self, ci_ids, packages):
+
+        names = {}
+        urls = {}
+
+        package_ids = []
+        url_ids = []
+        shas = []
+        counts = []
+
+        for run in packages:
+            # can be a list or a nan
+            if not isinstance(run, list):
+                run = []
+
+            # By position, the API may add fields
+            for package in run:
+                package_ids.append(names.setdefault(package[0], len(names)))
+                url_ids.append(urls.setdefault(package[2], len(urls)))
+                shas.append(package[1])
+
+            counts.append(len(run))
+
+        # Distinct package names and repository URLs, by id
+        self.names = list(names)
+        self.urls = list(urls)
+        self.name_ids = names
+
+        self.package_ids = np.array(package_ids, dtype=np.int32)
+        self.url_ids = np.array(url_ids, dtype=np.int32)
+        self.shas = np.array(shas, dtype='S')
+
+        self.offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+
+        self.ci_ids = list(ci_ids)
+        self.runs = {ci_id: run for run, ci_id in enumerate(self.ci_ids)}
+
+        # Inverted index, runs sorted by package and offsets of each
+        # package, the transpose of the run offsets
+        runs = np.repeat(np.arange(len(self.ci_ids)), self.get_counts())
+
+        order = np.argsort(self.package_ids, kind='mergesort')
+
+        self.package_runs = runs[order]
+
+        self.package_offsets = np.zeros(len(self.names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.package_ids, minlength=len(self.names)),
+                  out=self.package_offsets[1:])
+
+    def __getitem__(self, ci_id):
+        return self.get_run_packages(self.runs[ci_id])
+
+    def __iter__(self):
+        return iter(self.runs)
+
+    def __len__(self):
+        return len(self.runs)
+
+    def get_run_packages(self, run):
+        """Return the packages changed in the `run`-th CI run.
+
+        Return
+        ------
+        packages: list
+            a list of `(name, sha, git_url)`
+        """
+        start, end = self.offsets[run], self.offsets[run + 1]
+
+        return [(self.names[package_id], sha.decode('ascii'),
+                 self.urls[url_id])
+                for package_id, url_id, sha in zip(
+                    self.package_ids[start:end], self.url_ids[start:end],
+                    self.shas[start:end])]
+
+    def get_counts(self):
+        """Return the number of packages changed in each run."""
+
+        return np.diff(self.offsets)
+
+    def get_package_runs(self, name):
+        """Return the CI IDs of the runs that changed a package.
+
+        Parameters
+        ----------
+        name: str
+            the package name, e.g. `afw`
+
+        Return
+        ------
+        ci_ids: list
+            CI IDs in the order of the runs
+        """
+        package_id = self.name_ids.get(name)
+
+        if package_id is None:
+            return []
+
+        start = self.package_offsets[package_id]
+        end = self.package_offsets[package_id + 1]
+
+        return [self.ci_ids[run]
+                for run in np.unique(self.package_runs[start:end])]
+
+    @property
+    def nbytes(self):
+        """Bytes held by the arrays."""
+
+        return sum(array.nbytes for array in [self.package_ids,
+                                              self.url_ids, self.shas,
+                                              self.offsets,
+                                              self.package_runs,
+                                              self.package_offsets])
@@ -0,0 +1,251 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import stats
+
+# Aggregate levels, from the finest to the coarsest
+LEVELS = ['raw', 'day', 'week', 'month']
+
+
+def get_buckets(times, level):
+    """Return the start of the bucket of each time for an aggregate
+    level, weeks start on Monday.
+
+    Parameters
+    ----------
+    times: numpy array
+        `datetime64[ms]` times
+    level: str
+        `day`, `week` or `month`
+    """
+    if level == 'day':
+        return times.astype('datetime64[D]').astype('datetime64[ms]')
+
+    if level == 'week':
+        # 1970-01-05 is the first Monday after the epoch
+        days = times.astype('datetime64[D]').astype(np.int64)
+        return ((days - 4) // 7 * 7 + 4).astype('datetime64[D]').astype(
+            'datetime64[ms]')
+
+    if level == 'month':
+        return times.astype('datetime64[M]').astype('datetime64[ms]')
+
+    return times
+
+
+def aggregate(buckets, values):
+    """Aggregate sorted values by bucket, vectorized with `reduceat`.
+
+    Return
+    ------
+    level: dict
+        arrays `time` (bucket start), `count`, `min`, `max`, `value`
+        (mean) and `last`
+    """
+    if len(buckets) == 0:
+        return {'time': buckets, 'count': np.array([], dtype=np.int64),
+                'min': values, 'max': values, 'value': values,
+                'last': values}
+
+    time, starts = np.unique(buckets, return_index=True)
+
+    count = np.diff(np.append(starts, len(values)))
+
+    return {'time': time,
+            'count': count,
+            'min': np.minimum.reduceat(values, starts),
+            'max': np.maximum.reduceat(values, starts),
+            'value': np.add.reduceat(values, starts) / count,
+            'last': values[starts + count - 1]}
+
+
+class AggregatePyramid:
+    """Daily, weekly and monthly aggregates of a metric time series.
+
+    When measurements are appended to the series, only the last
+    bucket of each level and the new ones are aggregated again.
+    """
+
+    # Maximum number of points displayed, the finest level with at
+    # most this number of points in the visible range is displayed
+    POINTS = int(os.environ.get('SQUASH_BOKEH_PYRAMID_POINTS', 500))
+
+    def __init__(self, points=None):
+
+        self.points = points or AggregatePyramid.POINTS
+
+        self.lock = threading.Lock()
+
+        self.times = np.array([], dtype='datetime64[ms]')
+        self.values = np.array([])
+
+        # Bucket of each measurement and aggregates, by level
+        self.buckets = {}
+        self.levels = {}
+
+        self.updates = 0
+        self.full_updates = 0
+
+        self.build(0)
+
+    def update(self, times, values):
+        """Aggregate a series, incrementally if the series extends the
+        previous one.
+
+        Parameters
+        ----------
+        times: array
+            times of the measurements
+        values: array
+            values of the measurements, not numeric values are ignored
+        """
+        times = np.asarray(pd.to_datetime(times), dtype='datetime64[ms]')
+        values = pd.to_numeric(pd.Series(values),
+                               errors='coerce').values.astype(float)
+
+        valid = ~np.isnan(values)
+        times, values = times[valid], values[valid]
+
+        order = np.argsort(times, kind='mergesort')
+        times, values = times[order], values[order]
+
+        with self.lock:
+            self.updates += 1
+
+            n = len(self.times)
+
+            if n and len(times) >= n and \
+                    np.array_equal(times[:n], self.times) and \
+                    np.array_equal(values[:n], self.values):
+                start = n
+            else:
+                start = 0
+                self.full_updates += 1
+
+            self.times, self.values = times, values
+
+            self.build(start)
+
+    def build(self, start):
+        """Aggregate the buckets of the measurements from `start`."""
+
+        if start and start == len(self.times):
+            # No new measurements
+            return
+
+        for level in LEVELS[1:]:
+            buckets = get_buckets(self.times[start:], level)
+
+            if not start:
+                self.buckets[level] = buckets
+                self.levels[level] = aggregate(buckets, self.values)
+                continue
+
+            # The last bucket may have new measurements, it is
+            # aggregated again
+            cut = buckets[0]
+
+            buckets = np.concatenate([self.buckets[level], buckets])
+
+            first = np.searchsorted(buckets, cut)
+            kept = np.searchsorted(self.levels[level]['time'], cut)
+
+            tail = aggregate(buckets[first:], self.values[first:])
+
+            self.buckets[level] = buckets
+            self.levels[level] = {
+                column: np.concatenate([self.levels[level][column][:kept],
+                                        tail[column]])
+                for column in tail}
+
+    def get_level(self, start=None, end=None):
+        """Return the finest level with at most `points` points in the
+        visible range.
+
+        Parameters
+        ----------
+        start, end: float
+            visible range in milliseconds since epoch, `None` for the
+            whole series
+        """
+        with self.lock:
+            for level in LEVELS:
+                times = self.times if level == 'raw' else \
+                    self.levels[level]['time']
+
+                ms = times.astype(np.int64)
+
+                first = 0 if start is None else np.searchsorted(ms, start)
+                last = len(ms) if end is None else \
+                    np.searchsorted(ms, end, side='right')
+
+                if last - first <= self.points:
+                    return level
+
+        return LEVELS[-1]
+
+    def get_data(self, level):
+        """Return the columns of an aggregate level, other than `raw`,
+        for a bokeh column data source. `date_created` is the start of
+        the bucket in the format returned by the API."""
+
+        with self.lock:
+            data = dict(self.levels[level])
+
+        data['date_created'] = [t + 'Z' for t in np.datetime_as_string(
+            data['time'], unit='s')]
+
+        return data
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for level in self.levels.values()
+                   for array in level.values())
+
+
+class PyramidStore:
+    """Process wide aggregate pyramids indexed by series, e.g.
+    `(metric, period)`."""
+
+    # Maximum number of series kept
+    SIZE = int(os.environ.get('SQUASH_BOKEH_PYRAMID_STORE_SIZE', 64))
+
+    def __init__(self, size=None):
+
+        self.size = size or PyramidStore.SIZE
+
+        self.pyramids = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Return the pyramid of a series."""
+
+        with self.lock:
+            if key not in self.pyramids:
+                self.pyramids[key] = AggregatePyramid()
+
+            self.pyramids.move_to_end(key)
+
+            while len(self.pyramids) > self.size:
+                self.pyramids.popitem(last=False)
+
+            return self.pyramids[key]
+
+    def get_stats(self):
+        with self.lock:
+            pyramids = list(self.pyramids.values())
+
+        return {'series': len(pyramids),
+                'updates': sum(p.updates for p in pyramids),
+                'full_updates': sum(p.full_updates for p in pyramids),
+                'bytes': sum(p.nbytes for p in pyramids)}
+
+
+def get_pyramid(key):
+    """Return the process wide pyramid of a series."""
+
+    return stats.get_instance('pyramid', PyramidStore).get(key)
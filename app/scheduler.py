@@ -0,0 +1,104 @@
+import os
+import logging
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ReloadScheduler:
+    """Schedule the data reloads triggered by the widgets of a
+    bokeh session.
+
+    Rapid widget changes are debounced, a reload starts only after
+    no other change was made for `delay` milliseconds. The data is
+    loaded in a thread so that the session keeps receiving widget
+    changes, and a reload superseded by a newer selection is dropped
+    instead of being rendered. At most one reload per session is in
+    flight.
+
+    The load step returns the data instead of modifying the session,
+    which is modified only by the render step, in the session, if the
+    reload was not superseded.
+    """
+
+    # Time in milliseconds to wait for more widget changes
+    DELAY = int(os.environ.get('SQUASH_BOKEH_DEBOUNCE_DELAY', 300))
+
+    # Threads loading data, shared by all sessions in the process
+    WORKERS = int(os.environ.get('SQUASH_BOKEH_LOAD_WORKERS', 4))
+
+    executor = ThreadPoolExecutor(max_workers=WORKERS)
+
+    def __init__(self, doc, delay=None):
+        self.logger = logging.getLogger()
+
+        self.doc = doc
+        self.delay = delay or ReloadScheduler.DELAY
+
+        # Incremented for every new selection
+        self.generation = 0
+
+        self.pending = None
+        self.loading = False
+        self.queued = None
+
+        self.dropped = 0
+
+    def schedule(self, load, render):
+        """Schedule a reload for the current selection.
+
+        Parameters
+        ----------
+        load: callable
+            loads and returns the data, it runs in a thread and
+            must not modify the session or read the selection,
+            bind the selection when scheduling instead.
+        render: callable
+            called with the data loaded to update the session and
+            its bokeh models, it runs in the session only if the
+            reload was not superseded.
+        """
+        self.generation += 1
+
+        if self.pending is not None:
+            self.doc.remove_timeout_callback(self.pending)
+
+        self.pending = self.doc.add_timeout_callback(
+            partial(self.start, self.generation, load, render),
+            self.delay)
+
+    def start(self, generation, load, render):
+        self.pending = None
+
+        if self.loading:
+            # Start when the reload in flight is done
+            self.queued = (generation, load, render)
+            return
+
+        self.loading = True
+
+        future = ReloadScheduler.executor.submit(load)
+
+        def done(future):
+            self.doc.add_next_tick_callback(
+                partial(self.finish, generation, future, render))
+
+        future.add_done_callback(done)
+
+    def finish(self, generation, future, render):
+        self.loading = False
+
+        if self.queued:
+            queued, self.queued = self.queued, None
+            self.start(*queued)
+
+        if generation != self.generation:
+            self.dropped += 1
+            return
+
+        try:
+            data = future.result()
+        except Exception as e:
+            self.logger.error("Failed to load data: {}".format(e))
+            return
+
+        render(data)
@@ -0,0 +1,118 @@
+import os
+import threading
+from collections import OrderedDict
+
+import stats
+
+
+class Series:
+    """A series ready to be displayed, shared read-only by all the
+    sessions showing the same selection.
+
+    Parameters
+    ----------
+    data: dict
+        columns for a bokeh column data source, empty if there are
+        no measurements
+    last_date_created: str
+        `date_created` of the last measurement, as returned by the API
+    packages: dict
+        packages changed in each CI run, indexed by CI ID
+    rows: dict
+        rows of each CI run in `data`, indexed by CI ID
+    """
+
+    def __init__(self, data, last_date_created=None, packages=None,
+                 rows=None):
+
+        self.data = data
+        self.last_date_created = last_date_created
+        self.packages = packages or {}
+        self.rows = rows or {}
+
+    def __len__(self):
+        return len(next(iter(self.data.values()), []))
+
+
+class SeriesStore:
+    """Process wide store of the series built from the SQuaSH API
+    payloads, indexed by selection, e.g. `(dataset, filter, metric,
+    period)`.
+
+    Sessions showing the same selection reference the same series
+    instead of building their own dataframes. A series is built again
+    only when the API payloads it was built from change, the cache
+    returns the same payload objects while they are not modified.
+
+    The columns are shared between the sessions data sources, they
+    must not be modified in place, e.g. with `ColumnDataSource.stream`,
+    copy them first.
+    """
+
+    # Maximum number of series kept
+    SIZE = int(os.environ.get('SQUASH_BOKEH_STORE_SIZE', 64))
+
+    def __init__(self, size=None):
+
+        self.size = size or SeriesStore.SIZE
+
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.builds = 0
+
+    def get(self, key, payloads, build):
+        """Return the series for a selection.
+
+        Parameters
+        ----------
+        key: tuple
+            the selection
+        payloads: tuple
+            the API payloads the series is built from
+        build: callable
+            called with the payloads to build the series if it is
+            not in the store or the payloads changed
+
+        Return
+        ------
+        series: Series
+            the shared series
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry and all(a is b for a, b in zip(entry[0], payloads)):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        # Sessions building the same series concurrently get
+        # equivalent results, the last one is kept
+        series = build(*payloads)
+
+        with self.lock:
+            self.entries[key] = (payloads, series)
+            self.entries.move_to_end(key)
+            self.builds += 1
+
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+        return series
+
+    def get_stats(self):
+        with self.lock:
+            rows = sum(len(series) for _, series in self.entries.values())
+
+            return {'series': len(self.entries),
+                    'rows': rows,
+                    'hits': self.hits,
+                    'builds': self.builds}
+
+
+def get_store():
+    """Return the process wide series store."""
+
+    return stats.get_instance('series_store', SeriesStore)
@@ -0,0 +1,316 @@
+import os
+import sys
+import time
+import hashlib
+import logging
+import weakref
+import threading
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from bokeh.models import ColumnDataSource, Model
+from tornado.ioloop import IOLoop, PeriodicCallback
+
+import stats
+from series_store import Series
+
+# Number of elements of a list measured to estimate its size
+SAMPLE_SIZE = 100
+
+
+def estimate_size(value, depth=3):
+    """Estimate the bytes held by a value, e.g. a dataframe, an array
+    or a dict of columns. Large lists are estimated from a sample of
+    their elements.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(deep=True)))
+
+    if isinstance(value, Series):
+        return estimate_size(value.data, depth) + \
+            estimate_size(value.rows, depth)
+
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+
+    size = sys.getsizeof(value)
+
+    if depth == 0:
+        return size
+
+    if isinstance(value, dict):
+        size += sum(estimate_size(v, depth - 1) for v in value.values())
+
+    elif isinstance(value, (list, tuple)) and value:
+        sample = value[:SAMPLE_SIZE]
+        sampled = sum(estimate_size(v, depth - 1) for v in sample)
+        size += sampled * len(value) // len(sample)
+
+    return size
+
+
+def hash_session_id(session_id):
+    """Return a short hash of a bokeh session id, the session id
+    gives access to the session and must not be displayed."""
+
+    return hashlib.sha256(session_id.encode()).hexdigest()[:12]
+
+
+class Session:
+    """A session of a squash-bokeh app, see `SessionRegistry`."""
+
+    def __init__(self, app):
+
+        self.app = weakref.ref(app)
+
+        self.created = time.time()
+        self.last_activity = self.created
+
+        self.released = False
+
+        # Last memory estimate and when it was made
+        self.memory = None
+        self.measured = None
+
+    @property
+    def name(self):
+        app = self.app()
+        return app.doc.title if app else ""
+
+    def get_memory(self, max_age=0):
+        """Estimate the bytes held by the app data attributes and by
+        the column data sources of its document. Columns shared with
+        other sessions, see `SeriesStore`, are counted in each session.
+
+        Parameters
+        ----------
+        max_age: float
+            the last estimate is returned if it was made less than
+            `max_age` seconds ago
+
+        Return
+        ------
+        memory: dict
+            `data_bytes`, `source_bytes` and number of `models`
+        """
+        now = time.time()
+
+        if self.memory and now - self.measured < max_age:
+            return self.memory
+
+        app = self.app()
+        if app is None:
+            return {'data_bytes': 0, 'source_bytes': 0, 'models': 0}
+
+        data_bytes = sum(estimate_size(value)
+                         for value in list(vars(app).values())
+                         if isinstance(value, (pd.DataFrame, pd.Series,
+                                               Series, np.ndarray,
+                                               dict, list)))
+
+        models = list(app.doc.select({'type': Model}))
+
+        source_bytes = sum(estimate_size(dict(model.data))
+                           for model in models
+                           if isinstance(model, ColumnDataSource))
+
+        self.memory = {'data_bytes': data_bytes,
+                       'source_bytes': source_bytes,
+                       'models': len(models)}
+        self.measured = now
+
+        return self.memory
+
+
+class SessionRegistry:
+    """Track the sessions of the apps, estimate the memory they hold,
+    and release the data of idle sessions.
+
+    A session is idle if no change was made from the browser for
+    `idle_timeout` seconds. Its data is dropped with `app.release_data()`
+    and loaded again with `app.restore_data()` on the next change made
+    from the browser, e.g. a widget change or a pan in the plot.
+    Sessions in live mode are never released.
+    """
+
+    # Time in seconds after which an idle session data is released,
+    # 0 to never release
+    IDLE_TIMEOUT = float(os.environ.get('SQUASH_BOKEH_IDLE_TIMEOUT', 0))
+
+    # Interval in seconds between checks for idle sessions
+    CHECK_INTERVAL = 60
+
+    # Time in seconds the memory estimate of a session is reused, the
+    # status app refreshes every few seconds
+    MEMORY_INTERVAL = float(os.environ.get('SQUASH_BOKEH_MEMORY_INTERVAL',
+                                           60))
+
+    def __init__(self, idle_timeout=None):
+        self.logger = logging.getLogger()
+
+        self.idle_timeout = idle_timeout or SessionRegistry.IDLE_TIMEOUT
+
+        self.lock = threading.Lock()
+        self.sessions = {}
+
+        self.callback = None
+
+        self.releases = 0
+        self.restores = 0
+
+    def register(self, app):
+        """Track the session of an app, `app.doc` must be the
+        session document."""
+
+        session = Session(app)
+
+        with self.lock:
+            self.sessions[app.doc.session_context.id] = session
+
+        app.doc.on_change(partial(self.on_change, session))
+
+    def unregister(self, session_id):
+
+        with self.lock:
+            self.sessions.pop(session_id, None)
+
+    def on_change(self, session, event):
+        """Document changes made from the browser have a setter."""
+
+        if getattr(event, 'setter', None) is None:
+            return
+
+        session.last_activity = time.time()
+
+        app = session.app()
+
+        if session.released and app:
+            session.released = False
+            self.restores += 1
+            app.restore_data()
+
+    def on_render(self, app):
+        """The data of a session was loaded and displayed, e.g. by a
+        reload in flight when the session was released."""
+
+        with self.lock:
+            session = self.sessions.get(app.doc.session_context.id)
+
+        if session:
+            session.released = False
+
+    def release(self, session):
+        """Release the data of a session, it must run as a callback
+        of the session document."""
+
+        app = session.app()
+
+        if app is None or session.released:
+            return
+
+        session.released = True
+        self.releases += 1
+
+        app.release_data()
+
+    def check(self):
+        """Release the data of the idle sessions."""
+
+        now = time.time()
+
+        with self.lock:
+            sessions = list(self.sessions.items())
+
+        for session_id, session in sessions:
+
+            app = session.app()
+
+            if app is None:
+                self.unregister(session_id)
+                continue
+
+            if session.released or getattr(app, 'live', False):
+                continue
+
+            if now - session.last_activity > self.idle_timeout:
+                self.logger.info("Releasing data of idle session "
+                                 "{}".format(hash_session_id(session_id)))
+
+                app.doc.add_next_tick_callback(partial(self.release,
+                                                       session))
+
+    def start(self, io_loop=None):
+        """Check for idle sessions periodically on `io_loop`, by
+        default the current IOLoop.
+        """
+        self.callback = PeriodicCallback(self.check,
+                                         SessionRegistry.CHECK_INTERVAL *
+                                         1000)
+
+        (io_loop or IOLoop.current()).add_callback(self.callback.start)
+
+    def get_sessions(self, limit=20):
+        """Return the sessions holding the most memory.
+
+        Return
+        ------
+        sessions: dict
+            a dict with columns `session`, a hash of the session id,
+            `app`, `data_mb`, `source_mb`, `models`, `idle_s` and
+            `released`.
+        """
+        now = time.time()
+
+        with self.lock:
+            sessions = list(self.sessions.items())
+
+        rows = []
+        for session_id, session in sessions:
+            memory = session.get_memory(SessionRegistry.MEMORY_INTERVAL)
+
+            rows.append({'session': hash_session_id(session_id),
+                         'app': session.name,
+                         'data_mb': round(memory['data_bytes'] / 1e6, 2),
+                         'source_mb': round(memory['source_bytes'] / 1e6,
+                                            2),
+                         'models': memory['models'],
+                         'idle_s': int(now - session.last_activity),
+                         'released': session.released})
+
+        rows.sort(key=lambda row: row['data_mb'] + row['source_mb'],
+                  reverse=True)
+
+        columns = ['session', 'app', 'data_mb', 'source_mb', 'models',
+                   'idle_s', 'released']
+
+        return {column: [row[column] for row in rows[:limit]]
+                for column in columns}
+
+    def get_stats(self):
+        with self.lock:
+            sessions = list(self.sessions.values())
+
+        return {'sessions': len(sessions),
+                'released': sum(1 for s in sessions if s.released),
+                'idle_timeout_s': self.idle_timeout,
+                'releases': self.releases,
+                'restores': self.restores}
+
+
+def get_registry():
+    """Return the process wide session registry."""
+
+    return stats.get_instance('sessions', SessionRegistry)
+
+
+def start_reaper(io_loop=None):
+    """Release the data of idle sessions, if `SQUASH_BOKEH_IDLE_TIMEOUT`
+    is set."""
+
+    registry = get_registry()
+
+    if registry.idle_timeout and registry.callback is None:
+        registry.start(io_loop)
+
+    return registry
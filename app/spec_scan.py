@@ -0,0 +1,250 @@
+import os
+import time
+import operator
+
+from tornado import gen
+from tornado.ioloop import IOLoop, PeriodicCallback
+
+import stats
+from async_api_helper import AsyncAPIHelper
+
+# Comparison of a measurement with a spec threshold, a spec is met
+# if `value <operator> threshold`
+OPERATORS = {'<': operator.lt, '<=': operator.le,
+             '>': operator.gt, '>=': operator.ge,
+             '==': operator.eq, '!=': operator.ne}
+
+
+def get_violations(value, specs):
+    """Return the names of the specs not met by a measurement.
+
+    Parameters
+    ----------
+    value: float
+        the measurement, `None` if there is none
+    specs: dict
+        spec `names`, `thresholds` and `operators`, see
+        `APIHelper.parse_specs`
+
+    Return
+    ------
+    names: list
+        names of the specs violated
+    """
+    if value is None:
+        return []
+
+    return [name for name, threshold, op in zip(specs['names'],
+                                                specs['thresholds'],
+                                                specs['operators'])
+            if threshold is not None and op in OPERATORS and
+            not OPERATORS[op](value, threshold)]
+
+
+class SpecScanner(AsyncAPIHelper):
+    """Check the latest measurement of every metric of a package
+    against its specs, for a dataset and filter.
+
+    Scans run on the bokeh server IOLoop, the measurements and specs
+    of the metrics are fetched concurrently in batches. The results
+    are kept per `(dataset, filter, package)`, so that the apps can
+    flag the failing metrics without a request per metric.
+
+    Results expire after `ttl` seconds, the selection is then scanned
+    again when a session requests it. Optionally, the selections
+    requested in the last `ttl` seconds are scanned again in the
+    background, and the others are dropped.
+    """
+
+    # Interval in seconds between background scans, 0 disables them
+    INTERVAL = float(os.environ.get('SQUASH_BOKEH_SCAN_INTERVAL', 0))
+
+    # Time in seconds after which the results of a selection expire
+    TTL = float(os.environ.get('SQUASH_BOKEH_SCAN_TTL', 3600))
+
+    # Number of metrics fetched concurrently
+    BATCH = int(os.environ.get('SQUASH_BOKEH_SCAN_BATCH', 8))
+
+    # Period of the measurements fetched, metrics without measurements
+    # in this period are not checked
+    PERIOD = os.environ.get('SQUASH_BOKEH_SCAN_PERIOD', 'Last Month')
+
+    def __init__(self, interval=None, ttl=None):
+        super().__init__()
+
+        # Scans are not counted as requests from the apps
+        self.record_requests = False
+
+        self.interval = interval or SpecScanner.INTERVAL
+        self.ttl = ttl or SpecScanner.TTL
+
+        # Results and scans in progress by (dataset, filter, package)
+        self.results = {}
+        self.scans = {}
+
+        self.callback = None
+
+        self.runs = 0
+        self.duration = 0
+
+    def get(self, dataset, filter_name, package):
+        """Return the latest results for a selection, or `None` if it
+        was not scanned yet or the results expired.
+
+        Return
+        ------
+        violations: dict
+            names of the specs violated indexed by metric, only the
+            failing metrics are included
+        """
+        result = self.results.get((dataset, filter_name, package))
+
+        now = time.time()
+
+        if result is None or now - result['time'] > self.ttl:
+            return None
+
+        result['requested'] = now
+
+        return result['violations']
+
+    async def scan(self, dataset, filter_name, package):
+        """Scan a selection, or await the scan in progress.
+
+        Return
+        ------
+        violations: dict
+            see `SpecScanner.get`
+        """
+        key = (dataset, filter_name, package)
+
+        if key not in self.scans:
+            self.scans[key] = gen.convert_yielded(self.run_scan(*key))
+
+        try:
+            return await self.scans[key]
+        finally:
+            self.scans.pop(key, None)
+
+    async def run_scan(self, dataset, filter_name, package):
+
+        start = time.time()
+
+        metrics = await self.get_metrics(package)
+
+        violations = {}
+
+        names = metrics['metrics']
+
+        for i in range(0, len(names), SpecScanner.BATCH):
+            batch = names[i:i + SpecScanner.BATCH]
+
+            results = await gen.multi([self.scan_metric(dataset,
+                                                        filter_name, metric)
+                                       for metric in batch])
+
+            violations.update((metric, specs) for metric, specs in
+                              zip(batch, results) if specs)
+
+        now = time.time()
+
+        self.results[(dataset, filter_name, package)] = {
+            'violations': violations, 'time': now, 'requested': now}
+
+        self.expire(now)
+
+        self.runs += 1
+        self.duration = time.time() - start
+
+        return violations
+
+    async def scan_metric(self, dataset, filter_name, metric):
+        """Return the specs violated by the latest measurement of a
+        metric."""
+
+        data, specs = await gen.multi([
+            self.get_api_data('monitor',
+                              params={'ci_dataset': dataset,
+                                      'filter_name': filter_name,
+                                      'metric': metric,
+                                      'period': SpecScanner.PERIOD}),
+            self.get_specs(dataset, filter_name, metric)])
+
+        return get_violations(self.get_latest(data), specs)
+
+    @staticmethod
+    def get_latest(data):
+        """Return the value of the latest measurement of a `monitor`
+        payload, or `None`."""
+
+        dates = (data or {}).get('date_created') or []
+        values = (data or {}).get('value') or []
+
+        if not dates or len(dates) != len(values):
+            return None
+
+        latest = max(range(len(dates)), key=dates.__getitem__)
+
+        try:
+            return float(values[latest])
+        except (TypeError, ValueError):
+            return None
+
+    def expire(self, now):
+        """Drop the results of the selections not requested in the
+        last `ttl` seconds."""
+
+        for key, result in list(self.results.items()):
+            if now - result['requested'] > self.ttl:
+                del self.results[key]
+
+    async def refresh(self):
+        """Scan again the selections requested recently."""
+
+        self.expire(time.time())
+
+        for key in list(self.results):
+            try:
+                await self.scan(*key)
+            except Exception:
+                # Keep the previous results, e.g. while the API is
+                # unavailable
+                pass
+
+    def start(self, io_loop=None):
+        """Scan the selections periodically on `io_loop`, by default
+        the current IOLoop.
+        """
+        # The coroutine is spawned, PeriodicCallback does not await it
+        self.callback = PeriodicCallback(
+            lambda: IOLoop.current().spawn_callback(self.refresh),
+            self.interval * 1000)
+
+        (io_loop or IOLoop.current()).add_callback(self.callback.start)
+
+    def get_stats(self):
+        return {'selections': len(self.results),
+                'violations': sum(len(result['violations'])
+                                  for result in self.results.values()),
+                'runs': self.runs,
+                'last_duration_s': round(self.duration, 3),
+                'interval_s': self.interval,
+                'ttl_s': self.ttl}
+
+
+def get_scanner():
+    """Return the process wide scanner."""
+
+    return stats.get_instance('spec_scan', SpecScanner)
+
+
+def start_scanner(io_loop=None):
+    """Refresh the scanned selections in the background, if
+    `SQUASH_BOKEH_SCAN_INTERVAL` is set."""
+
+    scanner = get_scanner()
+
+    if scanner.interval and scanner.callback is None:
+        scanner.start(io_loop)
+
+    return scanner
@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+
+
+# Registry of stats providers, indexed by section name. A provider is
+# a callable returning a flat dict of metric names and values.
+_providers = OrderedDict()
+
+# Process wide instances, indexed by section name, see `get_instance`
+_instances = {}
+_instances_lock = threading.RLock()
+
+
+def register(section, provider):
+    """Register a stats provider to be shown in the status app.
+
+    Parameters
+    ----------
+    section: str
+        name of the section, e.g. `ioloop`
+    provider: callable
+        a function with no arguments that returns a dict
+        with metric names and values.
+    """
+    _providers[section] = provider
+
+
+def collect():
+    """Collect the current stats from all the registered
+    providers.
+
+    Return
+    ------
+    stats: dict
+        a dict with columns `section`, `name` and `value`
+        suitable for a bokeh column data source.
+    """
+    stats = {'section': [], 'name': [], 'value': []}
+
+    for section, provider in _providers.items():
+        for name, value in provider().items():
+            stats['section'].append(section)
+            stats['name'].append(name)
+            stats['value'].append(str(value))
+
+    return stats
+
+
+def get_instance(section, factory):
+    """Return the process wide instance shown in a section of the
+    status app, created on first use and registered as a stats
+    provider.
+
+    Parameters
+    ----------
+    section: str
+        name of the section, e.g. `series_store`
+    factory: callable
+        a function with no arguments that returns the instance,
+        it must have a `get_stats` method, see `register`.
+    """
+    with _instances_lock:
+        if section not in _instances:
+            instance = factory()
+            _instances[section] = instance
+            register(section, instance.get_stats)
+
+        return _instances[section]
@@ -0,0 +1,93 @@
+import os
+import sys
+
+from bokeh.io import curdoc
+from bokeh.layouts import widgetbox, column
+from bokeh.models import ColumnDataSource
+from bokeh.models.widgets import Div, DataTable, TableColumn
+
+BASE_DIR = os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))
+)
+sys.path.append(os.path.join(BASE_DIR))
+import stats  # noqa
+from sessions import get_registry  # noqa
+
+
+class Status:
+    """Show the stats of the bokeh server process serving the
+    squash-bokeh apps.
+    """
+    # default sizes for widgets
+    SMALL = 250
+    LARGE = 1000
+
+    # Refresh interval in milliseconds
+    REFRESH = 5000
+
+    def __init__(self, title):
+        self.doc = curdoc()
+        self.doc.title = title
+
+        self.cds = ColumnDataSource(data=stats.collect())
+        self.sessions_cds = ColumnDataSource(
+            data=get_registry().get_sessions())
+
+        self.make_header()
+        self.make_table()
+        self.make_sessions_table()
+        self.make_layout()
+
+        self.doc.add_periodic_callback(self.update, Status.REFRESH)
+
+    def make_header(self):
+        self.header_widget = Div(text="<h2>squash-bokeh server status"
+                                      "</h2><p>Process id: {}</p>".format(
+                                          os.getpid()))
+
+    def make_table(self):
+        columns = [
+            TableColumn(field='section', title='Section',
+                        width=Status.SMALL),
+            TableColumn(field='name', title='Name', width=Status.SMALL),
+            TableColumn(field='value', title='Value', width=Status.SMALL),
+        ]
+
+        self.table = DataTable(source=self.cds, columns=columns,
+                               width=Status.LARGE, editable=False)
+
+    def make_sessions_table(self):
+        """Sessions holding the most memory, as estimated by the
+        session registry."""
+
+        self.sessions_header_widget = Div(text="<h3>Largest sessions</h3>")
+
+        columns = [
+            TableColumn(field='session', title='Session',
+                        width=Status.SMALL),
+            TableColumn(field='app', title='App', width=Status.SMALL),
+            TableColumn(field='data_mb', title='Data [MB]'),
+            TableColumn(field='source_mb', title='Data sources [MB]'),
+            TableColumn(field='models', title='Models'),
+            TableColumn(field='idle_s', title='Idle [s]'),
+            TableColumn(field='released', title='Released'),
+        ]
+
+        self.sessions_table = DataTable(source=self.sessions_cds,
+                                        columns=columns,
+                                        width=Status.LARGE, editable=False)
+
+    def update(self):
+        self.cds.data = stats.collect()
+        self.sessions_cds.data = get_registry().get_sessions()
+
+    def make_layout(self):
+        header = widgetbox(self.header_widget, width=Status.LARGE)
+        sessions_header = widgetbox(self.sessions_header_widget,
+                                    width=Status.LARGE)
+
+        self.doc.add_root(column(header, self.table, sessions_header,
+                                 self.sessions_table))
+
+
+Status(title="Status App - LSST SQuaSH")
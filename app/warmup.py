@@ -0,0 +1,155 @@
+import os
+import time
+import threading
+
+import stats
+import defaults
+from api_helper import APIHelper
+from mirror import LocalMirror, get_mirror
+
+
+class Warmup(APIHelper):
+    """Fill the process cache with the API payloads used by the
+    default dashboards, so that the first session after a deploy does
+    not wait on the SQuaSH API. If the local mirror is enabled, the
+    mirrored records are synced instead, as the apps read them from
+    the mirror.
+
+    Optionally, refresh the cache periodically with the defaults and
+    the combinations most requested by the apps since the last
+    refresh.
+    """
+
+    # Interval in seconds to refresh the cache, 0 disables the refresh.
+    # It should be shorter than the cache TTL.
+    INTERVAL = float(os.environ.get('SQUASH_BOKEH_WARMUP_INTERVAL', 0))
+
+    # Number of most requested combinations to refresh
+    TOP = int(os.environ.get('SQUASH_BOKEH_WARMUP_TOP', 20))
+
+    def __init__(self, interval=None):
+        super().__init__()
+
+        # Requests made to warm the cache are not counted
+        self.record_requests = False
+
+        self.interval = interval or Warmup.INTERVAL
+
+        self.mirror = get_mirror()
+
+        self.runs = 0
+        self.duration = 0
+        self.refreshed = 0
+
+    def warm(self, endpoint, item=None, params=None):
+        """Fetch a payload in the cache, or sync it in the mirror
+        if it is read from there."""
+
+        if self.mirror and endpoint in LocalMirror.ENDPOINTS:
+            return self.mirror.warm(endpoint, item, params)
+
+        return self.get_api_data(endpoint, item, params)
+
+    def warm_code_changes(self):
+        app_defaults = defaults.CODE_CHANGES
+
+        datasets = self.get_datasets(default=app_defaults['dataset'],
+                                     ignore=app_defaults['ignore'])
+
+        packages = self.get_packages(default=app_defaults['package'])
+
+        metrics = self.get_metrics(package=packages['default'],
+                                   default=app_defaults['metric'])
+
+        filter_name = defaults.DATASET_FILTERS[datasets['default']][0]
+
+        params = {'ci_dataset': datasets['default'],
+                  'filter_name': filter_name,
+                  'period': defaults.PERIODS['default']}
+
+        self.warm('code_changes', params=params)
+
+        params['metric'] = metrics['default']
+        self.warm('monitor', params=params)
+
+        self.get_specs(datasets['default'], filter_name, metrics['default'])
+
+    def warm_monitor(self):
+        app_defaults = defaults.MONITOR
+
+        packages = self.get_packages(default=app_defaults['package'])
+
+        metrics = self.get_metrics(package=packages['default'],
+                                   default=app_defaults['metric'])
+
+        self.warm('monitor', params={'metric': metrics['default'],
+                                     'period': defaults.PERIODS['default']})
+
+    def warm_most_requested(self):
+        """Fetch the combinations most requested since the last run,
+        the counts are then decayed so that only recent requests
+        matter.
+        """
+        most_requested = APIHelper.get_most_requested(Warmup.TOP)
+
+        for (endpoint, item, params), _ in most_requested:
+            if endpoint in APIHelper.IMMUTABLE_ENDPOINTS:
+                continue
+
+            self.warm(endpoint, item, dict(params))
+            self.refreshed += 1
+
+    def run(self):
+        start = time.time()
+
+        for warm in [self.warm_code_changes, self.warm_monitor,
+                     self.warm_most_requested]:
+            try:
+                warm()
+            except Exception as e:
+                self.logger.warning("Failed to warm the cache: "
+                                    "{}".format(e))
+
+        self.runs += 1
+        self.duration = time.time() - start
+
+    def refresh(self):
+        """Refresh the cache every `self.interval` seconds. Payloads
+        fetched less than half an interval ago, by this or another
+        process, are not fetched again.
+        """
+        while True:
+            time.sleep(self.interval)
+
+            self.fetched_after = time.time() - self.interval / 2
+            self.run()
+
+    def start(self):
+        """Warm the cache and start the refresh in a background
+        thread, so that the server startup is not blocked.
+        """
+        def target():
+            self.run()
+            if self.interval > 0:
+                self.refresh()
+
+        thread = threading.Thread(target=target, daemon=True,
+                                  name='cache-warmup')
+        thread.start()
+
+    def get_stats(self):
+        return {'runs': self.runs,
+                'last_duration_s': round(self.duration, 2),
+                'refreshed': self.refreshed}
+
+
+def start_warmup():
+    """Start the process wide cache warmup, only once."""
+
+    def start():
+        warmup = Warmup()
+        warmup.start()
+
+        return warmup
+
+    return stats.get_instance('warmup', start)
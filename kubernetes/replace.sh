@@ -52,10 +52,15 @@ if [ -z "$SQUASH_BOKEH_APPS" ]; then
     SQUASH_BOKEH_APPS="monitor code_changes AMx"
 fi
 
+if [ -z "$SQUASH_BOKEH_NUM_PROCS" ]; then
+    SQUASH_BOKEH_NUM_PROCS=1
+fi
+
 sed -e "
 s/{{ TAG }}/${TAG}/
 s/{{ SQUASH_DASH_HOST }}/${SQUASH_DASH_HOST}/
 s/{{ SQUASH_BOKEH_HOST }}/${SQUASH_BOKEH_HOST}/
 s|{{ SQUASH_API_URL }}|\"${SQUASH_API_URL}\"|
 s|{{ SQUASH_BOKEH_APPS }}|\"${SQUASH_BOKEH_APPS}\"|
+s|{{ SQUASH_BOKEH_NUM_PROCS }}|\"${SQUASH_BOKEH_NUM_PROCS}\"|
 " $1 > $2
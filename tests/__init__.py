@@ -1,4 +1,50 @@
+import os
+import sys
 import unittest
-from .test_api_helper import TestAPIHelper
 
-suite = unittest.TestLoader().loadTestsFromTestCase(TestAPIHelper)
+# The app modules import each other as top level modules
+sys.path.append(os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+from .test_api_helper import TestAPIHelper  # noqa
+from .test_api_cache import TestAPICache  # noqa
+from .test_conditional_get import TestConditionalGet  # noqa
+from .test_blob_reader import TestBlobReader  # noqa
+from .test_circuit_breaker import TestCircuitBreaker  # noqa
+from .test_async_api_helper import TestAsyncAPIHelper  # noqa
+from .test_series_store import TestSeriesStore  # noqa
+from .test_package_index import TestPackageIndex  # noqa
+from .test_impact import TestImpact  # noqa
+from .test_change_points import TestChangePoints  # noqa
+from .test_spec_scan import TestSpecScan  # noqa
+from .test_bands import TestBands  # noqa
+from .test_pyramid import TestPyramid  # noqa
+from .test_mirror import TestMirror  # noqa
+from .test_ioloop_watchdog import TestIOLoopWatchdog  # noqa
+from .test_scheduler import TestScheduler  # noqa
+from .test_http_client import TestHTTPClient  # noqa
+from .test_live import TestLive  # noqa
+from .test_sessions import TestSessions  # noqa
+
+loader = unittest.TestLoader()
+
+suite = unittest.TestSuite()
+suite.addTests(loader.loadTestsFromTestCase(TestAPIHelper))
+suite.addTests(loader.loadTestsFromTestCase(TestAPICache))
+suite.addTests(loader.loadTestsFromTestCase(TestConditionalGet))
+suite.addTests(loader.loadTestsFromTestCase(TestBlobReader))
+suite.addTests(loader.loadTestsFromTestCase(TestCircuitBreaker))
+suite.addTests(loader.loadTestsFromTestCase(TestAsyncAPIHelper))
+suite.addTests(loader.loadTestsFromTestCase(TestSeriesStore))
+suite.addTests(loader.loadTestsFromTestCase(TestPackageIndex))
+suite.addTests(loader.loadTestsFromTestCase(TestImpact))
+suite.addTests(loader.loadTestsFromTestCase(TestChangePoints))
+suite.addTests(loader.loadTestsFromTestCase(TestSpecScan))
+suite.addTests(loader.loadTestsFromTestCase(TestBands))
+suite.addTests(loader.loadTestsFromTestCase(TestPyramid))
+suite.addTests(loader.loadTestsFromTestCase(TestMirror))
+suite.addTests(loader.loadTestsFromTestCase(TestIOLoopWatchdog))
+suite.addTests(loader.loadTestsFromTestCase(TestScheduler))
+suite.addTests(loader.loadTestsFromTestCase(TestHTTPClient))
+suite.addTests(loader.loadTestsFromTestCase(TestLive))
+suite.addTests(loader.loadTestsFromTestCase(TestSessions))
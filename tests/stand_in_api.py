@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+"""A stand-in for the SQuaSH API serving synthetic payloads.
+
+It honors the ETag and Last-Modified validators, and counts the
+bytes sent, so that the saving of conditional requests can be
+benchmarked without a SQuaSH API deployment, e.g.
+
+    python tests/stand_in_api.py --port 5000 --size 10000
+    export SQUASH_API_URL=http://localhost:5000
+    bokeh serve app/monitor
+
+Use --no-validators to serve the same payloads without validators.
+"""
+import json
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timedelta
+from email.utils import formatdate
+from socketserver import ThreadingMixIn
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+
+class StandInHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StandInAPI:
+    """Serve synthetic `blob`, `monitor`, `code_changes`, `metrics`,
+    `specs`, `packages` and `datasets` payloads.
+
+    Parameters
+    ----------
+    port: int
+        port to listen on, 0 picks a free port
+    size: int
+        number of measurements in the `monitor` and `code_changes`
+        payloads
+    validators: bool
+        send validators and honor conditional requests
+    """
+
+    def __init__(self, port=0, size=1000, validators=True):
+
+        self.validators = validators
+
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+
+        self.server = StandInHTTPServer(('localhost', port),
+                                        self.make_handler())
+        self.port = self.server.server_address[1]
+        self.url = "http://localhost:{}".format(self.port)
+
+        self.lock = threading.Lock()
+        self.size = 0
+        self.update(size)
+
+    def update(self, size=1):
+        """Add `size` measurements, this changes the validators."""
+
+        with self.lock:
+            self.size += size
+            self.payloads = self.make_payloads()
+            self.last_modified = formatdate(usegmt=True)
+
+    def make_payloads(self):
+
+        start = datetime(2018, 1, 1)
+
+        dates = [(start + timedelta(hours=i)).strftime("%Y-%m-%dT%H:%M:%SZ")
+                 for i in range(self.size)]
+
+        ci_ids = [str(i) for i in range(self.size)]
+
+        monitor = {'ci_id': ci_ids,
+                   'ci_url': ["https://ci.lsst.codes/job/{}".format(i)
+                              for i in ci_ids],
+                   'date_created': dates,
+                   'filter_name': ['r'] * self.size,
+                   'job_id': list(range(self.size)),
+                   'value': [10 + (i % 7) * 0.1 for i in range(self.size)]}
+
+        code_changes = {'ci_id': ci_ids,
+                        'count': [1] * self.size,
+                        'packages': [[["afw", "0" * 40,
+                                       "https://github.com/lsst/afw.git"]]
+                                     for _ in ci_ids]}
+
+        metric = {'name': 'validate_drp.AM1',
+                  'display_name': 'AM1',
+                  'description': 'Astrometric repeatability',
+                  'unit': 'marcsec',
+                  'reference': {'url': None, 'doc': None, 'page': None}}
+
+        spec = {'name': 'validate_drp.AM1.design',
+                'threshold': {'value': 10.0}}
+
+        blob = {'snr': {'value': [10.0 * (i % 50) for i in range(self.size)],
+                        'unit': ''},
+                'dist': {'value': [0.1 * (i % 100) for i in range(self.size)],
+                         'unit': 'marcsec'}}
+
+        payloads = {
+            'blob': blob,
+            'monitor': monitor,
+            'code_changes': code_changes,
+            'metrics': {'metrics': [metric]},
+            'specs': {'specs': [spec]},
+            'packages': {'packages': ['validate_drp']},
+            'datasets': {'datasets': ['validation_data_cfht']},
+        }
+
+        endpoints = {endpoint: "{}/{}".format(self.url, endpoint)
+                     for endpoint in payloads}
+
+        payloads[''] = endpoints
+
+        return {endpoint: json.dumps(payload).encode('utf-8')
+                for endpoint, payload in payloads.items()}
+
+    def make_handler(self):
+
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                # e.g. /blob/885 is served as /blob
+                path = urlparse(self.path).path.strip('/')
+                endpoint = path.split('/')[0]
+
+                with api.lock:
+                    body = api.payloads.get(endpoint)
+                    last_modified = api.last_modified
+
+                api.requests += 1
+
+                if body is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+
+                etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+
+                # If-None-Match takes precedence over If-Modified-Since
+                if 'If-None-Match' in self.headers:
+                    not_modified = self.headers['If-None-Match'] == etag
+                else:
+                    not_modified = self.headers.get(
+                        'If-Modified-Since') == last_modified
+
+                if api.validators and not_modified:
+
+                    api.not_modified += 1
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+
+                if api.validators:
+                    self.send_header('ETag', etag)
+                    self.send_header('Last-Modified', last_modified)
+
+                self.end_headers()
+                self.wfile.write(body)
+
+                api.bytes_sent += len(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        """Serve in a background thread."""
+
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  daemon=True)
+        thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--size', type=int, default=1000)
+    parser.add_argument('--no-validators', action='store_true')
+    args = parser.parse_args()
+
+    api = StandInAPI(port=args.port, size=args.size,
+                     validators=not args.no_validators)
+
+    print("Stand-in SQuaSH API at {}".format(api.url))
+
+    try:
+        api.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+    print("Requests: {}, not modified: {}, bytes sent: {}".format(
+        api.requests, api.not_modified, api.bytes_sent))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+import os
+import time
+import fcntl
+import threading
+import shutil
+import tempfile
+import unittest
+from tornado.ioloop import IOLoop
+from api_cache import APICache
+
+
+class TestAPICache(unittest.TestCase):
+    """Test the cache of SQuaSH API payloads, in memory and
+    shared on disk between processes.
+    """
+    def setUp(self):
+
+        self.cache_dir = tempfile.mkdtemp()
+        self.url = "http://localhost:5000/monitor"
+        self.params = {'metric': 'validate_drp.AM1',
+                       'period': 'Last Month'}
+
+    def tearDown(self):
+
+        shutil.rmtree(self.cache_dir)
+
+    def test_make_key(self):
+
+        # the order of the query parameters does not matter
+        params = {'period': 'Last Month',
+                  'metric': 'validate_drp.AM1'}
+
+        self.assertEqual(APICache.make_key(self.url, self.params),
+                         APICache.make_key(self.url, params))
+
+    def test_expiration(self):
+
+        cache = APICache(ttl=0.01)
+        key = APICache.make_key(self.url, self.params)
+
+        cache.set(key, {'value': [1.0]})
+        self.assertTrue(cache.get(key).is_fresh())
+
+        time.sleep(0.02)
+
+        # stale entries are still returned
+        entry = cache.get(key)
+        self.assertFalse(entry.is_fresh())
+        self.assertEqual(entry.data, {'value': [1.0]})
+
+        # entries without ttl never expire
+        cache.set(key, {'value': [1.0]}, ttl=None)
+        time.sleep(0.02)
+        self.assertTrue(cache.get(key).is_fresh())
+
+    def test_size(self):
+
+        cache = APICache(size=2)
+
+        for i in range(3):
+            cache.set(str(i), i)
+
+        self.assertIsNone(cache.get('0'))
+        self.assertEqual(cache.get('2').data, 2)
+
+    def test_shared(self):
+
+        # two caches sharing the same directory, as two bokeh
+        # server processes
+        cache1 = APICache(cache_dir=self.cache_dir)
+        cache2 = APICache(cache_dir=self.cache_dir)
+
+        key = APICache.make_key(self.url, self.params)
+
+        with cache1.lock(key):
+            cache1.set(key, {'value': [1.0]})
+
+        self.assertEqual(cache2.get(key).data, {'value': [1.0]})
+
+    def test_evict(self):
+
+        cache = APICache(cache_dir=self.cache_dir)
+
+        for i in range(3):
+            cache.set(str(i), 'x' * 1000)
+
+        with cache.lock('3'):
+            pass
+
+        now = time.time()
+        os.utime(cache.get_path('0', 'pickle'), (now - 10, now - 10))
+        os.utime(cache.get_path('3', 'lock'), (now - 10, now - 10))
+
+        disk_size, max_age = APICache.DISK_SIZE, APICache.MAX_AGE
+        APICache.DISK_SIZE, APICache.MAX_AGE = 1500, 5
+
+        try:
+            cache.evict()
+        finally:
+            APICache.DISK_SIZE, APICache.MAX_AGE = disk_size, max_age
+
+        # the old entry and lock, then the oldest entry over the size
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        self.assertIsNotNone(cache.read('2'))
+
+    def test_lock_held(self):
+
+        cache = APICache(cache_dir=self.cache_dir)
+
+        # another process fetching the same payload
+        with open(cache.get_path('0', 'lock'), 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+
+            timeout = APICache.LOCK_TIMEOUT
+            APICache.LOCK_TIMEOUT = 0.1
+
+            def lock():
+                with open(cache.get_path('0', 'lock'), 'w') as g:
+                    self.waited = not APICache.acquire(g)
+
+            start = time.monotonic()
+
+            try:
+                # worker threads wait up to the timeout
+                thread = threading.Thread(target=lock)
+                thread.start()
+                thread.join()
+            finally:
+                APICache.LOCK_TIMEOUT = timeout
+
+            self.assertTrue(self.waited)
+            self.assertGreaterEqual(time.monotonic() - start, 0.1)
+
+            # the IOLoop thread does not wait
+            async def lock_on_ioloop():
+                with open(cache.get_path('0', 'lock'), 'w') as g:
+                    return APICache.acquire(g)
+
+            io_loop = IOLoop()
+            start = time.monotonic()
+
+            try:
+                self.assertFalse(io_loop.run_sync(lock_on_ioloop))
+            finally:
+                io_loop.close()
+
+            self.assertLess(time.monotonic() - start, 0.05)
@@ -0,0 +1,69 @@
+import unittest
+from tornado import gen
+from tornado.ioloop import IOLoop
+from api_cache import APICache
+from async_api_helper import AsyncAPIHelper
+from circuit_breaker import reset_breakers
+from .stand_in_api import StandInAPI
+
+
+class TestAsyncAPIHelper(unittest.TestCase):
+    """Test the async API helper against the stand-in SQuaSH API."""
+
+    def setUp(self):
+
+        reset_breakers()
+
+        self.api = StandInAPI(size=100)
+        self.api.start()
+
+        self.APIHelper = AsyncAPIHelper()
+        self.APIHelper.squash_api_url = self.api.url
+        self.APIHelper.cache = APICache()
+
+    def tearDown(self):
+
+        self.api.stop()
+
+    def run_sync(self, coroutine):
+
+        return IOLoop.current().run_sync(coroutine)
+
+    def test_get_packages_and_datasets(self):
+
+        async def get():
+            return await gen.multi([self.APIHelper.get_packages(),
+                                    self.APIHelper.get_datasets()])
+
+        packages, datasets = self.run_sync(get)
+
+        self.assertEqual(packages['default'], 'validate_drp')
+        self.assertEqual(datasets['default'], 'validation_data_cfht')
+
+    def test_get_specs(self):
+
+        specs = self.run_sync(lambda: self.APIHelper.get_specs(
+            'validation_data_cfht', 'r', 'validate_drp.AM1'))
+
+        self.assertEqual(specs['names'], ['design'])
+        self.assertEqual(specs['thresholds'], [10.0])
+
+    def test_concurrent_requests(self):
+
+        async def get():
+            return await gen.multi([self.APIHelper.get_api_data_as_pandas_df(
+                'monitor', params={'metric': 'AM1'}) for _ in range(5)])
+
+        dfs = self.run_sync(get)
+
+        # the same content is fetched once
+        self.assertEqual(len(dfs[0]), 100)
+        self.assertEqual(self.api.requests, 2)
+
+    def test_get_api_blob_arrays(self):
+
+        arrays = self.run_sync(lambda: self.APIHelper.get_api_blob_arrays(
+            '885', ['snr', 'dist']))
+
+        self.assertEqual(len(arrays['snr']), 100)
+        self.assertEqual(arrays['dist'][1], 0.1)
@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+
+from bands import get_bands
+
+
+class TestBands(unittest.TestCase):
+    """Test the rolling bands of a series, computed at once and
+    incrementally as measurements are appended."""
+
+    def setUp(self):
+
+        self.times = list(range(100))
+        self.values = list(np.random.RandomState(0).normal(size=100))
+
+    def test_bands(self):
+
+        bands = get_bands(self.times, self.values, window=10)
+
+        self.assertEqual(len(bands['median']), 100)
+        self.assertEqual(bands['median'][0], self.values[0])
+        self.assertAlmostEqual(bands['median'][9],
+                               np.median(self.values[:10]))
+        self.assertTrue(all(lower <= median <= upper
+                            for lower, median, upper in
+                            zip(bands['lower'], bands['median'],
+                                bands['upper'])))
+
+    def test_incremental(self):
+
+        bands = get_bands(self.times, self.values, window=10)
+
+        # Only the last 9 measurements are needed for the new ones
+        tail = get_bands(self.times[61:], self.values[61:], start=9,
+                         window=10)
+
+        self.assertEqual(tail['time'], self.times[70:])
+
+        for column in ['median', 'lower', 'upper']:
+            self.assertEqual(tail[column], bands[column][70:])
+
+    def test_missing_values(self):
+
+        bands = get_bands([0, 1], [None, None], window=10)
+
+        self.assertEqual(bands['median'], [None, None])
@@ -0,0 +1,62 @@
+import json
+import unittest
+
+import numpy as np
+
+from api_cache import APICache
+from api_helper import APIHelper
+from blob_reader import BlobReader
+from circuit_breaker import reset_breakers
+from .stand_in_api import StandInAPI
+
+
+class TestBlobReader(unittest.TestCase):
+    """Test the incremental parser for data blobs, the arrays
+    must be the same no matter how the body is split in chunks.
+    """
+    def setUp(self):
+
+        reset_breakers()
+
+        self.blob = {'description': {'text': 'snr [dist], "values"'},
+                     'snr': {'unit': '', 'value': [1.5, 200, 3e2, None]},
+                     'mag': {'value': [[1, 2], [3]]},
+                     'dist': {'value': [0.1, -2.0, 3.25, 4]}}
+
+        self.body = json.dumps(self.blob).encode('utf-8')
+
+    def read(self, chunk_size):
+
+        reader = BlobReader(['snr', 'dist', 'missing'])
+
+        for i in range(0, len(self.body), chunk_size):
+            reader.feed(self.body[i:i + chunk_size])
+
+        return reader.close()
+
+    def test_chunks(self):
+
+        for chunk_size in [1, 2, 7, len(self.body)]:
+            arrays = self.read(chunk_size)
+
+            np.testing.assert_array_equal(arrays['snr'],
+                                          [1.5, 200, 300, np.nan])
+            np.testing.assert_array_equal(arrays['dist'],
+                                          [0.1, -2.0, 3.25, 4])
+            self.assertEqual(arrays['missing'].size, 0)
+
+    def test_get_api_blob_arrays(self):
+
+        api = StandInAPI(size=5000)
+        api.start()
+
+        helper = APIHelper()
+        helper.squash_api_url = api.url
+        helper.cache = APICache()
+
+        arrays = helper.get_api_blob_arrays(item=885,
+                                            names=['snr', 'dist'])
+        api.stop()
+
+        self.assertEqual(arrays['snr'].size, 5000)
+        self.assertEqual(arrays['dist'][10], 1.0)
@@ -0,0 +1,76 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from change_points import ChangePointDetector, ChangePointStore
+
+
+class TestChangePoints(unittest.TestCase):
+    """Test the detection of steps in a metric time series, from
+    scratch and incrementally as measurements are appended.
+    """
+    def setUp(self):
+
+        rng = np.random.RandomState(42)
+
+        self.times = pd.date_range('2018-01-01', periods=200, freq='D')
+        self.values = rng.normal(0, 0.1, 200)
+        self.values[120:] += 1.0
+
+    def test_step(self):
+
+        steps = ChangePointDetector().update(self.times, self.values)
+
+        self.assertEqual(len(steps['time']), 1)
+        self.assertEqual(pd.Timestamp(steps['time'][0], unit='ms'),
+                         self.times[120])
+        self.assertAlmostEqual(steps['delta'][0], 1.0, delta=0.2)
+
+    def test_flat_step(self):
+
+        # a deterministic metric, without noise
+        values = np.full(60, 10.0)
+        values[30:] = 12.0
+
+        steps = ChangePointDetector().update(self.times[:60], values)
+
+        self.assertEqual(pd.Timestamp(steps['time'][0], unit='ms'),
+                         self.times[30])
+        self.assertEqual(steps['delta'], [2.0])
+
+        # no step in a constant series
+        steps = ChangePointDetector().update(self.times[:60],
+                                             np.full(60, 10.0))
+
+        self.assertEqual(steps['time'], [])
+
+    def test_no_step(self):
+
+        steps = ChangePointDetector().update(self.times[:100],
+                                             self.values[:100])
+
+        self.assertEqual(steps['time'], [])
+
+    def test_incremental(self):
+
+        detector = ChangePointDetector()
+
+        detector.update(self.times[:150], self.values[:150])
+
+        for end in range(151, 201):
+            steps = detector.update(self.times[:end], self.values[:end])
+
+        self.assertEqual(steps, ChangePointDetector().update(self.times,
+                                                             self.values))
+        self.assertEqual(detector.full_updates, 1)
+
+    def test_shared(self):
+
+        store = ChangePointStore(size=1)
+
+        self.assertIs(store.get(('AM1', 'All')), store.get(('AM1', 'All')))
+
+        store.get(('AM2', 'All'))
+
+        self.assertNotIn(('AM1', 'All'), store.detectors)
@@ -0,0 +1,84 @@
+import time
+import unittest
+
+from api_cache import APICache
+from api_helper import APIHelper
+from circuit_breaker import CircuitBreaker, reset_breakers
+from http_client import HTTPClient
+from json_decoder import JSONDecoder
+from .stand_in_api import StandInAPI
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test that requests fail fast while the SQuaSH API is
+    unavailable, and that stale payloads are served instead.
+    """
+    def setUp(self):
+
+        reset_breakers()
+
+    def test_breaker(self):
+
+        breaker = CircuitBreaker(failures=2, reset_timeout=0.01)
+
+        breaker.failure()
+        self.assertTrue(breaker.allow())
+
+        breaker.failure()
+        self.assertFalse(breaker.allow())
+
+        # a single trial request after the reset timeout
+        time.sleep(0.02)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+        breaker.success()
+        self.assertTrue(breaker.allow())
+
+    def test_lost_trial(self):
+
+        breaker = CircuitBreaker(failures=1, reset_timeout=0.01)
+
+        breaker.failure()
+
+        # the trial request raised before recording its outcome
+        time.sleep(0.02)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+        # another trial is allowed after the reset timeout
+        time.sleep(0.02)
+        self.assertTrue(breaker.allow())
+
+    def test_endpoint(self):
+
+        # breakers are per endpoint, also behind a path prefix
+        self.assertEqual(JSONDecoder.get_endpoint(
+            'http://localhost:5000/blob/885'), 'blob')
+        self.assertEqual(JSONDecoder.get_endpoint(
+            'https://example.org/squash/blob/885',
+            'https://example.org/squash'), 'blob')
+        self.assertEqual(JSONDecoder.get_endpoint(
+            'https://example.org/squash/', 'https://example.org/squash/'),
+            'root')
+
+    def test_serve_stale(self):
+
+        api = StandInAPI(size=10)
+        api.start()
+
+        helper = APIHelper()
+        helper.squash_api_url = api.url
+        helper.cache = APICache(ttl=0.01)
+        helper.session = HTTPClient(retries=1, backoff=0.01)
+
+        packages = helper.get_packages()
+        self.assertIsNone(helper.stale)
+
+        api.stop()
+        time.sleep(0.02)
+
+        # the API is down, the stale payload is served
+        self.assertEqual(helper.get_packages(), packages)
+        self.assertIsNotNone(helper.stale)
+        self.assertIn("stale", helper.get_stale_message())
@@ -0,0 +1,53 @@
+import time
+import unittest
+from api_cache import APICache
+from api_helper import APIHelper
+from circuit_breaker import reset_breakers
+from .stand_in_api import StandInAPI
+
+
+class TestConditionalGet(unittest.TestCase):
+    """Test that stale payloads are revalidated with conditional
+    requests, using the stand-in SQuaSH API.
+    """
+    def setUp(self):
+
+        reset_breakers()
+
+        self.api = StandInAPI(size=100)
+        self.api.start()
+
+        self.APIHelper = APIHelper()
+        self.APIHelper.squash_api_url = self.api.url
+        self.APIHelper.cache = APICache(ttl=0.01)
+
+    def tearDown(self):
+
+        self.api.stop()
+
+    def get_monitor(self):
+
+        return self.APIHelper.get_api_data('monitor',
+                                           params={'metric': 'AM1'})
+
+    def test_not_modified(self):
+
+        data = self.get_monitor()
+        bytes_sent = self.api.bytes_sent
+
+        time.sleep(0.02)
+
+        # the stale payload is revalidated, not downloaded again
+        self.assertIs(self.get_monitor(), data)
+        self.assertEqual(self.api.bytes_sent, bytes_sent)
+        self.assertGreater(self.api.not_modified, 0)
+
+    def test_modified(self):
+
+        data = self.get_monitor()
+
+        self.api.update()
+        time.sleep(0.02)
+
+        new_data = self.get_monitor()
+        self.assertEqual(len(new_data['value']), len(data['value']) + 1)
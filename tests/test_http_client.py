@@ -0,0 +1,108 @@
+import time
+import threading
+import unittest
+from socketserver import ThreadingMixIn
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+from http_client import HTTPClient
+
+
+class SlowHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class TestHTTPClient(unittest.TestCase):
+    """Test the timeouts, the retry deadline and the connection pool
+    stats of the HTTP client shared by the sessions.
+    """
+    def setUp(self):
+
+        # Delay in seconds and status of the responses
+        self.delay = 0
+        self.status = 200
+        self.requests = 0
+
+        test = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+
+                test.requests += 1
+                time.sleep(test.delay)
+
+                body = b'{}'
+
+                try:
+                    self.send_response(test.status)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except BrokenPipeError:
+                    # the client timed out
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = SlowHTTPServer(('localhost', 0), Handler)
+        self.url = "http://localhost:{}/".format(
+            self.server.server_address[1])
+
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+
+    def tearDown(self):
+
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_read_timeout(self):
+
+        self.delay = 0.5
+
+        client = HTTPClient(read_timeout=0.1, retries=1, backoff=0.01)
+
+        start = time.monotonic()
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            client.get(self.url)
+
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(client.get_stats()['errors'], 1)
+
+    def test_deadline(self):
+
+        self.status = 503
+
+        # the backoff alone would wait minutes
+        client = HTTPClient(retries=10, backoff=60, deadline=0.3)
+
+        start = time.monotonic()
+
+        r = client.get(self.url)
+
+        self.assertEqual(r.status_code, 503)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertLess(self.requests, 11)
+
+    def test_pool_stats(self):
+
+        client = HTTPClient(pool_size=2)
+
+        for _ in range(3):
+            client.get(self.url)
+
+        stats = client.get_stats()
+
+        # the connection is kept alive and reused
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(stats['pools'], 1)
+        self.assertEqual(stats['connections_created'], 1)
+        self.assertEqual(stats['connections_idle'], 1)
+        self.assertEqual(stats['active_requests'], 0)
+        self.assertEqual(stats['errors'], 0)
@@ -0,0 +1,44 @@
+import unittest
+import numpy as np
+from impact import get_package_impact
+from package_index import PackageIndex
+
+
+class TestImpact(unittest.TestCase):
+    """Test the attribution of metric changes to the packages
+    changed between consecutive CI runs.
+    """
+    def setUp(self):
+
+        url = 'https://github.com/lsst/{}.git'
+
+        self.packages = PackageIndex(
+            ['1', '2', '3', '4'],
+            [[['afw', 'a' * 40, url.format('afw')]],
+             [['afw', 'b' * 40, url.format('afw')],
+              ['meas_astrom', 'c' * 40, url.format('meas_astrom')]],
+             float('nan'),
+             [['meas_astrom', 'd' * 40, url.format('meas_astrom')]]])
+
+        self.data = {'ci_id': ['1', '2', '3', '4', '1', '2'],
+                     'time': np.array([1, 2, 3, 4, 1, 2],
+                                      dtype='datetime64[s]'),
+                     'value': [10.0, 12.0, 11.0, 15.0, 20.0, 19.0],
+                     'filter_name': ['r', 'r', 'r', 'r', 'i', 'i']}
+
+    def test_impact(self):
+
+        impact = get_package_impact(self.data, self.packages)
+
+        # deltas: run 2 is +2 in r and -1 in i, run 4 is +4 in r
+        self.assertEqual(impact['package'], ['meas_astrom', 'afw'])
+        self.assertEqual(impact['runs'], [3, 2])
+        self.assertAlmostEqual(impact['mean_delta'][0], 5 / 3)
+        self.assertAlmostEqual(impact['mean_delta'][1], 0.5)
+        self.assertEqual(impact['max_abs_delta'], [4.0, 2.0])
+
+    def test_no_code_changes(self):
+
+        impact = get_package_impact(self.data, {})
+
+        self.assertEqual(impact['package'], [])
@@ -0,0 +1,94 @@
+import time
+import unittest
+
+from tornado.ioloop import IOLoop
+
+import stats
+from ioloop_watchdog import IOLoopWatchdog
+
+
+class TestIOLoopWatchdog(unittest.TestCase):
+    """Test that callbacks blocking the IOLoop are reported, and the
+    stats registry."""
+
+    def setUp(self):
+
+        self.io_loop = IOLoop()
+        self.watchdogs = []
+
+    def tearDown(self):
+
+        for watchdog in self.watchdogs:
+            watchdog.stop()
+
+        self.io_loop.close(all_fds=True)
+        stats._providers.pop('test', None)
+        stats._instances.pop('test', None)
+
+    def make_watchdog(self, interval, threshold):
+
+        watchdog = IOLoopWatchdog(interval=interval, threshold=threshold)
+        watchdog.start(self.io_loop)
+
+        self.watchdogs.append(watchdog)
+
+        return watchdog
+
+    def test_stall_before_first_beat(self):
+
+        watchdog = self.make_watchdog(interval=0.05, threshold=0.1)
+
+        def block():
+            time.sleep(0.5)
+
+        self.io_loop.add_callback(block)
+        self.io_loop.call_later(0.7, self.io_loop.stop)
+
+        with self.assertLogs(level='WARNING') as logs:
+            self.io_loop.start()
+
+        self.assertEqual(watchdog.stalls, 1)
+        self.assertIn('block', logs.output[0])
+
+    def test_lag_stats(self):
+
+        watchdog = self.make_watchdog(interval=0.01, threshold=1)
+
+        self.io_loop.call_later(0.1, self.io_loop.stop)
+        self.io_loop.start()
+
+        lags = watchdog.get_stats()
+
+        self.assertGreater(len(watchdog.lags), 0)
+        self.assertEqual(lags['stalls'], 0)
+        self.assertLessEqual(lags['lag_p50_ms'], lags['lag_max_ms'])
+
+    def test_stats_registry(self):
+
+        stats.register('test', lambda: {'a': 1, 'b': 'x'})
+
+        collected = stats.collect()
+        rows = [(section, name, value) for section, name, value in
+                zip(collected['section'], collected['name'],
+                    collected['value']) if section == 'test']
+
+        self.assertEqual(rows, [('test', 'a', '1'), ('test', 'b', 'x')])
+
+    def test_instance(self):
+
+        class Counter:
+
+            created = 0
+
+            def __init__(self):
+                Counter.created += 1
+
+            def get_stats(self):
+                return {'created': Counter.created}
+
+        # created once and registered as a stats provider
+        counter = stats.get_instance('test', Counter)
+
+        self.assertIs(stats.get_instance('test', Counter), counter)
+        self.assertEqual(Counter.created, 1)
+        self.assertIn('test', stats.collect()['section'])
@@ -0,0 +1,43 @@
+import unittest
+from tornado import gen
+from tornado.ioloop import IOLoop
+from api_cache import APICache
+from live import LivePoller
+from circuit_breaker import reset_breakers
+from .stand_in_api import StandInAPI
+
+
+class TestLive(unittest.TestCase):
+    """Test that concurrent live polls of the same series make a
+    single request to the stand-in SQuaSH API.
+    """
+    def setUp(self):
+
+        reset_breakers()
+
+        self.api = StandInAPI(size=100)
+        self.api.start()
+
+        self.poller = LivePoller(interval=60)
+        self.poller.squash_api_url = self.api.url
+        self.poller.cache = APICache()
+
+    def tearDown(self):
+
+        self.api.stop()
+
+    def test_concurrent_polls(self):
+
+        async def poll():
+            return await gen.multi([self.poller.poll(
+                'monitor', {'metric': 'validate_drp.AM1'},
+                since='2018-01-05T00:00:00Z') for _ in range(5)])
+
+        dfs = IOLoop.current().run_sync(poll)
+
+        # the endpoint URLs and the series are fetched once
+        self.assertEqual(self.api.requests, 2)
+        self.assertEqual(self.poller.polls, 5)
+
+        # only the measurements created after `since`
+        self.assertEqual(len(dfs[0]), 3)
@@ -0,0 +1,192 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from api_cache import APICache
+from api_helper import APIHelper
+from circuit_breaker import reset_breakers
+from mirror import LocalMirror, read_api_data
+from .stand_in_api import StandInAPI
+
+
+class TestMirror(unittest.TestCase):
+    """Test the incremental sync of the local mirror with the
+    stand-in SQuaSH API."""
+
+    def setUp(self):
+
+        reset_breakers()
+
+        self.api = StandInAPI(size=100)
+        self.api.start()
+
+        self.dir = tempfile.mkdtemp()
+
+        self.mirror = self.make_mirror()
+
+        self.interval = LocalMirror.INTERVAL
+        LocalMirror.INTERVAL = 0
+
+    def tearDown(self):
+
+        LocalMirror.INTERVAL = self.interval
+
+        self.api.stop()
+        shutil.rmtree(self.dir)
+
+    def make_mirror(self):
+
+        mirror = LocalMirror(os.path.join(self.dir, 'mirror.db'))
+        mirror.squash_api_url = self.api.url
+        mirror.cache = APICache()
+
+        return mirror
+
+    def get_measurements(self, mirror):
+
+        return mirror.get_api_data('monitor',
+                                   params={'metric': 'validate_drp.AM1',
+                                           'period': 'All'})
+
+    def test_incremental_sync(self):
+
+        data = self.get_measurements(self.mirror)
+
+        self.assertEqual(len(data['value']), 100)
+        self.assertEqual(self.mirror.full_syncs, 1)
+
+        self.api.update(5)
+
+        data = self.get_measurements(self.mirror)
+
+        self.assertEqual(len(data['value']), 105)
+        self.assertEqual(data['date_created'], sorted(data['date_created']))
+        self.assertEqual(self.mirror.full_syncs, 1)
+        self.assertEqual(self.mirror.stored, 105)
+
+    def test_unchanged_payload(self):
+
+        data = self.get_measurements(self.mirror)
+
+        self.assertIs(self.get_measurements(self.mirror), data)
+
+    def test_restart(self):
+
+        self.get_measurements(self.mirror)
+
+        LocalMirror.INTERVAL = 300
+
+        mirror = self.make_mirror()
+        requests = self.api.requests
+
+        data = self.get_measurements(mirror)
+
+        # Read from the mirror without requests to the API
+        self.assertEqual(len(data['value']), 100)
+        self.assertEqual(self.api.requests, requests)
+
+    def test_requested(self):
+
+        APIHelper.requested.clear()
+
+        # Reads from the apps are counted, not the syncs or the warmup
+        self.get_measurements(self.mirror)
+        self.mirror.warm('monitor', params={'metric': 'validate_drp.AM1',
+                                            'period': 'All'})
+
+        self.assertEqual(list(APIHelper.requested.values()), [1])
+
+        size = APIHelper.REQUESTED_SIZE
+        APIHelper.REQUESTED_SIZE = 4
+
+        try:
+            for i in range(5):
+                APIHelper.count_request('monitor', None, {'metric': i})
+        finally:
+            APIHelper.REQUESTED_SIZE = size
+
+        # The least requested half is dropped at the fifth combination
+        self.assertEqual(len(APIHelper.requested), 3)
+
+        most_requested = APIHelper.get_most_requested(1)
+
+        self.assertEqual(most_requested[0][1], 1)
+        self.assertEqual(len(APIHelper.requested), 0)
+
+    def test_stale(self):
+
+        self.get_measurements(self.mirror)
+
+        self.api.stop()
+
+        # the records stored are served and reported as stale
+        data = self.get_measurements(self.mirror)
+
+        self.assertEqual(len(data['value']), 100)
+
+        helper = APIHelper()
+        helper.mark_stale(self.mirror.get_stale(
+            'monitor', {'metric': 'validate_drp.AM1', 'period': 'All'}))
+
+        self.assertIn("stale", helper.get_stale_message())
+
+        # served by the apps through `read_api_data`
+        helper = APIHelper()
+
+        with mock.patch('mirror.get_mirror', return_value=self.mirror):
+            read_api_data(helper, 'monitor', {'metric': 'validate_drp.AM1',
+                                              'period': 'Last Month'})
+
+        self.assertIsNotNone(helper.stale)
+
+    def test_same_timestamp(self):
+
+        date = '2018-07-01T12:00:00Z'
+
+        payloads = [{'job_id': [1], 'date_created': [date], 'value': [1.0]},
+                    {'job_id': [1, 2], 'date_created': [date, date],
+                     'value': [1.0, 2.0]}]
+
+        with mock.patch.object(APIHelper, 'get_api_data',
+                               side_effect=payloads):
+            self.get_measurements(self.mirror)
+
+            # a record created in the same second as the last one stored
+            data = self.get_measurements(self.mirror)
+
+        self.assertEqual(sorted(data['job_id']), [1, 2])
+        self.assertEqual(self.mirror.stored, 2)
+
+    def test_period(self):
+
+        params = {'metric': 'validate_drp.AM1'}
+
+        with mock.patch.object(APIHelper, 'get_api_data',
+                               return_value={'job_id': []}) as get_api_data:
+
+            # the first request of a period does not fetch the history
+            self.mirror.get_api_data(
+                'monitor', params=dict(params, period='Last Month'))
+            self.mirror.get_api_data(
+                'monitor', params=dict(params, period='Last Year'))
+            self.mirror.get_api_data(
+                'monitor', params=dict(params, period='Last Month'))
+
+        self.assertEqual([call[1]['params']['period'] for call
+                          in get_api_data.call_args_list],
+                         ['Last Month', 'Last Year', 'Last Month'])
+        self.assertEqual(self.mirror.full_syncs, 2)
+
+    def test_size(self):
+
+        self.mirror.size = 2
+
+        for period in ['All', 'Last Year', 'Last Month']:
+            self.mirror.get_api_data('monitor',
+                                     params={'metric': 'validate_drp.AM1',
+                                             'period': period})
+
+        # the least recently read payload is dropped
+        self.assertEqual([key[2] for key in self.mirror.payloads],
+                         ['Last Year', 'Last Month'])
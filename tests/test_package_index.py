@@ -0,0 +1,49 @@
+import unittest
+import numpy as np
+from package_index import PackageIndex
+
+
+class TestPackageIndex(unittest.TestCase):
+    """Test the compact representation of the packages changed
+    in each CI run.
+    """
+    def setUp(self):
+
+        self.ci_ids = ['1', '2', '3']
+
+        self.packages = [[['afw', 'a' * 40, 'https://github.com/lsst/afw.git'],
+                          ['meas_base', 'b' * 40,
+                           'https://github.com/lsst/meas_base.git']],
+                         float('nan'),
+                         [['afw', 'c' * 40,
+                           'https://github.com/lsst/afw.git']]]
+
+        self.index = PackageIndex(self.ci_ids, self.packages)
+
+    def test_run_packages(self):
+
+        self.assertEqual(self.index['1'],
+                         [tuple(p) for p in self.packages[0]])
+        self.assertEqual(self.index['2'], [])
+        self.assertEqual(self.index.get('4', []), [])
+        self.assertEqual(list(self.index), self.ci_ids)
+
+    def test_extra_fields(self):
+
+        index = PackageIndex(['1'], [[['afw', 'a' * 40,
+                                       'https://github.com/lsst/afw.git',
+                                       'w.2018.30']]])
+
+        self.assertEqual(index['1'], [tuple(self.packages[0][0])])
+
+    def test_interned(self):
+
+        self.assertEqual(self.index.names, ['afw', 'meas_base'])
+        self.assertEqual(len(self.index.urls), 2)
+        np.testing.assert_array_equal(self.index.get_counts(), [2, 0, 1])
+
+    def test_package_runs(self):
+
+        self.assertEqual(self.index.get_package_runs('afw'), ['1', '3'])
+        self.assertEqual(self.index.get_package_runs('meas_base'), ['1'])
+        self.assertEqual(self.index.get_package_runs('pipe_tasks'), [])
@@ -0,0 +1,66 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from pyramid import AggregatePyramid
+
+
+class TestPyramid(unittest.TestCase):
+    """Test the aggregates of a series, built at once and
+    incrementally as measurements are appended."""
+
+    def setUp(self):
+
+        self.times = pd.date_range('2018-01-01', periods=24 * 90, freq='60min')
+        self.values = np.arange(len(self.times), dtype=float)
+
+    def test_aggregates(self):
+
+        pyramid = AggregatePyramid()
+        pyramid.update(self.times, self.values)
+
+        day = pyramid.get_data('day')
+
+        self.assertEqual(len(day['time']), 90)
+        self.assertEqual(day['date_created'][1], '2018-01-02T00:00:00Z')
+        self.assertEqual(list(day['count'][:2]), [24, 24])
+        self.assertEqual(day['min'][1], 24)
+        self.assertEqual(day['max'][1], 47)
+        self.assertEqual(day['last'][1], 47)
+        self.assertEqual(day['value'][1], 35.5)
+
+        # 2018-01-01 is a Monday
+        self.assertEqual(list(pyramid.get_data('week')['count'][:1]),
+                         [24 * 7])
+        self.assertEqual(len(pyramid.get_data('month')['time']), 3)
+
+    def test_incremental(self):
+
+        pyramid = AggregatePyramid()
+
+        for end in range(1000, len(self.times) + 1, 100):
+            pyramid.update(self.times[:end], self.values[:end])
+
+        pyramid.update(self.times, self.values)
+
+        expected = AggregatePyramid()
+        expected.update(self.times, self.values)
+
+        self.assertEqual(pyramid.full_updates, 1)
+
+        for level in ['day', 'week', 'month']:
+            for column, values in expected.levels[level].items():
+                np.testing.assert_array_equal(
+                    pyramid.levels[level][column], values)
+
+    def test_get_level(self):
+
+        pyramid = AggregatePyramid(points=50)
+        pyramid.update(self.times, self.values)
+
+        ms = self.times.values.astype('datetime64[ms]').astype(np.int64)
+
+        self.assertEqual(pyramid.get_level(ms[-50], ms[-1]), 'raw')
+        self.assertEqual(pyramid.get_level(ms[-1000], ms[-1]), 'day')
+        self.assertEqual(pyramid.get_level(), 'week')
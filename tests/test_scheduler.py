@@ -0,0 +1,125 @@
+import queue
+import threading
+import unittest
+from scheduler import ReloadScheduler
+
+
+class Document:
+    """Stand-in for a bokeh document, callbacks run when the test
+    calls `run_timeouts` and `run_next_tick`."""
+
+    def __init__(self):
+
+        self.timeouts = []
+        self.next_ticks = queue.Queue()
+
+    def add_timeout_callback(self, callback, timeout):
+
+        self.timeouts.append(callback)
+        return callback
+
+    def remove_timeout_callback(self, callback):
+
+        self.timeouts.remove(callback)
+
+    def add_next_tick_callback(self, callback):
+
+        # Called from the loader threads
+        self.next_ticks.put(callback)
+
+    def run_timeouts(self):
+
+        timeouts, self.timeouts = self.timeouts, []
+
+        for callback in timeouts:
+            callback()
+
+    def run_next_tick(self):
+
+        self.next_ticks.get(timeout=5)()
+
+
+class TestScheduler(unittest.TestCase):
+    """Test that rapid selection changes result in a single reload
+    and that only the data of the last selection is rendered.
+    """
+    def setUp(self):
+
+        self.doc = Document()
+        self.scheduler = ReloadScheduler(self.doc)
+
+        self.loaded = []
+        self.rendered = []
+
+    def load(self, selection, event=None):
+
+        if event:
+            event.wait(5)
+
+        self.loaded.append(selection)
+
+        return selection
+
+    def schedule(self, selection, event=None):
+
+        self.scheduler.schedule(
+            lambda: self.load(selection, event), self.rendered.append)
+
+    def test_debounce(self):
+
+        for selection in ['AM1', 'AM2', 'AM3']:
+            self.schedule(selection)
+
+        self.assertEqual(len(self.doc.timeouts), 1)
+
+        self.doc.run_timeouts()
+        self.doc.run_next_tick()
+
+        self.assertEqual(self.loaded, ['AM3'])
+        self.assertEqual(self.rendered, ['AM3'])
+
+    def test_superseded(self):
+
+        event = threading.Event()
+
+        self.schedule('AM1', event)
+        self.doc.run_timeouts()
+
+        # A new selection while the first one is loading
+        self.schedule('AM2')
+        event.set()
+
+        self.doc.run_next_tick()
+
+        # The data of the first selection is not rendered
+        self.assertEqual(self.loaded, ['AM1'])
+        self.assertEqual(self.rendered, [])
+        self.assertEqual(self.scheduler.dropped, 1)
+
+        self.doc.run_timeouts()
+        self.doc.run_next_tick()
+
+        self.assertEqual(self.rendered, ['AM2'])
+
+    def test_queued(self):
+
+        event = threading.Event()
+
+        self.schedule('AM1', event)
+        self.doc.run_timeouts()
+
+        # At most one reload in flight, the next one is queued
+        self.schedule('AM2')
+        self.doc.run_timeouts()
+
+        self.assertEqual(self.scheduler.queued[0], 2)
+
+        event.set()
+
+        self.doc.run_next_tick()
+        self.doc.run_next_tick()
+
+        self.assertEqual(self.loaded, ['AM1', 'AM2'])
+        self.assertEqual(self.rendered, ['AM2'])
+        self.assertIsNone(self.scheduler.queued)
+        self.assertFalse(self.scheduler.loading)
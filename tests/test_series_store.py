@@ -0,0 +1,48 @@
+import unittest
+from series_store import Series, SeriesStore
+
+
+class TestSeriesStore(unittest.TestCase):
+    """Test that sessions showing the same selection share the
+    same series, built once per version of the API payloads.
+    """
+    def setUp(self):
+
+        self.store = SeriesStore(size=2)
+        self.built = 0
+
+    def build(self, measurements, code_changes):
+
+        self.built += 1
+
+        return Series({'value': list(measurements['value'])})
+
+    def test_shared(self):
+
+        payloads = ({'value': [1, 2]}, {})
+
+        series = self.store.get('AM1', payloads, self.build)
+
+        self.assertIs(self.store.get('AM1', payloads, self.build), series)
+        self.assertEqual(len(series), 2)
+        self.assertEqual(self.built, 1)
+
+    def test_payload_changed(self):
+
+        self.store.get('AM1', ({'value': [1, 2]}, {}), self.build)
+
+        series = self.store.get('AM1', ({'value': [1, 2, 3]}, {}),
+                                self.build)
+
+        self.assertEqual(series.data['value'], [1, 2, 3])
+        self.assertEqual(self.built, 2)
+
+    def test_eviction(self):
+
+        payloads = ({'value': [1]}, {})
+
+        for key in ['AM1', 'AM2', 'AM3']:
+            self.store.get(key, payloads, self.build)
+
+        self.assertNotIn('AM1', self.store.entries)
+        self.assertEqual(self.store.get_stats()['series'], 2)
@@ -0,0 +1,179 @@
+import time
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from sessions import SessionRegistry, estimate_size, hash_session_id
+
+
+class Document:
+    """Stand-in for a bokeh session document, next tick callbacks run
+    when the test calls `run_next_ticks`."""
+
+    def __init__(self, session_id, title):
+
+        self.session_context = SimpleNamespace(id=session_id)
+        self.title = title
+
+        self.callbacks = []
+        self.next_ticks = []
+
+    def on_change(self, callback):
+
+        self.callbacks.append(callback)
+
+    def change(self, setter=None):
+
+        for callback in self.callbacks:
+            callback(SimpleNamespace(setter=setter))
+
+    def add_next_tick_callback(self, callback):
+
+        self.next_ticks.append(callback)
+
+    def run_next_ticks(self):
+
+        next_ticks, self.next_ticks = self.next_ticks, []
+
+        for callback in next_ticks:
+            callback()
+
+    def select(self, selector):
+
+        return []
+
+
+class App:
+    """Stand-in for a squash-bokeh app holding `size` values."""
+
+    def __init__(self, session_id, size=0, live=False):
+
+        self.doc = Document(session_id, 'monitor')
+        self.live = live
+
+        self.values = np.zeros(size)
+
+    def release_data(self):
+
+        self.values = None
+
+    def restore_data(self):
+
+        self.values = np.zeros(10)
+
+
+class TestSessions(unittest.TestCase):
+    """Test the release of idle sessions, their restore on a change
+    from the browser, and the memory reported per session.
+    """
+    def setUp(self):
+
+        self.registry = SessionRegistry(idle_timeout=60)
+
+    def register(self, session_id, size=0, live=False):
+
+        app = App(session_id, size, live)
+        self.registry.register(app)
+
+        return app
+
+    def make_idle(self):
+
+        for session in self.registry.sessions.values():
+            session.last_activity = time.time() - 120
+
+    def test_release(self):
+
+        app = self.register('a')
+
+        # not idle yet
+        self.registry.check()
+        self.assertEqual(app.doc.next_ticks, [])
+
+        self.make_idle()
+        self.registry.check()
+
+        # released in a callback of the session document
+        self.assertIsNotNone(app.values)
+        app.doc.run_next_ticks()
+
+        self.assertIsNone(app.values)
+        self.assertTrue(self.registry.sessions['a'].released)
+        self.assertEqual(self.registry.get_stats()['releases'], 1)
+
+        # a released session is not released again
+        self.registry.check()
+        self.assertEqual(app.doc.next_ticks, [])
+
+    def test_restore(self):
+
+        app = self.register('a')
+
+        self.make_idle()
+        self.registry.check()
+        app.doc.run_next_ticks()
+
+        # changes made by the server have no setter
+        app.doc.change()
+        self.assertIsNone(app.values)
+
+        app.doc.change(setter='browser')
+
+        self.assertIsNotNone(app.values)
+        self.assertFalse(self.registry.sessions['a'].released)
+        self.assertEqual(self.registry.get_stats()['restores'], 1)
+
+    def test_on_render(self):
+
+        app = self.register('a')
+
+        self.registry.sessions['a'].released = True
+        self.registry.on_render(app)
+
+        self.assertFalse(self.registry.sessions['a'].released)
+
+    def test_live(self):
+
+        app = self.register('a', live=True)
+
+        self.make_idle()
+        self.registry.check()
+
+        self.assertEqual(app.doc.next_ticks, [])
+        self.assertFalse(self.registry.sessions['a'].released)
+
+    def test_get_sessions(self):
+
+        apps = [self.register('a', size=10 ** 5),
+                self.register('b', size=10 ** 6),
+                self.register('c', size=0)]
+
+        sessions = self.registry.get_sessions(limit=2)
+
+        # sorted by memory, the session ids are not displayed
+        self.assertEqual(sessions['session'], [hash_session_id('b'),
+                                               hash_session_id('a')])
+        self.assertEqual(sessions['app'], ['monitor', 'monitor'])
+        self.assertEqual(sessions['data_mb'][0], 8.0)
+        self.assertEqual(sessions['released'], [False, False])
+
+        # sessions whose app was closed are dropped by the next check
+        del apps[:]
+        self.registry.check()
+
+        self.assertEqual(self.registry.get_stats()['sessions'], 0)
+
+    def test_estimate_size(self):
+
+        self.assertEqual(estimate_size(np.zeros(100)), 800)
+
+        df = pd.DataFrame({'value': np.zeros(100)})
+        self.assertEqual(estimate_size(df),
+                         int(df.memory_usage(deep=True).sum()))
+
+        # large lists are estimated from a sample
+        values = [np.zeros(10)] * 1000
+        self.assertGreater(estimate_size(values), 80 * 1000)
+        self.assertGreater(estimate_size({'values': values}),
+                           estimate_size(values))
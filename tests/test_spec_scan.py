@@ -0,0 +1,91 @@
+import time
+import unittest
+from tornado import gen
+from tornado.ioloop import IOLoop
+from api_cache import APICache
+from circuit_breaker import reset_breakers
+from spec_scan import SpecScanner, get_violations
+from .stand_in_api import StandInAPI
+
+
+class TestSpecScan(unittest.TestCase):
+    """Test the scan of the metrics of a package against their specs,
+    using the stand-in SQuaSH API."""
+
+    def setUp(self):
+
+        reset_breakers()
+
+        # The latest measurement is 10.1, the design spec is 10.0
+        self.api = StandInAPI(size=100)
+        self.api.start()
+
+        self.scanner = SpecScanner()
+        self.scanner.squash_api_url = self.api.url
+        self.scanner.cache = APICache()
+
+    def tearDown(self):
+
+        self.api.stop()
+
+    def test_get_violations(self):
+
+        specs = {'names': ['design', 'stretch'],
+                 'thresholds': [10.0, 5.0],
+                 'operators': ['<=', '>=']}
+
+        self.assertEqual(get_violations(7.0, specs), [])
+        self.assertEqual(get_violations(12.0, specs), ['design'])
+        self.assertEqual(get_violations(None, specs), [])
+
+    def test_scan(self):
+
+        self.assertIsNone(self.scanner.get('validation_data_cfht', 'r',
+                                           'validate_drp'))
+
+        violations = IOLoop.current().run_sync(lambda: self.scanner.scan(
+            'validation_data_cfht', 'r', 'validate_drp'))
+
+        self.assertEqual(violations, {'validate_drp.AM1': ['design']})
+        self.assertEqual(self.scanner.get('validation_data_cfht', 'r',
+                                          'validate_drp'), violations)
+
+    def test_expire(self):
+
+        self.scanner.ttl = 0.05
+
+        key = ('validation_data_cfht', 'r', 'validate_drp')
+
+        IOLoop.current().run_sync(lambda: self.scanner.scan(*key))
+
+        time.sleep(0.1)
+
+        # expired results are scanned again when requested
+        self.assertIsNone(self.scanner.get(*key))
+
+        # selections not requested recently are not refreshed
+        IOLoop.current().run_sync(self.scanner.refresh)
+
+        self.assertEqual(self.scanner.results, {})
+        self.assertEqual(self.scanner.runs, 1)
+
+    def test_refresh(self):
+
+        key = ('validation_data_cfht', 'r', 'validate_drp')
+
+        io_loop = IOLoop()
+
+        try:
+            io_loop.run_sync(lambda: self.scanner.scan(*key))
+
+            # the selections scanned are refreshed in the background
+            self.scanner.interval = 0.05
+            self.scanner.start(io_loop)
+
+            io_loop.run_sync(lambda: gen.sleep(0.5))
+
+            self.scanner.callback.stop()
+        finally:
+            io_loop.close(all_fds=True)
+
+        self.assertGreater(self.scanner.runs, 1)